@@ -0,0 +1,42 @@
+"""Times building a control flow graph and its dominators for a large function.
+
+    poetry run python benchmarks/cfg_bench.py
+"""
+import time
+
+from compiler import symtab
+from compiler.cfg import ControlFlowGraph
+from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler.symtab import TopType
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck
+
+STATEMENTS = """
+while i < 100 do {
+  if i % 3 == 0 then total = total + i * 2 else { total = total - 1; }
+  if total > 1000 and i != 7 then print_int(total);
+  i = i + 1;
+}
+"""
+
+
+def main() -> None:
+  source = '{ var i = 0; var total = 0;' + STATEMENTS * 2300 + '}'
+  tree = parse(tokenize(source))
+  resolve(tree)
+  typecheck(tree, TopType.child())
+  instructions = generate_ir(symtab.names, tree)
+
+  best = float('inf')
+  for _ in range(5):
+    start = time.perf_counter()
+    graph = ControlFlowGraph(instructions)
+    graph.immediate_dominators()
+    best = min(best, time.perf_counter() - start)
+  print(f'{len(instructions)} instructions, {len(graph.blocks)} blocks: {best:.3f} s')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,80 @@
+"""Compares the interpreter engines on loop-heavy programs.
+
+    poetry run python benchmarks/interpreter_bench.py
+"""
+import time
+from typing import Any, Callable
+
+from compiler import bytecode, closure_interpreter, interpreter
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler.symtab import SymTab, TopLevel
+from compiler.tokenizer import tokenize
+
+PROGRAMS = {
+  'sum': """{
+    var i = 0; var s = 0;
+    while i < 200000 do { s = s + i % 7; i = i + 1; }
+    s
+  }""",
+  'nested': """{
+    var i = 0; var count = 0;
+    while i < 300 do {
+      var j = 0;
+      while j < 300 do {
+        if (i + j) % 3 == 0 and not (i == j) then count = count + 1;
+        j = j + 1;
+      }
+      i = i + 1;
+    }
+    count
+  }""",
+  'collatz': """{
+    var n = 1; var steps = 0;
+    while n < 3000 do {
+      var x = n;
+      while x != 1 do { if x % 2 == 0 then x = x / 2 else x = 3 * x + 1; steps = steps + 1; }
+      n = n + 1;
+    }
+    steps
+  }""",
+}
+
+
+def tree_walker(source: str) -> Callable[[], Any]:
+  tree = parse(tokenize(source))
+  resolve(tree)
+  return lambda: interpreter.interpret(tree, SymTab[Any]({}, TopLevel))
+
+
+def closures(source: str) -> Callable[[], Any]:
+  tree = parse(tokenize(source))
+  return lambda: closure_interpreter.interpret(tree, SymTab[Any]({}, TopLevel))
+
+
+def bytecode_vm(source: str) -> Callable[[], Any]:
+  program = bytecode.compile_program(parse(tokenize(source)))
+  return lambda: bytecode.run(program)
+
+
+ENGINES: dict[str, Callable[[str], Callable[[], Any]]] = {
+  'tree-walk': tree_walker,
+  'closures': closures,
+  'bytecode': bytecode_vm,
+}
+
+
+def main() -> None:
+  for name, source in PROGRAMS.items():
+    baseline = None
+    for engine, prepare in ENGINES.items():
+      run = prepare(source)
+      start = time.perf_counter()
+      result = run()
+      elapsed = time.perf_counter() - start
+      baseline = baseline or elapsed
+      print(f'{name:>8} {engine:>10}: {elapsed:6.3f} s  {baseline / elapsed:5.1f}x  result={result}')
+
+
+if __name__ == '__main__':
+  main()
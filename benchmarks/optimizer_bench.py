@@ -0,0 +1,86 @@
+"""Compares the IR optimization passes on loop-heavy programs.
+
+Reports the number of IR instructions and the run time of the native
+program for each set of passes. Needs `as` and `ld`.
+
+    poetry run python benchmarks/optimizer_bench.py
+"""
+import os
+import subprocess
+import tempfile
+import time
+
+from compiler.__main__ import call_compiler, compile_to_ir
+from compiler.config import PipelineConfig
+
+PROGRAMS = {
+  'sum': """{
+    var i = 0; var s = 0;
+    while i < 30000000 do { s = s + i % 7; i = i + 1; }
+    s
+  }""",
+  'nested': """{
+    var i = 0; var count = 0;
+    while i < 3000 do {
+      var j = 0;
+      while j < 3000 do {
+        if (i + j) % 3 == 0 and not (i == j) then count = count + 1;
+        j = j + 1;
+      }
+      i = i + 1;
+    }
+    count
+  }""",
+  'collatz': """{
+    var n = 1; var steps = 0;
+    while n < 300000 do {
+      var x = n;
+      while x != 1 do { if x % 2 == 0 then x = x / 2 else x = 3 * x + 1; steps = steps + 1; }
+      n = n + 1;
+    }
+    steps
+  }""",
+}
+
+NONE = PipelineConfig(
+  constant_propagation=False,
+  algebraic_simplification=False,
+  value_numbering=False,
+  loop_invariant_code_motion=False,
+  jump_threading=False,
+  copy_propagation=False,
+  register_allocation=False,
+  peephole=False,
+)
+CONFIGS: dict[str, PipelineConfig] = {
+  'none': NONE,
+  'constants': NONE.with_options({'constant_propagation': True}),
+  'copies': NONE.with_options({'constant_propagation': True, 'copy_propagation': True}),
+  'no-licm': PipelineConfig(loop_invariant_code_motion=False),
+  'no-regalloc': PipelineConfig(register_allocation=False),
+  'default': PipelineConfig(),
+  'global-vn': PipelineConfig(global_value_numbering=True),
+}
+
+
+def main() -> None:
+  with tempfile.TemporaryDirectory() as workdir:
+    executable = os.path.join(workdir, 'program')
+    for name, source in PROGRAMS.items():
+      baseline = None
+      for config_name, config in CONFIGS.items():
+        with open(executable, 'wb') as f:
+          f.write(call_compiler(source, config))
+        os.chmod(executable, 0o755)
+        best = float('inf')
+        for _ in range(3):
+          start = time.perf_counter()
+          output = subprocess.run([executable], capture_output=True, text=True, check=True).stdout.strip()
+          best = min(best, time.perf_counter() - start)
+        baseline = baseline or best
+        size = len(compile_to_ir(source, config))
+        print(f'{name:>8} {config_name:>11}: {size:4} instructions  {best:6.3f} s  {baseline / best:5.2f}x  output={output}')
+
+
+if __name__ == '__main__':
+  main()
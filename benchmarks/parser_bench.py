@@ -0,0 +1,37 @@
+"""Times the parser on a statement-heavy program.
+
+The source is tokenized once up front so that only parsing is measured.
+
+    poetry run python benchmarks/parser_bench.py
+"""
+import time
+
+from compiler.parser import parse
+from compiler.tokenizer import tokenize
+
+STATEMENTS = """
+var i = 0;
+var total: Int = 0;
+while i < 100 do {
+  if i % 3 == 0 then total = total + i * 2 else { total = total - 1; }
+  print_int(total);
+  i = i + 1;
+}
+{ var b = not true or i >= 10 and total != 0; print_bool(b); }
+"""
+
+SOURCE = '{' + STATEMENTS * 5000 + '}'
+
+
+def main() -> None:
+  tokens = tokenize(SOURCE)
+  best = float('inf')
+  for _ in range(5):
+    start = time.perf_counter()
+    parse(tokens)
+    best = min(best, time.perf_counter() - start)
+  print(f'{len(tokens)} tokens parsed in {best:.3f} s ({len(tokens) / best / 1e6:.2f} M tokens/s)')
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,50 @@
+"""Measures memory and allocations used by tokenizing a ~1M token program.
+
+For comparison the same tokens are also built with the plain
+`@dataclass` representation the compiler used before.
+
+    poetry run python benchmarks/token_memory.py
+"""
+import gc
+import tracemalloc
+from dataclasses import dataclass
+from typing import Callable
+
+from compiler.tokenizer import tokenize
+
+SOURCE = "var x = 1; # comment\nwhile x < 10 do {\n  x = x + 1;\n  print_int(x * 3 % 7);\n}\n" * 37000
+
+
+@dataclass
+class OldLoc:
+  def __init__(self, line: int, col: int, test_object: bool = False):
+    self.line = line
+    self.col = col
+    self.test_object = test_object
+
+
+@dataclass
+class OldToken:
+  loc: OldLoc
+  type: str
+  text: str
+
+
+def old_tokenize(source_code: str) -> list:
+  return [OldToken(OldLoc(t.loc.line, t.loc.col), str(t.type), str(t.text)) for t in tokenize(source_code)]
+
+
+def measure(name: str, f: Callable[[str], list]) -> None:
+  gc.collect()
+  tracemalloc.start()
+  tokens = f(SOURCE)
+  stats = tracemalloc.take_snapshot().statistics('filename')
+  tracemalloc.stop()
+  size = sum(s.size for s in stats)
+  blocks = sum(s.count for s in stats)
+  print(f'{name:>10}: {len(tokens)} tokens, {size / len(tokens):.1f} bytes/token, {blocks / len(tokens):.2f} allocations/token')
+
+
+if __name__ == '__main__':
+  measure('slotted', tokenize)
+  measure('dataclass', old_tokenize)
@@ -1,11 +1,30 @@
-from dataclasses import dataclass
+from bisect import bisect_right
+import re
+from typing import Callable
+
+_newline_r = re.compile(r"\n")
+
 
-@dataclass
 class Loc:
-  def __init__(self, line: int, col: int, test_object: bool =False):
-    self.line = line
-    self.col = col
-    self.test_object = test_object
+  """A position in source code, shown as (line, col)."""
+  __slots__ = ()
+  test_object = False
+  # Each subclass stores the position in its own way.
+  line_col: Callable[[], tuple[int, int]]
+
+  def __new__(cls, line: int, col: int, test_object: bool = False) -> 'Loc':
+    # Locations built from a line and a column are stored as such.
+    # The wildcard used by tests is its own subclass so that ordinary
+    # locations don't need to store the flag.
+    return object.__new__(_AnyLoc if test_object else _LineColLoc)
+
+  @property
+  def line(self) -> int:
+    return self.line_col()[0]
+
+  @property
+  def col(self) -> int:
+    return self.line_col()[1]
 
   def __eq__(self, other: object) -> bool:
     if not isinstance(other, Loc):
@@ -14,9 +33,69 @@ class Loc:
     if self.test_object or other.test_object:
       return True
 
-    return self.line == other.line and self.col == other.col
+    return self.line_col() == other.line_col()
 
   def __str__(self) -> str:
-    return f"({self.line}, {self.col})"
+    line, col = self.line_col()
+    return f"({line}, {col})"
+
+  def __repr__(self) -> str:
+    line, col = self.line_col()
+    return f"Loc({line}, {col})"
+
+
+class _LineColLoc(Loc):
+  __slots__ = ('_line', '_col')
+
+  def __init__(self, line: int, col: int, test_object: bool = False):
+    self._line = line
+    self._col = col
+
+  def line_col(self) -> tuple[int, int]:
+    return (self._line, self._col)
+
+
+class _AnyLoc(_LineColLoc):
+  """Location that compares equal to every other location."""
+  __slots__ = ()
+  test_object = True
+
+
+class SourceMap:
+  """Maps offsets in one source text to lines and columns.
+
+  The table of line starts is only built when a location is first
+  printed or compared, i.e. usually only for error messages."""
+
+  def __init__(self, source_code: str):
+    self.source_code = source_code
+    self._line_starts: list[int] | None = None
+
+  def loc(self, offset: int) -> 'OffsetLoc':
+    return OffsetLoc(offset, self)
+
+  def line_col(self, offset: int) -> tuple[int, int]:
+    if self._line_starts is None:
+      self._line_starts = [0, *(m.end() for m in _newline_r.finditer(self.source_code))]
+    line = bisect_right(self._line_starts, offset) - 1
+    return (line, offset - self._line_starts[line])
+
+
+class OffsetLoc(Loc):
+  """Location stored as an offset into the source text of a `SourceMap`."""
+  __slots__ = ('offset', 'source_map')
+  offset: int
+  source_map: SourceMap
+
+  def __new__(cls, offset: int, source_map: SourceMap) -> 'OffsetLoc':
+    # Set up here rather than in __init__: this runs once per token.
+    loc = object.__new__(cls)
+    loc.offset = offset
+    loc.source_map = source_map
+    return loc
+
+  def line_col(self) -> tuple[int, int]:
+    return self.source_map.line_col(self.offset)
+
 
 L = Loc(0,0,True)
@@ -1,8 +1,18 @@
 from dataclasses import dataclass
+from enum import StrEnum
 from compiler.Loc import Loc
 
 
-@dataclass
+class TokenType(StrEnum):
+  """Token kinds. Members compare equal to their plain string names."""
+  IDENTIFIER = 'identifier'
+  INT_LITERAL = 'int_literal'
+  OPERATOR = 'operator'
+  PUNCTUATION = 'punctuation'
+  END = 'end'
+
+
+@dataclass(slots=True)
 class Token:
   loc: Loc
   type: str
@@ -1,26 +1,63 @@
 from base64 import b64encode
+from dataclasses import asdict
 import json
 import re
 import sys
 from socketserver import ForkingTCPServer, StreamRequestHandler
 from traceback import format_exception
 from typing import Any
-from compiler import assembly_generator, interpreter, ir_generator, parser, tokenizer, type_checker, assembler, symtab
+from compiler.config import PipelineConfig
+from compiler.Loc import SourceMap
+from compiler import algebraic_simplification, assembly_generator, constant_propagation, copy_propagation, interpreter, ir, ir_generator, jump_threading, loop_invariant_code_motion, parser, peephole, resolver, tokenizer, type_checker, assembler, symtab, value_numbering, x86_encoder
 
 
-def call_compiler(source_code: str) -> bytes:
-    tokens = tokenizer.tokenize(source_code)
+def compile_to_ir(source_code: str, config: PipelineConfig = PipelineConfig(), report: dict[str, Any] | None = None) -> list[ir.Instruction]:
+    """Runs the stages up to and including the IR passes.
+
+    If `report` is given, what the stages found out about the program
+    is added to it."""
+    source_map = SourceMap(source_code)
+    tokens = tokenizer.tokenize_iter(source_code, source_map)
 
     ast = parser.parse(tokens)
+    resolver.resolve(ast)
 
-    interpreter.interpret(ast, symtab.TopLevel)
-    type_checker.typecheck(ast, symtab.TopType)
+    if config.evaluate:
+        evaluation = interpreter.evaluate(ast, config.eval_max_steps, config.eval_max_seconds)
+        if report is not None:
+            report['evaluation'] = asdict(evaluation)
+    type_checker.typecheck(ast, symtab.TopType.child())
     instructions = ir_generator.generate_ir(symtab.names, ast)
-
-    assembly = assembly_generator.generate_assembly(instructions)
-
-    executable = assembler.assemble_and_get_executable(assembly)
-    return executable
+    if config.constant_propagation:
+        instructions = constant_propagation.propagate_constants(instructions)
+    if config.algebraic_simplification:
+        instructions = algebraic_simplification.simplify(instructions)
+    if config.value_numbering or config.global_value_numbering:
+        instructions = value_numbering.number_values(instructions, config.global_value_numbering)
+    if config.loop_invariant_code_motion:
+        instructions = loop_invariant_code_motion.hoist_loop_invariants(instructions)
+    if config.jump_threading:
+        instructions = jump_threading.thread_jumps(instructions)
+    if config.copy_propagation:
+        instructions, copies_removed = copy_propagation.remove_copies(instructions)
+        if report is not None:
+            report['copies_removed'] = copies_removed
+    return instructions
+
+
+def call_compiler(source_code: str, config: PipelineConfig = PipelineConfig(), report: dict[str, Any] | None = None) -> bytes:
+    instructions = compile_to_ir(source_code, config, report)
+    assembly = assembly_generator.generate_assembly(instructions, config.register_allocation, config.asm_comments)
+    if config.peephole:
+        assembly = peephole.optimize_assembly(assembly)
+
+    if config.integrated_assembler:
+        try:
+            return assembler.encode_and_link(assembly)
+        except x86_encoder.EncodingError:
+            # as and ld handle instructions the encoder doesn't know.
+            pass
+    return assembler.assemble_and_get_executable(assembly)
 
 
 def main() -> int:
@@ -30,13 +67,21 @@ def main() -> int:
     output_file: str | None = None
     host = "127.0.0.1"
     port = 3000
+    show_report = False
+    config = PipelineConfig()
     for arg in sys.argv[1:]:
-        if (m := re.fullmatch(r'--output=(.+)', arg)) is not None:
+        if (new_config := config.with_flag(arg)) is not None:
+            config = new_config
+        elif (m := re.fullmatch(r'--output=(.+)', arg)) is not None:
             output_file = m[1]
         elif (m := re.fullmatch(r'--host=(.+)', arg)) is not None:
             host = m[1]
         elif (m := re.fullmatch(r'--port=(.+)', arg)) is not None:
             port = int(m[1])
+        elif arg == '--report':
+            show_report = True
+        elif (m := re.fullmatch(r'--cache-dir=(.*)', arg)) is not None:
+            assembler.stdlib_cache_dir = m[1] or None
         elif arg.startswith('-'):
             raise Exception(f"Unknown argument: {arg}")
         elif command is None:
@@ -68,18 +113,21 @@ def main() -> int:
         source_code = read_source_code()
         if output_file is None:
             raise Exception("Output file flag --output=... required")
-        executable = call_compiler(source_code)
+        report: dict[str, Any] = {}
+        executable = call_compiler(source_code, config, report)
         with open(output_file, 'wb') as f:
             f.write(executable)
+        if show_report:
+            print(json.dumps(report), file=sys.stderr)
     elif command == 'serve':
         try:
-            run_server(host, port)
+            run_server(host, port, config)
         except KeyboardInterrupt:
             pass
     return 0
 
 
-def run_server(host: str, port: int) -> None:
+def run_server(host: str, port: int, config: PipelineConfig) -> None:
     class Server(ForkingTCPServer):
         allow_reuse_address = True
         request_queue_size = 32
@@ -92,8 +140,11 @@ def run_server(host: str, port: int) -> None:
                 input = json.loads(input_str)
                 if input["command"] == "compile":
                     source_code = input["code"]
-                    executable = call_compiler(source_code)
+                    request_config = config.with_options(input.get("options", {}), limits_only_lowered=True)
+                    report: dict[str, Any] = {}
+                    executable = call_compiler(source_code, request_config, report)
                     result["program"] = b64encode(executable).decode()
+                    result["report"] = report
                 elif input["command"] == "ping":
                     pass
                 else:
@@ -103,6 +154,9 @@ def run_server(host: str, port: int) -> None:
             result_str = json.dumps(result)
             self.request.sendall(str.encode(result_str))
 
+    # Every worker is forked from this process, so they all find the
+    # stdlib already assembled.
+    assembler.warm_stdlib_cache()
     print(f"Starting TCP server at {host}:{port}")
     with Server((host, port), Handler) as server:
         server.serve_forever()
@@ -0,0 +1,68 @@
+from compiler import ir
+from compiler.constant_propagation import int_constants
+from compiler.ir import IRVar
+
+# Comparisons of a variable with itself, by their result.
+_reflexive_comparisons = {'==': True, '<=': True, '>=': True, '!=': False, '<': False, '>': False}
+
+
+def _simplify_call(insn: ir.Call, constants: dict[IRVar, int]) -> ir.Instruction:
+  if len(insn.args) != 2:
+    return insn
+  name = insn.fun.name
+  a, b = insn.args
+  ca, cb = constants.get(a), constants.get(b)
+  location, dest = insn.location, insn.dest
+
+  def copy(source: IRVar) -> ir.Instruction:
+    return ir.Copy(location, source, dest)
+
+  def zero() -> ir.Instruction:
+    return ir.LoadIntConst(location, 0, dest)
+
+  def negate(source: IRVar) -> ir.Instruction:
+    return ir.Call(location, IRVar('unary_-'), [source], dest)
+
+  match name:
+    case '+' if cb == 0:
+      return copy(a)
+    case '+' if ca == 0:
+      return copy(b)
+    case '-' if cb == 0:
+      return copy(a)
+    case '-' if ca == 0:
+      return negate(b)
+    case '-' if a == b:
+      return zero()
+    case '*' if cb == 1:
+      return copy(a)
+    case '*' if ca == 1:
+      return copy(b)
+    case '*' if cb == 0 or ca == 0:
+      return zero()
+    case '*' if cb == -1:
+      return negate(a)
+    case '*' if ca == -1:
+      return negate(b)
+    # Dividing by -1 traps on the smallest Int, so only 1 is handled.
+    case '/' if cb == 1:
+      return copy(a)
+    case '%' if cb == 1:
+      return zero()
+    case _ if name in _reflexive_comparisons and a == b:
+      return ir.LoadBoolConst(location, _reflexive_comparisons[name], dest)
+  return insn
+
+
+def simplify(instructions: list[ir.Instruction]) -> list[ir.Instruction]:
+  """Applies algebraic identities like `x + 0 = x`, `x * 1 = x` and
+  `x - x = 0` to intrinsic calls with a constant or repeated operand.
+
+  Division by a constant is left alone: the assembly generator picks a
+  cheaper instruction sequence for it. Copy propagation and dead code
+  elimination should run afterwards."""
+  constants = int_constants(instructions)
+  return [
+    _simplify_call(insn, constants) if isinstance(insn, ir.Call) else insn
+    for insn in instructions
+  ]
@@ -1,14 +1,30 @@
+import hashlib
+import os
 import subprocess
 import tempfile
 from contextlib import nullcontext
+from functools import cache
 from os import path
 from typing import Any, Callable, ContextManager, TypeVar
 import shutil
 from pathlib import Path
+from compiler import elf_writer, x86_encoder
 
 T = TypeVar('T')
 
 
+def _default_cache_dir() -> str:
+    cache_home = os.environ.get('XDG_CACHE_HOME') or path.join(path.expanduser('~'), '.cache')
+    return path.join(cache_home, 'compiler')
+
+
+# Where assembled copies of the stdlib are kept between compilations.
+# None assembles the stdlib again for every program.
+stdlib_cache_dir: str | None = os.environ.get('COMPILER_CACHE_DIR') or _default_cache_dir()
+
+_as_flags = ['-g']
+
+
 def assemble(
     assembly_code: str,
     output_file: str,
@@ -52,6 +68,20 @@ def assemble_and_get_executable(
     )
 
 
+def encode_and_link(assembly_code: str) -> bytes:
+    """Generates an executable from Assembly code without running 'as' or 'ld'.
+
+    The program is linked with the stdlib, but not with C. Raises
+    x86_encoder.EncodingError for code the encoder doesn't support.
+    """
+    return elf_writer.link([_encoded_stdlib(), x86_encoder.encode(assembly_code)])
+
+
+@cache
+def _encoded_stdlib() -> x86_encoder.ObjectCode:
+    return x86_encoder.encode(stdlib_asm_code)
+
+
 def _assemble(
     assembly_code: str,
     workdir: str | None,
@@ -76,24 +106,14 @@ def _assemble_impl(
     extra_libraries: list[str],
     take_output: Callable[[str], T],
 ) -> T:
-    stdlib_asm = path.join(workdir, 'stdlib.s')
-    stdlib_obj = path.join(workdir, 'stdlib.o')
     program_asm = path.join(workdir, f'{tempfile_basename}.s')
     program_obj = path.join(workdir, f'{tempfile_basename}.o')
     output_file = path.join(workdir, 'a.out')
 
-    if link_with_c:
-        final_stdlib_asm_code = drop_start_symbol(stdlib_asm_code)
-    else:
-        final_stdlib_asm_code = stdlib_asm_code
-
-    with open(stdlib_asm, 'w') as f:
-        f.write(final_stdlib_asm_code)
+    stdlib_obj = stdlib_object(link_with_c, stdlib_cache_dir, workdir)
     with open(program_asm, 'w') as f:
         f.write(assembly_code)
-    subprocess.run(['as', '-g', '-o' +
-                    stdlib_obj, stdlib_asm], check=True)
-    subprocess.run(['as', '-g', '-o' +
+    subprocess.run(['as', *_as_flags, '-o' +
                     program_obj, program_asm], check=True)
     linker_flags = ['-static', *[f'-l{lib}' for lib in extra_libraries]]
     if link_with_c:
@@ -109,6 +129,54 @@ def _assemble_impl(
     return take_output(output_file)
 
 
+def _assemble_stdlib(code: str, output_file: str, workdir: str) -> None:
+    stdlib_asm = path.join(workdir, 'stdlib.s')
+    with open(stdlib_asm, 'w') as f:
+        f.write(code)
+    subprocess.run(['as', *_as_flags, '-o' + output_file, stdlib_asm], check=True)
+
+
+def stdlib_object(link_with_c: bool, cache_dir: str | None, workdir: str) -> str:
+    """Returns the path of the assembled stdlib, without `_start`
+    if linking with C.
+
+    It is kept in `cache_dir` under a name derived from its source code
+    and assembler flags, so a changed stdlib never uses a stale object.
+    Concurrent compilers each assemble into a temporary file and rename
+    it into place, so none sees a partly written object. Without a
+    usable cache directory, the stdlib is assembled in `workdir`."""
+    code = drop_start_symbol(stdlib_asm_code) if link_with_c else stdlib_asm_code
+    if cache_dir is not None:
+        key = hashlib.sha256('\0'.join([*_as_flags, code]).encode()).hexdigest()[:16]
+        cached = path.join(cache_dir, f'stdlib-{key}.o')
+        if path.exists(cached):
+            return cached
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            with tempfile.TemporaryDirectory(prefix='stdlib_', dir=cache_dir) as tmp:
+                obj = path.join(tmp, 'stdlib.o')
+                _assemble_stdlib(code, obj, tmp)
+                os.replace(obj, cached)
+            return cached
+        except OSError:
+            pass
+    obj = path.join(workdir, 'stdlib.o')
+    _assemble_stdlib(code, obj, workdir)
+    return obj
+
+
+def warm_stdlib_cache(cache_dir: str | None = None) -> None:
+    """Assembles both variants of the stdlib into the cache ahead of time,
+    and encodes the one that `encode_and_link` uses."""
+    _encoded_stdlib()
+    cache_dir = cache_dir if cache_dir is not None else stdlib_cache_dir
+    if cache_dir is None:
+        return
+    with tempfile.TemporaryDirectory(prefix='compiler_') as wd:
+        for link_with_c in (False, True):
+            stdlib_object(link_with_c, cache_dir, wd)
+
+
 def drop_start_symbol(code: str) -> str:
     return code.split('# BEGIN START')[0] + code.split('# END START')[1]
 
@@ -348,7 +416,7 @@ read_int:
     neg %r10
 .Lfinal_negation_done:
     # Restore stack registers and return the result
-    popq %r12
+    movq -8(%rbp), %r12  # Restore r12 from below the input buffer
     movq %rbp, %rsp
     popq %rbp
     movq %r10, %rax
@@ -0,0 +1,41 @@
+from io import StringIO
+from compiler import ir
+from compiler.Loc import Loc
+
+# What comments the generated assembly explains itself with:
+# nothing, the source location of each IR instruction, or the
+# IR instruction itself.
+debug_levels = ['none', 'loc', 'ir']
+
+
+class AssemblyBuilder:
+  """Collects lines of assembly code into a single buffer."""
+
+  def __init__(self, debug_level: str = 'none') -> None:
+    if debug_level not in debug_levels:
+      raise Exception(f'Unknown debug level: "{debug_level}"')
+    self._buffer = StringIO()
+    self.debug_level = debug_level
+    self._last_location: Loc | None = None
+
+  def emit(self, line: str) -> None:
+    self._buffer.write(line)
+    self._buffer.write('\n')
+
+  def blank_line(self) -> None:
+    if self.debug_level != 'none':
+      self._buffer.write('\n')
+
+  def describe(self, insn: ir.Instruction) -> None:
+    """Writes a comment about the code generated for `insn` next."""
+    match self.debug_level:
+      case 'ir':
+        self._buffer.write(f'\n# {insn}\n')
+      case 'loc':
+        # Consecutive instructions often come from the same expression.
+        if insn.location is not self._last_location:
+          self._last_location = insn.location
+          self._buffer.write(f'# {insn.location}\n')
+
+  def getvalue(self) -> str:
+    return self._buffer.getvalue()
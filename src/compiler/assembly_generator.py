@@ -1,24 +1,37 @@
-from dataclasses import fields
-from compiler import ir, intrinsics
+from collections import Counter
+from typing import Callable
+from compiler import ir, intrinsics, register_allocator
+from compiler.assembly_builder import AssemblyBuilder
+from compiler.constant_propagation import int_constants
+from compiler.liveness import definition, uses
 
 
 class Locals:
-  """Knows the memory location of every local variable."""
+  """Knows the location of every local variable: a register, or
+  a memory location if it has none."""
   _var_to_location: dict[ir.IRVar, str]
   _stack_used: int
 
-  def __init__(self, variables: list[ir.IRVar]) -> None:
+  def __init__(self, variables: list[ir.IRVar], registers: dict[ir.IRVar, str]) -> None:
     self._var_to_location = {}
-    self._stack_used = 8 * len(variables)
-    l = -8
+    # Pushed right after %rbp, so the stack slots come below them
+    self.saved_registers = [r for r in register_allocator.callee_saved_registers if r in registers.values()]
+    l = -8 * (len(self.saved_registers) + 1)
     for var in variables:
-      self._var_to_location[var] = f'{l}(%rbp)'
-      l += -8
+      if var in registers:
+        self._var_to_location[var] = registers[var]
+      else:
+        self._var_to_location[var] = f'{l}(%rbp)'
+        l += -8
+    self._stack_used = -8 * (len(self.saved_registers) + 1) - l
+    # Calls need the stack pointer to be a multiple of 16.
+    if (self._stack_used + 8 * len(self.saved_registers)) % 16 != 0:
+      self._stack_used += 8
     #print(self._var_to_location)
 
   def get_ref(self, v: ir.IRVar) -> str:
-    """Returns an Assembly reference like `-24(%rbp)`
-    for the memory location that stores the given variable"""
+    """Returns an Assembly reference like `-24(%rbp)` or `%rbx`
+    for the location that stores the given variable"""
     return self._var_to_location[v]
 
   def stack_used(self) -> int:
@@ -36,27 +49,76 @@ def get_all_ir_variables(instructions: list[ir.Instruction]) -> list[ir.IRVar]:
       result_list.append(v)
       result_set.add(v)
 
+  # The names of called functions aren't variables.
   for insn in instructions:
-    for field in fields(insn):
-      value = getattr(insn, field.name)
-      if isinstance(value, ir.IRVar):
-        add(value)
-      elif isinstance(value, list):
-        for v in value:
-          if isinstance(v, ir.IRVar):
-            add(v)
+    for v in uses(insn):
+      add(v)
+    dest = definition(insn)
+    if dest is not None:
+      add(dest)
   return result_list
 
 
 
-def generate_assembly(instructions: list[ir.Instruction]) -> str:
-  lines = []
-  def emit(line: str) -> None: lines.append(line)
+def _in_memory(ref: str) -> bool:
+  return ref.endswith(')')
+
+
+# The emitter of each intrinsic, by the name of the function called
+_intrinsic_emitters: dict[ir.IRVar, intrinsics.Intrinsic] = {
+  ir.IRVar(name): emitter for name, emitter in intrinsics.all_intrinsics.items()
+}
+
+# Where the System V calling convention puts the first six arguments
+_argument_registers = ['%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9']
+
+
+def _emit_function_call(emit: Callable[[str], None], name: str, arg_refs: list[str]) -> None:
+  register_args = arg_refs[:len(_argument_registers)]
+  stack_args = arg_refs[len(_argument_registers):]
+  # The stack pointer must be a multiple of 16 at the call.
+  padding = 8 * (len(stack_args) % 2)
+  if padding:
+    emit(f'subq ${padding}, %rsp')
+  # The seventh argument goes last, at the top of the stack.
+  for ref in reversed(stack_args):
+    emit(f'pushq {ref}')
+  # Moving the arguments in order only fails if one is in the
+  # register an earlier one goes to.
+  if not any(ref in _argument_registers[:i] for i, ref in enumerate(register_args)):
+    for ref, register in zip(register_args, _argument_registers):
+      if ref != register:
+        emit(f'movq {ref}, {register}')
+  else:
+    for ref in reversed(register_args):
+      emit(f'pushq {ref}')
+    for register in _argument_registers[:len(register_args)]:
+      emit(f'popq {register}')
+  emit(f'callq {name}')
+  if stack_args:
+    emit(f'addq ${8 * len(stack_args) + padding}, %rsp')
+
+
+def generate_assembly(
+  instructions: list[ir.Instruction],
+  allocate_registers: bool = True,
+  debug_level: str = 'none',
+) -> str:
+  """Generates the assembly code of a program.
+
+  With `allocate_registers`, variables are kept in registers where
+  possible instead of each having its own stack slot. `debug_level`
+  is one of `assembly_builder.debug_levels`."""
+  builder = AssemblyBuilder(debug_level)
+  emit = builder.emit
 
 
   locals = Locals(
-    variables=get_all_ir_variables(instructions)
+    variables=get_all_ir_variables(instructions),
+    registers=register_allocator.allocate_registers(instructions) if allocate_registers else {},
   )
+  # Lets intrinsics pick cheaper instructions for constant operands
+  constants = int_constants(instructions)
 
   #Initial declarations and stack setup
 
@@ -70,13 +132,46 @@ def generate_assembly(instructions: list[ir.Instruction]) -> str:
   emit('main:')
   emit('pushq %rbp')
   emit('movq %rsp, %rbp')
+  for register in locals.saved_registers:
+    emit(f'pushq {register}')
   emit(f'subq ${locals.stack_used()}, %rsp')
 
-  for insn in instructions:
-    emit('\n# ' + str(insn))
+  use_counts = Counter(var for insn in instructions for var in uses(insn))
+
+  def fused_branch(position: int) -> ir.CondJump | None:
+    """The jump that is the only use of the comparison at `position`."""
+    insn = instructions[position]
+    next_insn = instructions[position + 1] if position + 1 < len(instructions) else None
+    if (
+      isinstance(insn, ir.Call) and insn.fun.name in intrinsics.comparison_conditions
+      and isinstance(next_insn, ir.CondJump) and next_insn.cond == insn.dest and use_counts[insn.dest] == 1
+    ):
+      return next_insn
+    return None
+
+  # A comparison whose result is only branched on sets the flags for
+  # a conditional jump instead of storing the result.
+  skip_next = False
+  for position, insn in enumerate(instructions):
+    builder.describe(insn)
+    if skip_next:
+      skip_next = False
+      continue
+    if (branch := fused_branch(position)) is not None:
+      assert isinstance(insn, ir.Call)
+      intrinsics.compare(intrinsics.IntrinsicArgs(
+          arg_refs=[locals.get_ref(arg) for arg in insn.args],
+          result_register='%rax',
+          emit=emit,
+          arg_constants=[constants.get(arg) for arg in insn.args]
+      ))
+      emit(f'j{intrinsics.comparison_conditions[insn.fun.name]} .L{branch.then_label.name}')
+      emit(f'jmp .L{branch.else_label.name}')
+      skip_next = True
+      continue
     match insn:
       case ir.Label():
-        emit("")
+        builder.blank_line()
         # ".L" prefix marks the symbol as "private".
         # This makes GDB backtraces look nicer too:
         # https://stackoverflow.com/a/26065570/965979
@@ -84,6 +179,8 @@ def generate_assembly(instructions: list[ir.Instruction]) -> str:
       case ir.LoadIntConst():
         if -2**31 <= insn.value < 2**31:
           emit(f'movq ${insn.value}, {locals.get_ref(insn.dest)}')
+        elif not _in_memory(locals.get_ref(insn.dest)):
+          emit(f'movabsq ${insn.value}, {locals.get_ref(insn.dest)}')
         else:
           # Due to a quirk of x86-64, we must use
           # a different instruction for large integers.
@@ -102,8 +199,14 @@ def generate_assembly(instructions: list[ir.Instruction]) -> str:
           emit(f'movq $0, {locals.get_ref(insn.dest)}')
 
       case ir.Copy():
-        emit(f'movq {locals.get_ref(insn.source)}, %rax')
-        emit(f'movq %rax, {locals.get_ref(insn.dest)}')
+        source, dest = locals.get_ref(insn.source), locals.get_ref(insn.dest)
+        if source == dest:
+          pass
+        elif _in_memory(source) and _in_memory(dest):
+          emit(f'movq {source}, %rax')
+          emit(f'movq %rax, {dest}')
+        else:
+          emit(f'movq {source}, {dest}')
 
       case ir.CondJump():
         emit(f'cmpq $0, {locals.get_ref(insn.cond)}')
@@ -111,33 +214,35 @@ def generate_assembly(instructions: list[ir.Instruction]) -> str:
         emit(f'jmp .L{insn.else_label.name}')
 
       case ir.Call():
-        regs = ['%rdi','%rsi','%rdx','%rcx','r8','r9']
-        all_ins_names = intrinsics.all_intrinsics.keys()
-        if insn.fun.name in all_ins_names:
-          arg_refs = []
-          for arg in insn.args:
-            arg_refs.append(locals.get_ref(arg))
-
-          intrinsics.all_intrinsics['+'](intrinsics.IntrinsicArgs(
-              arg_refs=arg_refs,
-              result_register='%rax',
-              emit=emit
+        emitter = _intrinsic_emitters.get(insn.fun)
+        dest = locals.get_ref(insn.dest)
+        if emitter is not None:
+          # Intrinsics can write to a register but not always to memory.
+          result_register = '%rax' if _in_memory(dest) else dest
+          emitter(intrinsics.IntrinsicArgs(
+              arg_refs=[locals.get_ref(arg) for arg in insn.args],
+              result_register=result_register,
+              emit=emit,
+              arg_constants=[constants.get(arg) for arg in insn.args]
           ))
         else:
-          for i, arg in enumerate(insn.args):
-            if i > len(regs):
-              emit(f'pushq {locals.get_ref(arg)}')
-            else:
-              emit(f'movq {locals.get_ref(arg)}, {regs[i]}')
-          emit(f'callq {insn.fun.name}')
-        emit(f'movq %rax, {locals.get_ref(insn.dest)}')
+          _emit_function_call(emit, insn.fun.name, [locals.get_ref(arg) for arg in insn.args])
+          result_register = '%rax'
+        if result_register != dest:
+          emit(f'movq {result_register}, {dest}')
 
 
   #restore stack
-  emit('\n#Return(None)')
+  if debug_level == 'ir':
+    emit('\n# Return(None)')
   emit('movq $0, %rax')
-  emit('movq %rbp, %rsp')
+  if locals.saved_registers:
+    emit(f'leaq -{8 * len(locals.saved_registers)}(%rbp), %rsp')
+    for register in reversed(locals.saved_registers):
+      emit(f'popq {register}')
+  else:
+    emit('movq %rbp, %rsp')
   emit('popq %rbp')
   emit('ret')
 
-  return '\n'.join(lines)
+  return builder.getvalue()
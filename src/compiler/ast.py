@@ -1,57 +1,219 @@
-
+from array import array
 from dataclasses import dataclass, field
+from typing import Any
 from compiler.Loc import Loc
 from compiler.type import Type, Unit
 
 
-@dataclass
+@dataclass(slots=True)
 class Expression:
   loc: Loc
-  type: Type = field(kw_only=True, default_factory=lambda: Unit)
+  type: Type = field(kw_only=True, default=Unit)
   """Base class for AST nodes representing expressions."""
 
-@dataclass
+@dataclass(slots=True)
 class Literal(Expression):
   value: int | bool | None
 
-@dataclass
+@dataclass(slots=True)
 class Identifier(Expression):
   name: str
+  # Frame slot of the variable, assigned by the resolver; -1 if unresolved.
+  slot: int = field(kw_only=True, default=-1, compare=False, repr=False)
 
-@dataclass
+@dataclass(slots=True)
 class BinaryOp(Expression):
   """AST node for a binary operation like `A + B`"""
   left: Expression
   op: str
   right: Expression
 
-@dataclass
+@dataclass(slots=True)
 class IfStatement(Expression):
   cond: Expression
   then: Expression
   els: Expression
 
-@dataclass
+@dataclass(slots=True)
 class Function(Expression):
   name: Identifier
   args: list[Expression]
 
-@dataclass
+@dataclass(slots=True)
 class Unary(Expression):
   op: str
   right: Expression
 
-@dataclass
+@dataclass(slots=True)
 class Block(Expression):
   statements: list[Expression]
   result: Expression
 
-@dataclass
+@dataclass(slots=True)
 class Var(Expression):
   val: Identifier
   init: Expression
 
-@dataclass
+@dataclass(slots=True)
 class While(Expression):
   cond: Expression
   then: Expression
+
+
+# Node kinds as stored in an Arena, in the order of this list.
+node_classes: list[type[Expression]] = [Literal, Identifier, BinaryOp, IfStatement, Function, Unary, Block, Var, While]
+_kind_of = {cls: kind for kind, cls in enumerate(node_classes)}
+
+
+def _value_and_children(node: Expression) -> tuple[Any, list[Expression]]:
+  """What an Arena stores of a node besides its kind, location and type."""
+  match node:
+    case Literal():
+      return node.value, []
+    case Identifier():
+      return node.name, []
+    case BinaryOp():
+      return node.op, [node.left, node.right]
+    case IfStatement():
+      return None, [node.cond, node.then, node.els]
+    case Function():
+      return None, [node.name, *node.args]
+    case Unary():
+      return node.op, [node.right]
+    case Block():
+      return None, [*node.statements, node.result]
+    case Var():
+      return None, [node.val, node.init]
+    case While():
+      return None, [node.cond, node.then]
+  raise Exception("Unknown node type")
+
+
+class Arena:
+  """Stores AST nodes in parallel arrays, addressed by integer ids.
+
+  Per node we keep its kind, location, type, a literal value
+  (the value of a Literal, the name of an Identifier or the operator
+  of a BinaryOp/Unary), the resolver's slot of an Identifier and a
+  slice of the shared `children` array. This is much smaller than the
+  tree of node objects and creates no work for the garbage collector,
+  so it suits keeping many ASTs around between passes.
+
+  A node is stored after its children, so the nodes of a tree have
+  consecutive ids, starting with its leftmost leaf and ending with
+  its root."""
+
+  def __init__(self) -> None:
+    self.kinds = array('B')
+    self.locs: list[Loc] = []
+    self.types: list[Type] = []
+    self.values: list[Any] = []
+    self.slots = array('l')
+    self.first_child = array('l')
+    self.child_count = array('l')
+    self.children = array('l')
+
+  def __len__(self) -> int:
+    return len(self.kinds)
+
+  def add(self, node: Expression) -> 'NodeRef':
+    """Copies the tree under `node` into the arena."""
+    # Nodes waiting to be stored, and whether their children already are.
+    # The ids of stored nodes wait in `ids` until their parent is stored.
+    pending = [(node, False)]
+    ids: list[int] = []
+    while pending:
+      node, children_stored = pending.pop()
+      value, child_nodes = _value_and_children(node)
+      if not children_stored:
+        pending.append((node, True))
+        pending.extend((child, False) for child in reversed(child_nodes))
+        continue
+      first = len(ids) - len(child_nodes)
+      self.first_child.append(len(self.children))
+      self.child_count.append(len(child_nodes))
+      self.children.extend(ids[first:])
+      del ids[first:]
+
+      ids.append(len(self.kinds))
+      self.kinds.append(_kind_of[type(node)])
+      self.locs.append(node.loc)
+      self.types.append(node.type)
+      self.values.append(value)
+      self.slots.append(node.slot if isinstance(node, Identifier) else -1)
+    return NodeRef(self, ids[0])
+
+  def child_ids(self, node_id: int) -> array:
+    start = self.first_child[node_id]
+    return self.children[start:start + self.child_count[node_id]]
+
+  def build(self, node_id: int) -> Expression:
+    """Returns the node with the given id as a tree of node objects."""
+    first_id = node_id
+    while self.child_count[first_id] > 0:
+      first_id = self.children[self.first_child[first_id]]
+    # Built nodes whose parent isn't built yet
+    built: dict[int, Expression] = {}
+    for i in range(first_id, node_id + 1):
+      built[i] = self._build_node(i, [built.pop(child) for child in self.child_ids(i)])
+    return built[node_id]
+
+  def _build_node(self, node_id: int, c: list[Expression]) -> Expression:
+    cls = node_classes[self.kinds[node_id]]
+    loc = self.locs[node_id]
+    t = self.types[node_id]
+    value = self.values[node_id]
+    if cls is Literal:
+      return Literal(loc, value, type=t)
+    if cls is Identifier:
+      return Identifier(loc, value, type=t, slot=self.slots[node_id])
+    if cls is BinaryOp:
+      return BinaryOp(loc, c[0], value, c[1], type=t)
+    if cls is IfStatement:
+      return IfStatement(loc, c[0], c[1], c[2], type=t)
+    if cls is Function:
+      name = c[0]
+      assert isinstance(name, Identifier)
+      return Function(loc, name, c[1:], type=t)
+    if cls is Unary:
+      return Unary(loc, value, c[0], type=t)
+    if cls is Block:
+      return Block(loc, c[:-1], c[-1], type=t)
+    if cls is Var:
+      val = c[0]
+      assert isinstance(val, Identifier)
+      return Var(loc, val, c[1], type=t)
+    return While(loc, c[0], c[1], type=t)
+
+  def store_types(self, node_id: int, node: Expression) -> None:
+    """Copies the types of a tree returned by `build` back into the arena."""
+    nodes = [node]
+    ids = [node_id]
+    while nodes:
+      node = nodes.pop()
+      node_id = ids.pop()
+      self.types[node_id] = node.type
+      nodes += _value_and_children(node)[1]
+      ids += self.child_ids(node_id)
+
+
+@dataclass(frozen=True, slots=True)
+class NodeRef:
+  """An AST stored in an `Arena`.
+
+  The type checker, interpreter and IR generator accept these
+  wherever they accept an `Expression`. They don't walk the arena
+  itself but `build` a tree of node objects for the duration of the
+  pass, so only ASTs kept between passes take less memory."""
+  arena: Arena
+  id: int
+
+  @property
+  def type(self) -> Type:
+    return self.arena.types[self.id]
+
+  def build(self) -> Expression:
+    return self.arena.build(self.id)
+
+
+type Tree = Expression | NodeRef
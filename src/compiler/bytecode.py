@@ -0,0 +1,296 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Callable
+from compiler import ast
+from compiler.int64 import INT_MAX, INT_MIN, divide, remainder, wrap
+from compiler.interpreter import Value
+from compiler.resolver import resolve
+from compiler.type import Bool, Int
+
+# Opcodes. Operands follow the opcode in the code array.
+CONST = 0          # CONST index: push constants[index]
+LOAD = 1           # LOAD slot: push frame[slot]
+STORE = 2          # STORE slot: pop into frame[slot]
+STORE_KEEP = 3     # STORE_KEEP slot: store the top of the stack without popping it
+POP = 4
+JUMP = 5           # JUMP target
+JUMP_IF_FALSE = 6  # JUMP_IF_FALSE target: pop, jump if false
+JUMP_OR_POP = 7    # JUMP_OR_POP value target: jump if the top is `value`, otherwise pop
+CALL = 8           # CALL builtin argc
+ADD = 9
+SUB = 10
+MUL = 11
+DIV = 12
+MOD = 13
+EQ = 14
+NE = 15
+LT = 16
+LE = 17
+GT = 18
+GE = 19
+NEG = 20
+NOT = 21
+RETURN = 22
+
+binary_opcodes = {
+  '+': ADD, '-': SUB, '*': MUL, '/': DIV, '%': MOD,
+  '==': EQ, '!=': NE, '<': LT, '<=': LE, '>': GT, '>=': GE,
+}
+unary_opcodes = {'-': NEG, 'not': NOT}
+
+builtin_names = ['print_int', 'print_bool', 'read_int']
+
+type Builtin = Callable[..., Value]
+
+
+def _print_int(a: int) -> None:
+  print(a)
+
+def _print_bool(a: bool) -> None:
+  print('true' if a else 'false')
+
+def _read_int() -> int:
+  return int(input())
+
+# Same input/output format as the compiled programs.
+default_builtins: list[Builtin] = [_print_int, _print_bool, _read_int]
+
+
+@dataclass
+class CodeObject:
+  """A program compiled to bytecode."""
+  code: array = field(default_factory=lambda: array('q'))
+  constants: list[Value] = field(default_factory=list)
+  frame_size: int = 0
+
+  def disassemble(self) -> list[str]:
+    names = {v: k for k, v in globals().items() if k.isupper() and isinstance(v, int)}
+    operand_counts = {CONST: 1, LOAD: 1, STORE: 1, STORE_KEEP: 1, JUMP: 1, JUMP_IF_FALSE: 1, JUMP_OR_POP: 2, CALL: 2}
+    lines = []
+    pc = 0
+    while pc < len(self.code):
+      op = self.code[pc]
+      operands = self.code[pc + 1:pc + 1 + operand_counts.get(op, 0)]
+      lines.append(' '.join([f'{pc}:', names[op], *map(str, operands)]))
+      pc += 1 + len(operands)
+    return lines
+
+
+def compile_program(root: ast.Tree) -> CodeObject:
+  """Compiles a program to bytecode.
+
+  Like the IR generator, this prints the result of the program
+  when the type checker has found it to be an Int or a Bool."""
+  if isinstance(root, ast.NodeRef):
+    root = root.build()
+  program = CodeObject(frame_size=resolve(root))
+  code = program.code
+  constant_indices: dict[tuple[type, Value], int] = {}
+
+  def emit(*words: int) -> None:
+    code.extend(words)
+
+  def emit_jump(op: int, *operands: int) -> int:
+    """Emits a jump with the target left open. Returns where to patch it in."""
+    emit(op, *operands, -1)
+    return len(code) - 1
+
+  def patch(position: int) -> None:
+    code[position] = len(code)
+
+  def constant(value: Value) -> int:
+    key = (type(value), value)
+    if key not in constant_indices:
+      constant_indices[key] = len(program.constants)
+      program.constants.append(value)
+    return constant_indices[key]
+
+  def variable_slot(node: ast.Identifier) -> int:
+    if node.slot < 0:
+      raise Exception(f'Error: {node.loc}: Variable not found: \"{node.name}\"')
+    return node.slot
+
+  def visit_statement(node: ast.Expression) -> None:
+    """Emits code for `node`, leaving nothing on the stack."""
+    match node:
+      case ast.Var():
+        visit(node.init)
+        emit(STORE, variable_slot(node.val))
+      case ast.BinaryOp() if node.op == '=' and isinstance(node.left, ast.Identifier):
+        visit(node.right)
+        emit(STORE, variable_slot(node.left))
+      case ast.While():
+        start = len(code)
+        visit(node.cond)
+        end = emit_jump(JUMP_IF_FALSE)
+        visit_statement(node.then)
+        emit(JUMP, start)
+        patch(end)
+      case ast.Literal():
+        pass
+      case _:
+        visit(node)
+        emit(POP)
+
+  def visit(node: ast.Expression) -> None:
+    """Emits code that pushes the value of `node`."""
+    match node:
+      case ast.Literal():
+        emit(CONST, constant(wrap(node.value) if type(node.value) is int else node.value))
+
+      case ast.Identifier():
+        emit(LOAD, variable_slot(node))
+
+      case ast.BinaryOp():
+        if node.op == '=':
+          if not isinstance(node.left, ast.Identifier):
+            raise Exception(f'Error: {node.loc}: Left side of assignment must be a variable name')
+          visit(node.right)
+          emit(STORE_KEEP, variable_slot(node.left))
+        elif node.op in ('and', 'or'):
+          visit(node.left)
+          end = emit_jump(JUMP_OR_POP, int(node.op == 'or'))
+          visit(node.right)
+          patch(end)
+        elif node.op in binary_opcodes:
+          visit(node.left)
+          visit(node.right)
+          emit(binary_opcodes[node.op])
+        else:
+          raise Exception(f'Error: {node.loc}: Unknown operator: \"{node.op}\"')
+
+      case ast.Unary():
+        if node.op not in unary_opcodes:
+          raise Exception(f'Error: {node.loc}: Unknown operator: \"{node.op}\"')
+        visit(node.right)
+        emit(unary_opcodes[node.op])
+
+      case ast.IfStatement():
+        visit(node.cond)
+        to_else = emit_jump(JUMP_IF_FALSE)
+        visit(node.then)
+        to_end = emit_jump(JUMP)
+        patch(to_else)
+        visit(node.els)
+        patch(to_end)
+
+      case ast.Block():
+        for statement in node.statements:
+          visit_statement(statement)
+        visit(node.result)
+
+      case ast.Var() | ast.While():
+        visit_statement(node)
+        emit(CONST, constant(None))
+
+      case ast.Function():
+        name = node.name.name
+        if name not in builtin_names:
+          raise Exception(f'Error: {node.loc}: Unknown function: \"{name}\"')
+        for arg in node.args:
+          visit(arg)
+        emit(CALL, builtin_names.index(name), len(node.args))
+
+      case _:
+        raise Exception("Unknown node type")
+
+  visit(root)
+  if root.type == Int:
+    emit(CALL, builtin_names.index('print_int'), 1)
+  elif root.type == Bool:
+    emit(CALL, builtin_names.index('print_bool'), 1)
+  emit(RETURN)
+  return program
+
+
+def run(program: CodeObject, builtins: list[Builtin] = default_builtins) -> Value:
+  """Runs a program and returns the value left on the stack.
+
+  Integers wrap around to 64 bits and division truncates, as in the
+  compiled program."""
+  # Indexing a list is faster than indexing the array, which would
+  # create a new int object on every access.
+  code = program.code.tolist()
+  constants = program.constants
+  frame: list[Value] = [None] * program.frame_size
+  stack: list = []
+  push = stack.append
+  pop = stack.pop
+  pc = 0
+  while True:
+    op = code[pc]
+    if op == LOAD:
+      push(frame[code[pc + 1]])
+      pc += 2
+    elif op == CONST:
+      push(constants[code[pc + 1]])
+      pc += 2
+    elif op == STORE:
+      frame[code[pc + 1]] = pop()
+      pc += 2
+    elif op == JUMP_IF_FALSE:
+      if pop():
+        pc += 2
+      else:
+        pc = code[pc + 1]
+    elif op == JUMP:
+      pc = code[pc + 1]
+    elif op == STORE_KEEP:
+      frame[code[pc + 1]] = stack[-1]
+      pc += 2
+    elif op == POP:
+      pop()
+      pc += 1
+    elif op >= ADD and op <= GE:
+      b = pop()
+      a = stack[-1]
+      # Results are only wrapped when they overflow, which is rare
+      # and slower to check for with a call.
+      if op == ADD:
+        c = a + b
+        stack[-1] = c if INT_MIN <= c <= INT_MAX else wrap(c)
+      elif op == SUB:
+        c = a - b
+        stack[-1] = c if INT_MIN <= c <= INT_MAX else wrap(c)
+      elif op == LT:
+        stack[-1] = a < b
+      elif op == MUL:
+        c = a * b
+        stack[-1] = c if INT_MIN <= c <= INT_MAX else wrap(c)
+      elif op == MOD:
+        stack[-1] = remainder(a, b)
+      elif op == EQ:
+        stack[-1] = a == b
+      elif op == NE:
+        stack[-1] = a != b
+      elif op == LE:
+        stack[-1] = a <= b
+      elif op == GT:
+        stack[-1] = a > b
+      elif op == GE:
+        stack[-1] = a >= b
+      else:
+        stack[-1] = divide(a, b)
+      pc += 1
+    elif op == JUMP_OR_POP:
+      if stack[-1] is bool(code[pc + 1]):
+        pc = code[pc + 2]
+      else:
+        pop()
+        pc += 3
+    elif op == NOT:
+      stack[-1] = not stack[-1]
+      pc += 1
+    elif op == NEG:
+      stack[-1] = wrap(-stack[-1])
+      pc += 1
+    elif op == CALL:
+      argc = code[pc + 2]
+      args = stack[len(stack) - argc:]
+      del stack[len(stack) - argc:]
+      push(builtins[code[pc + 1]](*args))
+      pc += 3
+    elif op == RETURN:
+      return stack[-1] if stack else None
+    else:
+      raise Exception(f'Unknown opcode {op} at {pc}')
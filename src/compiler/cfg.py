@@ -0,0 +1,198 @@
+from dataclasses import dataclass, field
+from compiler import ir
+
+
+@dataclass(eq=False)
+class BasicBlock:
+  """A run of instructions that is only entered at the top and only left at the bottom.
+
+  `instructions` starts with the block's labels, if any, and ends with
+  its `Jump` or `CondJump`, if any. A block that doesn't end in a jump
+  falls through to the next block, or exits the program if it is the last."""
+  index: int
+  instructions: list[ir.Instruction]
+  successors: list['BasicBlock'] = field(default_factory=list)
+  predecessors: list['BasicBlock'] = field(default_factory=list)
+
+  @property
+  def labels(self) -> list[ir.Label]:
+    labels = []
+    for insn in self.instructions:
+      if not isinstance(insn, ir.Label):
+        break
+      labels.append(insn)
+    return labels
+
+  @property
+  def terminator(self) -> ir.Jump | ir.CondJump | None:
+    last = self.instructions[-1] if self.instructions else None
+    return last if isinstance(last, (ir.Jump, ir.CondJump)) else None
+
+  def __repr__(self) -> str:
+    return f'BasicBlock({self.index})'
+
+
+@dataclass(eq=False)
+class Loop:
+  """A natural loop: the header and every block that can reach a back
+  edge to the header without going through it."""
+  header: BasicBlock
+  blocks: set[BasicBlock]
+
+  def exits(self) -> list[tuple[BasicBlock, BasicBlock]]:
+    """The edges leaving the loop, as (block in loop, block outside) pairs."""
+    return [(block, successor) for block in self.blocks for successor in block.successors if successor not in self.blocks]
+
+
+class ControlFlowGraph:
+  """The basic blocks of a list of IR instructions, in their original order.
+
+  The first block is the entry. Blocks that can't be reached from it
+  are kept, with no predecessors. Dominators are computed once, so
+  build a new graph after changing the edges."""
+
+  def __init__(self, instructions: list[ir.Instruction]):
+    self.blocks: list[BasicBlock] = []
+    current: list[ir.Instruction] = []
+    for insn in instructions:
+      if isinstance(insn, ir.Label) and current and not isinstance(current[-1], ir.Label):
+        self.blocks.append(BasicBlock(len(self.blocks), current))
+        current = []
+      current.append(insn)
+      if isinstance(insn, (ir.Jump, ir.CondJump)):
+        self.blocks.append(BasicBlock(len(self.blocks), current))
+        current = []
+    if current or not self.blocks:
+      self.blocks.append(BasicBlock(len(self.blocks), current))
+
+    self.block_of_label: dict[str, BasicBlock] = {}
+    for block in self.blocks:
+      for label in block.labels:
+        self.block_of_label[label.name] = block
+
+    for block in self.blocks:
+      match block.terminator:
+        case ir.Jump() as jump:
+          targets = [self.target(jump.label)]
+        case ir.CondJump() as cond_jump:
+          targets = [self.target(cond_jump.then_label), self.target(cond_jump.else_label)]
+        case _:
+          targets = self.blocks[block.index + 1:block.index + 2]
+      for successor in targets:
+        if successor not in block.successors:
+          block.successors.append(successor)
+          successor.predecessors.append(block)
+
+    self._idom: list[BasicBlock | None] | None = None
+
+  @property
+  def entry(self) -> BasicBlock:
+    return self.blocks[0]
+
+  def target(self, label: ir.Label) -> BasicBlock:
+    if label.name not in self.block_of_label:
+      raise Exception(f'Error: {label.location}: Unknown label: "{label.name}"')
+    return self.block_of_label[label.name]
+
+  def instructions(self) -> list[ir.Instruction]:
+    """Returns the instructions of all blocks, in order."""
+    return [insn for block in self.blocks for insn in block.instructions]
+
+  def reverse_postorder(self) -> list[BasicBlock]:
+    """Returns the blocks reachable from the entry, each block before
+    its successors except along loop back edges."""
+    postorder: list[BasicBlock] = []
+    visited = [False] * len(self.blocks)
+    visited[0] = True
+    # Iterative depth-first search: each stack entry is a block and the
+    # number of its successors visited. They are visited last to first,
+    # so that the order follows the instruction list where it can.
+    stack = [(self.entry, 0)]
+    while stack:
+      block, i = stack[-1]
+      if i < len(block.successors):
+        stack[-1] = (block, i + 1)
+        successor = block.successors[-1 - i]
+        if not visited[successor.index]:
+          visited[successor.index] = True
+          stack.append((successor, 0))
+      else:
+        stack.pop()
+        postorder.append(block)
+    postorder.reverse()
+    return postorder
+
+  def immediate_dominators(self) -> list[BasicBlock | None]:
+    """Returns the immediate dominator of each block, by block index.
+
+    The entry is its own immediate dominator, and unreachable blocks have
+    none. Computed with the algorithm of Cooper, Harvey and Kennedy,
+    "A Simple, Fast Dominance Algorithm"."""
+    if self._idom is not None:
+      return self._idom
+    order = self.reverse_postorder()
+    rpo_number = [-1] * len(self.blocks)
+    for number, block in enumerate(order):
+      rpo_number[block.index] = number
+    idom: list[BasicBlock | None] = [None] * len(self.blocks)
+    idom[0] = self.entry
+
+    def intersect(a: BasicBlock, b: BasicBlock) -> BasicBlock:
+      while a is not b:
+        while rpo_number[a.index] > rpo_number[b.index]:
+          a = idom[a.index]  # type: ignore[assignment]
+        while rpo_number[b.index] > rpo_number[a.index]:
+          b = idom[b.index]  # type: ignore[assignment]
+      return a
+
+    changed = True
+    while changed:
+      changed = False
+      for block in order[1:]:
+        new_idom: BasicBlock | None = None
+        for predecessor in block.predecessors:
+          if idom[predecessor.index] is not None:
+            new_idom = predecessor if new_idom is None else intersect(predecessor, new_idom)
+        if idom[block.index] is not new_idom:
+          idom[block.index] = new_idom
+          changed = True
+    self._idom = idom
+    return idom
+
+  def dominates(self, a: BasicBlock, b: BasicBlock) -> bool:
+    """Tells whether every path from the entry to `b` goes through `a`."""
+    idom = self.immediate_dominators()
+    if idom[b.index] is None:
+      return False
+    while b is not a:
+      if b is self.entry:
+        return False
+      b = idom[b.index]  # type: ignore[assignment]
+    return True
+
+  def dominator_tree(self) -> list[list[BasicBlock]]:
+    """Returns the blocks immediately dominated by each block, by block index."""
+    children: list[list[BasicBlock]] = [[] for _ in self.blocks]
+    for block, parent in zip(self.blocks, self.immediate_dominators()):
+      if parent is not None and block is not self.entry:
+        children[parent.index].append(block)
+    return children
+
+  def natural_loops(self) -> list[Loop]:
+    """Returns the natural loops, inner loops before the loops containing them.
+
+    Back edges to the same header make up one loop."""
+    loops: dict[BasicBlock, Loop] = {}
+    for block in self.reverse_postorder():
+      for header in block.successors:
+        if not self.dominates(header, block):
+          continue
+        loop = loops.setdefault(header, Loop(header, {header}))
+        stack = [block]
+        while stack:
+          member = stack.pop()
+          # Unreachable blocks may jump into the loop, but aren't part of it.
+          if member not in loop.blocks and self.dominates(header, member):
+            loop.blocks.add(member)
+            stack.extend(member.predecessors)
+    return sorted(loops.values(), key=lambda loop: len(loop.blocks))
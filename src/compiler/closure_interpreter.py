@@ -0,0 +1,167 @@
+import operator
+from typing import Any, Callable
+from compiler import ast, symtab as stdlib
+from compiler.interpreter import Value
+from compiler.resolver import resolve
+from compiler.symtab import SymTab
+
+# An expression compiled into a Python function that evaluates it.
+type Code = Callable[[], Value]
+
+# C implementations of the standard operators, used instead of the
+# functions in the symbol table when the program uses the standard ones.
+_builtin_operators: dict[Callable, Callable] = {
+  stdlib.op_plus: operator.add,
+  stdlib.op_minus: operator.sub,
+  stdlib.op_asterisk: operator.mul,
+  stdlib.op_modulo: operator.mod,
+  stdlib.op_eq: operator.eq,
+  stdlib.op_not_eq: operator.ne,
+  stdlib.op_lt: operator.lt,
+  stdlib.op_lteq: operator.le,
+  stdlib.op_gt: operator.gt,
+  stdlib.op_gteq: operator.ge,
+  stdlib.op_not: operator.not_,
+  stdlib.op_unary_minus: operator.neg,
+}
+
+
+def interpret(node: ast.Tree, symtab: SymTab) -> Value:
+  """Same as `interpreter.interpret`, but compiles the program first."""
+  return compile_program(node, symtab)()
+
+
+def compile_program(node: ast.Tree, symtab: SymTab) -> Code:
+  """Turns the program into a tree of closures that can be run repeatedly.
+
+  Variables are resolved to slots of one frame, and operators, functions
+  and global variables are looked up in `symtab` once, here, instead of
+  on every evaluation."""
+  if isinstance(node, ast.NodeRef):
+    node = node.build()
+  frame: list[Any] = [None] * resolve(node)
+
+  def find(name: str) -> SymTab | None:
+    current_tab: SymTab | None = symtab
+    while current_tab is not None and name not in current_tab.locals:
+      current_tab = current_tab.parent
+    return current_tab
+
+  def fail(message: str) -> Code:
+    def run() -> Value:
+      raise Exception(message)
+    return run
+
+  def operation(name: str, node: ast.BinaryOp | ast.Unary) -> Callable:
+    table = find(name)
+    if table is None:
+      def missing(*args: Value) -> Value:
+        raise Exception(f'Error: {node.loc}: Unknown operator: \"{node.op}\"')
+      return missing
+    fun = table.locals[name]
+    return _builtin_operators.get(fun, fun)
+
+  def visit(node: ast.Expression) -> Code:
+    match node:
+      case ast.Literal():
+        value = node.value
+        return lambda: value
+
+      case ast.Identifier():
+        slot = node.slot
+        if slot >= 0:
+          return lambda: frame[slot]
+        table = find(node.name)
+        if table is None:
+          return fail(f'Error: {node.loc}: Variable not found: \"{node.name}\"')
+        variables = table.locals
+        name = node.name
+        return lambda: variables[name]
+
+      case ast.BinaryOp():
+        left = visit(node.left)
+        right = visit(node.right)
+
+        if node.op == '=' and isinstance(node.left, ast.Identifier):
+          target = node.left
+          if target.slot >= 0:
+            slot = target.slot
+            def assign_slot() -> Value:
+              frame[slot] = value = right()
+              return value
+            return assign_slot
+          table = find(target.name)
+          if table is None:
+            return fail(f'Error: {node.loc}: Variable not found: \"{target.name}\"')
+          variables = table.locals
+          name = target.name
+          def assign() -> Value:
+            variables[name] = value = right()
+            return value
+          return assign
+
+        fun = operation(node.op, node)
+        if node.op == 'and':
+          def run_and() -> Value:
+            a = left()
+            if a is False:
+              return False
+            return fun(a, right())
+          return run_and
+        if node.op == 'or':
+          def run_or() -> Value:
+            a = left()
+            if a is True:
+              return True
+            return fun(a, right())
+          return run_or
+        return lambda: fun(left(), right())
+
+      case ast.IfStatement():
+        cond = visit(node.cond)
+        then = visit(node.then)
+        els = visit(node.els)
+        return lambda: then() if cond() else els()
+
+      case ast.Var():
+        init = visit(node.init)
+        slot = node.val.slot
+        def declare() -> Value:
+          frame[slot] = init()
+          return None
+        return declare
+
+      case ast.Block():
+        statements = [visit(statement) for statement in node.statements]
+        result = visit(node.result)
+        def block() -> Value:
+          for statement in statements:
+            statement()
+          return result()
+        return block
+
+      case ast.Unary():
+        right = visit(node.right)
+        unary_fun = operation(f'unary_{node.op}', node)
+        return lambda: unary_fun(right())
+
+      case ast.Function():
+        args = [visit(arg) for arg in node.args]
+        table = find(node.name.name)
+        if table is None:
+          return fail(f'Error: Unknown operator: \"{node.name.name}\"')
+        function = table.locals[node.name.name]
+        return lambda: function(*[arg() for arg in args])
+
+      case ast.While():
+        cond = visit(node.cond)
+        body = visit(node.then)
+        def loop() -> Value:
+          while cond():
+            body()
+          return None
+        return loop
+
+    raise Exception("Unknown node type")
+
+  return visit(node)
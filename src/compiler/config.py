@@ -0,0 +1,73 @@
+import re
+from dataclasses import dataclass, fields, replace
+from typing import Any
+
+
+@dataclass(frozen=True)
+class PipelineConfig:
+  """Settings for the optional stages of `call_compiler`."""
+
+  # Run the program in the sandboxed interpreter before type checking.
+  # Off by default: compiling should not mean running the program.
+  evaluate: bool = False
+  eval_max_steps: int = 1_000_000
+  eval_max_seconds: float = 1.0
+  # IR optimization passes
+  constant_propagation: bool = True
+  algebraic_simplification: bool = True
+  value_numbering: bool = True
+  # Also reuse values computed in dominating blocks
+  global_value_numbering: bool = False
+  loop_invariant_code_motion: bool = True
+  # Branch directly on conditions instead of on Bools computed from them
+  jump_threading: bool = True
+  copy_propagation: bool = True
+  # Keep variables in registers instead of on the stack
+  register_allocation: bool = True
+  # Rewrite short instruction sequences in the generated assembly
+  peephole: bool = True
+  # Comments in the generated assembly: 'none', 'loc' or 'ir'
+  asm_comments: str = 'none'
+  # Encode and link in-process instead of running as and ld
+  integrated_assembler: bool = True
+
+  def with_options(self, options: dict[str, Any], limits_only_lowered: bool = False) -> 'PipelineConfig':
+    """Returns a copy with the given fields replaced.
+
+    With `limits_only_lowered`, as for server requests, the
+    evaluation budgets can't be raised above the current ones."""
+    known = {f.name for f in fields(self)}
+    changes: dict[str, Any] = {}
+    for name, value in options.items():
+      if name not in known:
+        raise Exception(f'Unknown option: "{name}"')
+      default = getattr(self, name)
+      if isinstance(default, float) and type(value) is int:
+        value = float(value)
+      if type(value) is not type(default):
+        raise Exception(f'Invalid value for option "{name}": {value!r}')
+      if limits_only_lowered and name.startswith('eval_max_'):
+        value = min(value, default)
+      changes[name] = value
+    return replace(self, **changes)
+
+  def with_flag(self, arg: str) -> 'PipelineConfig | None':
+    """Applies a command line flag like `--evaluate`, `--no-evaluate`
+    or `--eval-max-steps=1000`. Returns None for other arguments."""
+    m = re.fullmatch(r'--(no-)?([a-z-]+)(?:=(.+))?', arg)
+    if m is None:
+      return None
+    name = m[2].replace('-', '_')
+    if name not in {f.name for f in fields(self)}:
+      return None
+    default = getattr(self, name)
+    value: Any
+    if isinstance(default, bool):
+      if m[3] is not None:
+        raise Exception(f"Flag {arg} doesn't take a value")
+      value = m[1] is None
+    elif m[1] is not None or m[3] is None:
+      raise Exception(f"Flag --{m[2]} requires a value")
+    else:
+      value = type(default)(m[3])
+    return self.with_options({name: value})
@@ -0,0 +1,149 @@
+from collections import Counter
+from compiler import ir
+from compiler.cfg import BasicBlock, ControlFlowGraph
+from compiler.int64 import wrap
+from compiler.interpreter import Value
+from compiler.ir import IRVar
+from compiler.liveness import definition
+from compiler.Loc import Loc
+from compiler.ir_interpreter import intrinsic_functions
+
+
+class _Varying:
+  """The lattice value of a variable that isn't a known constant."""
+  def __repr__(self) -> str:
+    return 'VARYING'
+
+VARYING = _Varying()
+_missing = object()
+
+# What is known about each variable at some point. A variable that is
+# missing hasn't been assigned on any path that reaches the point yet.
+type State = dict[IRVar, Value | _Varying]
+
+
+def _same(a: Value | _Varying, b: Value | _Varying) -> bool:
+  # `True == 1` in Python, but a Bool constant is not an Int constant.
+  return a is b or (type(a) is type(b) and a == b)
+
+
+def _meet(into: State, state: State) -> bool:
+  """Merges `state` into `into`. Returns whether `into` changed."""
+  changed = False
+  for var, value in state.items():
+    if var not in into:
+      into[var] = value
+      changed = True
+    elif into[var] is not VARYING and not _same(into[var], value):
+      into[var] = VARYING
+      changed = True
+  return changed
+
+
+def _transfer(state: State, insn: ir.Instruction) -> None:
+  match insn:
+    case ir.LoadIntConst():
+      state[insn.dest] = wrap(insn.value)
+    case ir.LoadBoolConst():
+      state[insn.dest] = insn.value
+    case ir.Copy():
+      if insn.source in state:
+        state[insn.dest] = state[insn.source]
+      else:
+        state.pop(insn.dest, None)
+    case ir.Call():
+      fun = intrinsic_functions.get(insn.fun.name)
+      args = [state.get(arg, _missing) for arg in insn.args]
+      if fun is None or any(arg is VARYING for arg in args):
+        state[insn.dest] = VARYING
+      elif any(arg is _missing for arg in args):
+        state.pop(insn.dest, None)
+      else:
+        try:
+          state[insn.dest] = fun(*args)
+        except ArithmeticError:
+          # Division by zero and overflow trap at run time, so they
+          # must stay in the program.
+          state[insn.dest] = VARYING
+
+
+def _load(location: Loc, value: int, dest: IRVar) -> ir.Instruction:
+  if isinstance(value, bool):
+    return ir.LoadBoolConst(location, value, dest)
+  return ir.LoadIntConst(location, value, dest)
+
+
+def int_constants(instructions: list[ir.Instruction]) -> dict[IRVar, int]:
+  """The variables whose only definition loads an Int constant.
+
+  Such a variable holds that constant everywhere it can be read."""
+  definitions = Counter(dest for insn in instructions if (dest := definition(insn)) is not None)
+  return {
+    insn.dest: wrap(insn.value) for insn in instructions
+    if isinstance(insn, ir.LoadIntConst) and definitions[insn.dest] == 1
+  }
+
+
+def propagate_constants(instructions: list[ir.Instruction]) -> list[ir.Instruction]:
+  """Sparse conditional constant propagation.
+
+  Finds the variables that have a known constant value, considering only
+  the blocks that can be reached when the conditions known to be constant
+  are taken into account. Intrinsic calls and copies with a constant result
+  become loads of the constant, conditional jumps on a constant become
+  jumps, and blocks found unreachable are dropped."""
+  graph = ControlFlowGraph(instructions)
+  in_states: dict[BasicBlock, State] = {graph.entry: {}}
+  worklist = [graph.entry]
+  queued = {graph.entry}
+
+  def taken_label(jump: ir.CondJump, state: State) -> ir.Label | None:
+    cond = state.get(jump.cond, VARYING)
+    if cond is True or jump.then_label == jump.else_label:
+      return jump.then_label
+    if cond is False:
+      return jump.else_label
+    return None
+
+  def executable_successors(block: BasicBlock, state: State) -> list[BasicBlock]:
+    jump = block.terminator
+    if isinstance(jump, ir.CondJump) and (label := taken_label(jump, state)) is not None:
+      return [graph.target(label)]
+    return block.successors
+
+  while worklist:
+    block = worklist.pop()
+    queued.remove(block)
+    state = dict(in_states[block])
+    for insn in block.instructions:
+      _transfer(state, insn)
+    for successor in executable_successors(block, state):
+      if successor not in in_states:
+        in_states[successor] = dict(state)
+      elif not _meet(in_states[successor], state) or successor in queued:
+        continue
+      worklist.append(successor)
+      queued.add(successor)
+
+  kept = [block for block in graph.blocks if block in in_states]
+  result: list[ir.Instruction] = []
+  for i, block in enumerate(kept):
+    state = dict(in_states[block])
+    for insn in block.instructions:
+      new_insn = insn
+      match insn:
+        case ir.Call() | ir.Copy():
+          _transfer(state, insn)
+          value = state.get(insn.dest, VARYING)
+          if isinstance(value, int) and (isinstance(insn, ir.Copy) or insn.fun.name in intrinsic_functions):
+            new_insn = _load(insn.location, value, insn.dest)
+        case ir.CondJump():
+          if (label := taken_label(insn, state)) is not None:
+            new_insn = ir.Jump(insn.location, label)
+        case _:
+          _transfer(state, insn)
+      # A jump to the next block isn't needed.
+      if isinstance(new_insn, ir.Jump) and i + 1 < len(kept) and graph.target(new_insn.label) is kept[i + 1]:
+        continue
+      result.append(new_insn)
+  return result
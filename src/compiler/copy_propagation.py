@@ -0,0 +1,115 @@
+from dataclasses import replace
+from compiler import ir
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import IRVar
+from compiler.ir_interpreter import intrinsic_functions
+from compiler.liveness import definition, live_out, uses
+
+# Copies known to hold at some point: destination -> source.
+type Copies = dict[IRVar, IRVar]
+
+# Intrinsics that can trap, which must stay even if their result is unused.
+trapping_intrinsics = frozenset(['/', '%'])
+
+
+def _kill(copies: Copies, var: IRVar) -> None:
+  copies.pop(var, None)
+  for dest in [dest for dest, source in copies.items() if source == var]:
+    del copies[dest]
+
+
+def _substitute(insn: ir.Instruction, copies: Copies) -> ir.Instruction:
+  match insn:
+    case ir.Copy() if insn.source in copies:
+      return replace(insn, source=copies[insn.source])
+    case ir.Call() if any(arg in copies for arg in insn.args):
+      return replace(insn, args=[copies.get(arg, arg) for arg in insn.args])
+    case ir.CondJump() if insn.cond in copies:
+      return replace(insn, cond=copies[insn.cond])
+  return insn
+
+
+def propagate_copies(instructions: list[ir.Instruction]) -> list[ir.Instruction]:
+  """Replaces reads of the destination of a `Copy` with reads of its source,
+  where no path from the copy has changed either of them."""
+  graph = ControlFlowGraph(instructions)
+  order = graph.reverse_postorder()
+  # None means "not computed yet", which acts as the set of all copies.
+  in_copies: list[Copies | None] = [None] * len(graph.blocks)
+  in_copies[0] = {}
+  out_copies: list[Copies | None] = [None] * len(graph.blocks)
+
+  def transfer(copies: Copies, insn: ir.Instruction) -> None:
+    dest = definition(insn)
+    if dest is not None:
+      _kill(copies, dest)
+      if isinstance(insn, ir.Copy) and insn.source != dest:
+        copies[dest] = insn.source
+
+  changed = True
+  while changed:
+    changed = False
+    for block in order:
+      if block is not graph.entry:
+        known = [c for p in block.predecessors if (c := out_copies[p.index]) is not None]
+        copies = dict(known[0]) if known else {}
+        for other in known[1:]:
+          copies = {dest: source for dest, source in copies.items() if other.get(dest) == source}
+        in_copies[block.index] = copies
+      copies = dict(in_copies[block.index] or {})
+      for insn in block.instructions:
+        transfer(copies, _substitute(insn, copies))
+      if copies != out_copies[block.index]:
+        out_copies[block.index] = copies
+        changed = True
+
+  for block in graph.blocks:
+    copies = dict(in_copies[block.index] or {})
+    new_instructions = []
+    for insn in block.instructions:
+      insn = _substitute(insn, copies)
+      transfer(copies, insn)
+      new_instructions.append(insn)
+    block.instructions = new_instructions
+  return graph.instructions()
+
+
+def has_side_effects(insn: ir.Instruction) -> bool:
+  """Tells whether an instruction must be kept even if its result is unused."""
+  if isinstance(insn, ir.Call):
+    return insn.fun.name not in intrinsic_functions or insn.fun.name in trapping_intrinsics
+  return definition(insn) is None
+
+
+def eliminate_dead_code(instructions: list[ir.Instruction]) -> list[ir.Instruction]:
+  """Removes instructions whose results are never read, and copies of
+  a variable to itself."""
+  while True:
+    graph = ControlFlowGraph(instructions)
+    removed = 0
+    for block, live in zip(graph.blocks, live_out(graph)):
+      live = set(live)
+      kept: list[ir.Instruction] = []
+      for insn in reversed(block.instructions):
+        dest = definition(insn)
+        self_copy = isinstance(insn, ir.Copy) and insn.source == dest
+        if self_copy or (dest is not None and dest not in live and not has_side_effects(insn)):
+          removed += 1
+          continue
+        if dest is not None:
+          live.discard(dest)
+        live.update(uses(insn))
+        kept.append(insn)
+      kept.reverse()
+      block.instructions = kept
+    if removed == 0:
+      return instructions
+    instructions = graph.instructions()
+
+
+def remove_copies(instructions: list[ir.Instruction]) -> tuple[list[ir.Instruction], int]:
+  """Copy propagation followed by dead code elimination.
+
+  Returns the new instructions and the number of instructions removed."""
+  result = eliminate_dead_code(propagate_copies(instructions))
+  return result, len(instructions) - len(result)
@@ -0,0 +1,83 @@
+import struct
+from compiler.x86_encoder import ObjectCode
+
+# Where the executable is loaded, headers and all
+base_address = 0x400000
+
+_elf_header = struct.Struct('<16sHHIQQQIHHHHHH')
+_program_header = struct.Struct('<IIQQQQQQ')
+
+_PT_LOAD = 1
+_PT_GNU_STACK = 0x6474E551
+_PF_X, _PF_W, _PF_R = 1, 2, 4
+
+
+def _align(offset: int, alignment: int) -> int:
+  return (offset + alignment - 1) // alignment * alignment
+
+
+def link(objects: list[ObjectCode], entry: str = '_start') -> bytes:
+  """Links machine code into a static ELF64 executable for x86-64 Linux.
+
+  The code of each object is placed one after another, 16-byte aligned,
+  in a single read-only, executable segment. Labels declared global are
+  visible to the other objects. There are no section headers or symbol
+  tables, so debuggers see only the machine code."""
+  headers_size = _elf_header.size + 2 * _program_header.size
+  starts = []
+  end = headers_size
+  for obj in objects:
+    start = _align(end, 16)
+    starts.append(start)
+    end = start + len(obj.code)
+
+  global_addresses: dict[str, int] = {}
+  for obj, start in zip(objects, starts):
+    for name in obj.global_symbols & obj.labels.keys():
+      if name in global_addresses:
+        raise Exception(f'Symbol defined in multiple objects: {name}')
+      global_addresses[name] = base_address + start + obj.labels[name]
+  if entry not in global_addresses:
+    raise Exception(f'Undefined entry point: {entry}')
+
+  # Padding between objects traps if executed.
+  image = bytearray(b'\xCC' * end)
+  for obj, start in zip(objects, starts):
+    image[start:start + len(obj.code)] = obj.code
+    for relocation in obj.relocations:
+      if relocation.symbol in obj.labels:
+        target = base_address + start + obj.labels[relocation.symbol]
+      elif relocation.symbol in global_addresses:
+        target = global_addresses[relocation.symbol]
+      else:
+        raise Exception(f'Undefined symbol: {relocation.symbol}')
+      field = start + relocation.offset
+      if relocation.kind == 'pc32':
+        target -= base_address + field + 4
+      image[field:field + 4] = target.to_bytes(4, 'little', signed=True)
+
+  image[:headers_size] = _elf_header.pack(
+    b'\x7fELF\x02\x01\x01',  # 64-bit, little-endian, version 1
+    2,  # e_type: executable
+    62,  # e_machine: x86-64
+    1,  # e_version
+    global_addresses[entry],
+    _elf_header.size,  # e_phoff: program headers follow
+    0,  # e_shoff: no section headers
+    0,  # e_flags
+    _elf_header.size,
+    _program_header.size,
+    2,  # e_phnum
+    64,  # e_shentsize
+    0,  # e_shnum
+    0,  # e_shstrndx
+  ) + _program_header.pack(
+    _PT_LOAD, _PF_R | _PF_X,
+    0, base_address, base_address,  # offset, virtual and physical address
+    end, end,  # size in the file and in memory
+    0x1000,
+  ) + _program_header.pack(
+    # Keeps the stack non-executable
+    _PT_GNU_STACK, _PF_R | _PF_W, 0, 0, 0, 0, 0, 16,
+  )
+  return bytes(image)
@@ -0,0 +1,27 @@
+# Integer arithmetic with the semantics of the generated code: 64-bit
+# two's complement that wraps around on overflow, and division that
+# truncates towards zero like `idivq`.
+
+INT_MIN = -2**63
+INT_MAX = 2**63 - 1
+
+
+def wrap(a: int) -> int:
+  """Wraps an integer around to 64 bits, like the native arithmetic does."""
+  return (a - INT_MIN) % 2**64 + INT_MIN
+
+
+def divide(a: int, b: int) -> int:
+  # Division by zero and INT_MIN / -1 trap natively, so they raise here.
+  if b == 0:
+    raise ZeroDivisionError('Division by zero')
+  q = abs(a) // abs(b)
+  q = q if (a < 0) == (b < 0) else -q
+  if q > INT_MAX:
+    raise OverflowError('Division overflow')
+  return q
+
+
+def remainder(a: int, b: int) -> int:
+  # The remainder has the sign of the dividend.
+  return a - b * divide(a, b)
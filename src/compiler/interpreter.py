@@ -1,15 +1,41 @@
+import time
+from dataclasses import dataclass, field
 from typing import Any
 from compiler import ast
-from compiler.symtab import SymTab
+from compiler.symtab import SymTab, TopLevel
 
 type Value = int | bool | None
 
-def interpret(node: ast.Expression, symtab: SymTab) -> Value:
+
+class EvaluationLimitExceeded(Exception):
+  pass
+
+
+class Budget:
+  """Limits the number of nodes `interpret` may visit and the time it may take."""
+  def __init__(self, max_steps: int, max_seconds: float):
+    self.steps_left = max_steps
+    self.deadline = time.monotonic() + max_seconds
+
+  def step(self, node: ast.Expression) -> None:
+    self.steps_left -= 1
+    if self.steps_left < 0:
+      raise EvaluationLimitExceeded(f'Error: {node.loc}: evaluation step limit exceeded')
+    # Reading the clock is comparatively slow, so only do it now and then
+    if self.steps_left % 1024 == 0 and time.monotonic() > self.deadline:
+      raise EvaluationLimitExceeded(f'Error: {node.loc}: evaluation time limit exceeded')
+
+
+def interpret(node: ast.Tree, symtab: SymTab, budget: Budget | None = None) -> Value:
+  if budget is not None and isinstance(node, ast.Expression):
+    budget.step(node)
   match node:
     case ast.Literal():
       return node.value
 
     case ast.Identifier():
+      if node.slot >= 0:
+        return symtab.slots[node.slot]
       current_tab = symtab
       while True:
         if node.name not in current_tab.locals.keys():
@@ -21,7 +47,7 @@ def interpret(node: ast.Expression, symtab: SymTab) -> Value:
           return current_tab.locals[node.name]
 
     case ast.BinaryOp():
-      a: Any = interpret(node.left, symtab)
+      a: Any = interpret(node.left, symtab, budget)
 
       if node.op == "or" and a is True:
         return True
@@ -32,6 +58,10 @@ def interpret(node: ast.Expression, symtab: SymTab) -> Value:
       if node.op == '=':
 
         if isinstance(node.left, ast.Identifier):
+          if node.left.slot >= 0:
+            expr = interpret(node.right, symtab, budget)
+            symtab.slots[node.left.slot] = expr
+            return expr
           identifier = node.left.name
           current_tab = symtab
           while True:
@@ -41,11 +71,11 @@ def interpret(node: ast.Expression, symtab: SymTab) -> Value:
               else:
                 raise Exception(f'Error: {node.loc}: Variable not found: \"{identifier}\"')
             else:
-              expr = interpret(node.right, symtab)
+              expr = interpret(node.right, symtab, budget)
               current_tab.locals[identifier] = expr
               return expr
 
-      b: Any = interpret(node.right, symtab)
+      b: Any = interpret(node.right, symtab, budget)
 
       current_tab = symtab
       while True:
@@ -58,28 +88,31 @@ def interpret(node: ast.Expression, symtab: SymTab) -> Value:
           return current_tab.locals[node.op](a,b)
 
     case ast.IfStatement():
-      if interpret(node.cond, symtab):
-        return interpret(node.then, symtab)
+      if interpret(node.cond, symtab, budget):
+        return interpret(node.then, symtab, budget)
       if node.els is None:
         return None
-      return interpret(node.els, symtab)
+      return interpret(node.els, symtab, budget)
 
     case ast.Var():
       identifier = node.val.name
-      expr = interpret(node.init, symtab)
-      symtab.locals[identifier] = expr
+      expr = interpret(node.init, symtab, budget)
+      if node.val.slot >= 0:
+        symtab.set_slot(node.val.slot, expr)
+      else:
+        symtab.locals[identifier] = expr
       return None
 
     case ast.Block():
-      block_tab = SymTab[Any]({}, symtab)
+      block_tab = symtab.child()
       for statement in node.statements:
-        interpret(statement, block_tab)
+        interpret(statement, block_tab, budget)
       if node.result is None:
         return None
-      return interpret(node.result, block_tab)
+      return interpret(node.result, block_tab, budget)
 
     case ast.Unary():
-      c: Any = interpret(node.right, symtab)
+      c: Any = interpret(node.right, symtab, budget)
       current_tab = symtab
       while True:
         if f"unary_{node.op}" not in current_tab.locals.keys():
@@ -90,11 +123,67 @@ def interpret(node: ast.Expression, symtab: SymTab) -> Value:
         else:
           return current_tab.locals[f"unary_{node.op}"](c)
 
+    case ast.Function():
+      fun = symtab.require(node.name.name)
+      args = [interpret(arg, symtab, budget) for arg in node.args]
+      return fun(*args)
+
     case ast.While():
-      while interpret(node.cond, symtab):
-        interpret(node.then, symtab)
+      while interpret(node.cond, symtab, budget):
+        interpret(node.then, symtab, budget)
       return None
 
+    case ast.NodeRef():
+      return interpret(node.build(), symtab, budget)
+
 
 
   raise Exception("Unknown node type")
+
+
+@dataclass
+class Evaluation:
+  """Result of a sandboxed `evaluate` run."""
+  value: Value = None
+  output: list[str] = field(default_factory=list)
+  completed: bool = True
+  # Why the evaluation stopped early, if it did
+  error: str | None = None
+
+
+class _ReadIntCalled(Exception):
+  pass
+
+
+def evaluate(node: ast.Tree, max_steps: int, max_seconds: float) -> Evaluation:
+  """Interprets a program without side effects outside the compiler.
+
+  Printed values are collected into the result instead of written to
+  stdout, in the same format as compiled programs print them. If the
+  program exceeds the step or time budget, calls `read_int` (there is
+  no input to read) or fails at runtime, evaluation stops and the
+  result is marked as not completed."""
+  result = Evaluation()
+
+  def sandbox_print_int(a: int) -> None:
+    result.output.append(str(a))
+
+  def sandbox_print_bool(a: bool) -> None:
+    result.output.append('true' if a else 'false')
+
+  def sandbox_read_int() -> int:
+    raise _ReadIntCalled('read_int is not available during compile-time evaluation')
+
+  builtins = SymTab[Any]({
+    'print_int': sandbox_print_int,
+    'print_bool': sandbox_print_bool,
+    'read_int': sandbox_read_int,
+  }, TopLevel)
+  try:
+    result.value = interpret(node, SymTab[Any]({}, builtins), Budget(max_steps, max_seconds))
+  except Exception as e:
+    # Errors in the program are for the type checker or the compiled
+    # program to report, so they only end the evaluation.
+    result.completed = False
+    result.error = str(e) or type(e).__name__
+  return result
@@ -1,12 +1,22 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Callable
 
 
 @dataclass
 class IntrinsicArgs():
+    """What an intrinsic's code is generated from.
+
+    The arguments are in registers or memory. The result register may
+    be any register, including one holding an argument, but %rax and
+    %rdx are the only ones an intrinsic may use for anything else."""
     arg_refs: list[str]
     result_register: str
     emit: Callable[[str], None]
+    # The value of each argument that is known to be a constant, or None
+    arg_constants: list[int | None] = field(default_factory=list)
+
+    def constant(self, i: int) -> int | None:
+        return self.arg_constants[i] if i < len(self.arg_constants) else None
 
 
 Intrinsic = Callable[[IntrinsicArgs], None]
@@ -35,31 +45,133 @@ def unary_not(a: IntrinsicArgs) -> None:
     a.emit(f'xorq $1, {a.result_register}')
 
 
+def _commutative(a: IntrinsicArgs, insn: str) -> None:
+    left, right = a.arg_refs
+    # Writing the left operand to the result register would
+    # overwrite the right one if it's there.
+    if a.result_register == right:
+        left, right = right, left
+    if a.result_register != left:
+        a.emit(f'movq {left}, {a.result_register}')
+    a.emit(f'{insn} {right}, {a.result_register}')
+
+
 @_intrinsic("+")
 def plus(a: IntrinsicArgs) -> None:
-    if a.result_register != a.arg_refs[0]:
-        a.emit(f'movq {a.arg_refs[0]}, {a.result_register}')
-    a.emit(f'addq {a.arg_refs[1]}, {a.result_register}')
+    _commutative(a, 'addq')
 
 
 @_intrinsic("-")
 def minus(a: IntrinsicArgs) -> None:
+    if a.result_register == a.arg_refs[1] != a.arg_refs[0]:
+        # a - b = -b + a
+        a.emit(f'negq {a.result_register}')
+        a.emit(f'addq {a.arg_refs[0]}, {a.result_register}')
+        return
     if a.result_register != a.arg_refs[0]:
         a.emit(f'movq {a.arg_refs[0]}, {a.result_register}')
     a.emit(f'subq {a.arg_refs[1]}, {a.result_register}')
 
 
+def _log2(value: int | None) -> int | None:
+    """The exponent k if value is 2^k with k >= 1, else None."""
+    if value is not None and value > 1 and value & (value - 1) == 0:
+        return value.bit_length() - 1
+    return None
+
+
 @_intrinsic("*")
 def multiply(a: IntrinsicArgs) -> None:
-    if a.result_register != a.arg_refs[0]:
-        a.emit(f'movq {a.arg_refs[0]}, {a.result_register}')
-    a.emit(f'imulq {a.arg_refs[1]}, {a.result_register}')
+    # Multiplying by a power of two is a shift. It's commutative,
+    # so the constant may be on either side.
+    for i in (1, 0):
+        shift = _log2(a.constant(i))
+        if shift is not None:
+            a.emit(f'movq {a.arg_refs[1 - i]}, {a.result_register}')
+            a.emit(f'salq ${shift}, {a.result_register}')
+            return
+    _commutative(a, 'imulq')
+
+
+def division_magic(d: int) -> tuple[int, int]:
+    """The magic number M and shift s for signed 64-bit division by
+    a constant d with |d| >= 2, so that n / d, truncated, is
+    `((M * n) >> 64 [+ n if d > 0 and M < 0] [- n if d < 0 and M > 0]) >> s`
+    plus one if that is negative. From Hacker's Delight, section 10-4."""
+    two63 = 2**63
+    ad = abs(d)
+    t = two63 + (1 if d < 0 else 0)
+    anc = t - 1 - t % ad
+    p = 63
+    q1, r1 = divmod(two63, anc)
+    q2, r2 = divmod(two63, ad)
+    while True:
+        p += 1
+        q1, r1 = 2 * q1, 2 * r1
+        if r1 >= anc:
+            q1, r1 = q1 + 1, r1 - anc
+        q2, r2 = 2 * q2, 2 * r2
+        if r2 >= ad:
+            q2, r2 = q2 + 1, r2 - ad
+        delta = ad - r2
+        if q1 > delta or (q1 == delta and r1 != 0):
+            break
+    m = q2 + 1
+    if d < 0:
+        m = -m
+    # As a signed 64-bit number
+    m = (m + two63) % 2**64 - two63
+    return m, p - 64
+
+
+def _divisible_by_constant(d: int | None) -> bool:
+    # idivq is kept for 0 and -1, which trap, for 1, and for the
+    # smallest Int, whose absolute value doesn't fit in 64 bits.
+    return d is not None and d not in (0, 1, -1) and d != -2**63
+
+
+def _truncated_quotient(a: IntrinsicArgs, d: int) -> None:
+    """Computes arg 0 / d into %rdx using only %rax and %rdx."""
+    n = a.arg_refs[0]
+    shift = _log2(abs(d))
+    if shift is not None:
+        # An arithmetic shift rounds down, so negative numbers
+        # get 2^k - 1 added first to round towards zero.
+        a.emit(f'movq {n}, %rax')
+        a.emit('cqto')
+        a.emit(f'shrq ${64 - shift}, %rdx')
+        a.emit('addq %rax, %rdx')
+        a.emit(f'sarq ${shift}, %rdx')
+        if d < 0:
+            a.emit('negq %rdx')
+        return
+    m, s = division_magic(d)
+    # The high half of the 128-bit product goes into %rdx.
+    a.emit(f'movabsq ${m}, %rax')
+    a.emit(f'imulq {n}')
+    if d > 0 and m < 0:
+        a.emit(f'addq {n}, %rdx')
+    elif d < 0 and m > 0:
+        a.emit(f'subq {n}, %rdx')
+    if s > 0:
+        a.emit(f'sarq ${s}, %rdx')
+    # Add one if the quotient so far is negative.
+    a.emit('movq %rdx, %rax')
+    a.emit('shrq $63, %rax')
+    a.emit('addq %rax, %rdx')
 
 
 @_intrinsic("/")
 def divide(a: IntrinsicArgs) -> None:
+    d = a.constant(1)
+    if _divisible_by_constant(d):
+        assert d is not None
+        _truncated_quotient(a, d)
+        if a.result_register != '%rdx':
+            a.emit(f'movq %rdx, {a.result_register}')
+        return
     a.emit(f'movq {a.arg_refs[0]}, %rax')
-    a.emit('cqto')  # TODO: explain
+    a.emit('cqto')  # Sign-extend %rax into %rdx:%rax, which idivq divides
     a.emit(f'idivq {a.arg_refs[1]}')
     if a.result_register != '%rax':
         a.emit(f'movq %rax, {a.result_register}')
@@ -67,6 +179,23 @@ def divide(a: IntrinsicArgs) -> None:
 
 @_intrinsic("%")
 def remainder(a: IntrinsicArgs) -> None:
+    d = a.constant(1)
+    if _divisible_by_constant(d):
+        assert d is not None
+        # n % d = n - (n / d) * d
+        _truncated_quotient(a, d)
+        if (shift := _log2(d)) is not None:
+            a.emit(f'salq ${shift}, %rdx')
+        elif -2**31 <= d < 2**31:
+            a.emit(f'imulq ${d}, %rdx')
+        else:
+            a.emit(f'movabsq ${d}, %rax')
+            a.emit('imulq %rax, %rdx')
+        a.emit(f'movq {a.arg_refs[0]}, %rax')
+        a.emit('subq %rdx, %rax')
+        if a.result_register != '%rax':
+            a.emit(f'movq %rax, {a.result_register}')
+        return
     # Same as division, but remainder is in register 'rdx'
     a.emit(f'movq {a.arg_refs[0]}, %rax')
     a.emit('cqto')
@@ -105,6 +234,24 @@ def ge(a: IntrinsicArgs) -> None:
     _int_comparison(a, 'setge')
 
 
+# The condition code of each comparison, as in `jl` and `setl`
+comparison_conditions = {'==': 'e', '!=': 'ne', '<': 'l', '<=': 'le', '>': 'g', '>=': 'ge'}
+
+
+def compare(a: IntrinsicArgs) -> None:
+    """Sets the flags like a comparison of the arguments would, for
+    a conditional jump on the comparison's condition code."""
+    left, right = a.arg_refs
+    constant = a.constant(1)
+    if constant is not None and -2**31 <= constant < 2**31:
+        right = f'${constant}'
+    elif left.endswith(')') and right.endswith(')'):
+        # At most one operand can be in memory.
+        a.emit(f'movq {left}, %rax')
+        left = '%rax'
+    a.emit(f'cmpq {right}, {left}')
+
+
 def _int_comparison(a: IntrinsicArgs, setcc_insn: str) -> None:
     # We use 'al' and 'eax' below, which means the lower bytes of 'rax'
     a.emit('xor %rax, %rax')  # Clear all bits of rax
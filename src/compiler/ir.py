@@ -10,6 +10,9 @@ class IRVar:
   def __str__(self) -> str:
     return self.name
 
+# The fields shown by `Instruction.__str__`, looked up once per class
+_field_names: dict[type, tuple[str, ...]] = {}
+
 @dataclass(frozen=True)
 class Instruction():
   """Base class for IR instructions."""
@@ -24,11 +27,10 @@ class Instruction():
 
       return str(v)
 
-    args = ', '.join(
-        format_value(getattr(self, field.name))
-        for field in fields(self)
-        if field.name != 'location'
-      )
+    names = _field_names.get(type(self))
+    if names is None:
+      names = _field_names[type(self)] = tuple(field.name for field in fields(self) if field.name != 'location')
+    args = ', '.join(format_value(getattr(self, name)) for name in names)
     return f'{type(self).__name__}({args})'
 
 @dataclass(frozen=True)
@@ -10,8 +10,10 @@ def generate_ir(
     # like 'print_int' and '+'. You can get them from
     # the global symbol table of your interpreter or type checker.
     reserved_names: set[str],
-    root_expr: ast.Expression
+    root_expr: ast.Tree
 ) -> list[ir.Instruction]:
+  if isinstance(root_expr, ast.NodeRef):
+    root_expr = root_expr.build()
   var_index = 1
   label_index = 1
 
@@ -38,6 +40,19 @@ def generate_ir(
   # into this list.
   ins: list[ir.Instruction] = []
 
+  # The IR variables of the program's variables
+  variable_vars: set[IRVar] = set()
+
+  def snapshot(operand: ast.Expression, var: IRVar, later: list[ast.Expression]) -> IRVar:
+    # Operands are evaluated from left to right, so a variable read
+    # as an operand, directly or as the result of a block or an
+    # assignment, must be copied if a later operand might assign to it.
+    if var in variable_vars and not all(isinstance(e, (ast.Literal, ast.Identifier)) for e in later):
+      copy = new_var()
+      ins.append(ir.Copy(operand.loc, var, copy))
+      return copy
+    return var
+
   # This function visits an AST node,
   # appends IR instructions to 'ins',
   # and returns the IR variable where
@@ -76,9 +91,19 @@ def generate_ir(
       case ast.Identifier():
         # Look up the IR variable that corresponds to
         # the source code variable.
+        if expr.slot >= 0:
+          return st.slots[expr.slot]
         return st.require(expr.name)
 
       case ast.BinaryOp():
+        if expr.op == '=':
+          if not isinstance(expr.left, ast.Identifier):
+            raise Exception(f'Error: {loc}: Left side of assignment must be a variable name')
+          var_right = visit(st, expr.right)
+          var_left = visit(st, expr.left)
+          ins.append(ir.Copy(loc, var_right, var_left))
+          return var_left
+
         # Ask the symbol table to return the variable that refers
         # to the operator to call.
         var_op = st.require(expr.op)
@@ -120,14 +145,8 @@ def generate_ir(
 
           ins.append(l_end)
 
-        elif var_op.name == '=':
-          if isinstance(expr.left, ast.Identifier):
-            var_right = visit(st, expr.right)
-            ins.append(ir.Copy(loc, var_right, var_left))
-            return var_left
-          raise Exception(f'Error: {loc}: Left side of assignment must be a variable name')
-
         else:
+          var_left = snapshot(expr.left, var_left, [expr.right])
           var_right = visit(st, expr.right)
           # Generate variable to hold the result.
           var_result = new_var()
@@ -137,10 +156,7 @@ def generate_ir(
         return var_result
 
       case ast.IfStatement():
-        if not isinstance(expr.els, ast.Literal):
-          #required for typing reasons
-          raise Exception('invalid else expression')
-        if expr.els.value is Unit:
+        if isinstance(expr.els, ast.Literal) and expr.els.value is None:
           # Create (but don't emit) some jump targets.
           l_then = new_label(loc)
           l_end = new_label(loc)
@@ -171,27 +187,34 @@ def generate_ir(
           l_else = new_label(loc)
           l_end = new_label(loc)
 
+          # Both branches copy their value into the same variable.
+          var_result = var_unit if expr.type == Unit else new_var()
+
           var_cond = visit(st, expr.cond)
 
           ins.append(ir.CondJump(loc, var_cond, l_then, l_else))
 
           ins.append(l_then)
-          visit(st, expr.then)
+          var_then = visit(st, expr.then)
+          if var_result is not var_unit:
+            ins.append(ir.Copy(loc, var_then, var_result))
           ins.append(ir.Jump(loc, l_end))
 
           ins.append(l_else)
-          visit(st, expr.els)
+          var_else = visit(st, expr.els)
+          if var_result is not var_unit:
+            ins.append(ir.Copy(loc, var_else, var_result))
 
           ins.append(l_end)
 
-          return var_unit
+          return var_result
 
       case ast.Function():
-        func = root_symtab.require(f'{expr.name}')
+        func = root_symtab.require(expr.name.name)
         var_result = new_var()
         args = []
-        for ar in expr.args:
-          args.append(visit(st, ar))
+        for i, ar in enumerate(expr.args):
+          args.append(snapshot(ar, visit(st, ar), expr.args[i + 1:]))
         call = ir.Call(loc, func, args, var_result)
         ins.append(call)
 
@@ -207,7 +230,7 @@ def generate_ir(
         return var_result
 
       case ast.Block():
-        block_tab = SymTab[IRVar]({}, st)
+        block_tab = st.child()
         for statement in expr.statements:
           visit(block_tab, statement)
         var_result = visit(block_tab, expr.result)
@@ -216,7 +239,11 @@ def generate_ir(
       case ast.Var():
         value = visit(st, expr.init)
         var_var = new_var()
-        st.add_local(expr.val.name, value)
+        variable_vars.add(var_var)
+        if expr.val.slot >= 0:
+          st.set_slot(expr.val.slot, var_var)
+        else:
+          st.add_local(expr.val.name, var_var)
         ins.append(ir.Copy(loc, value, var_var))
         return var_unit
 
@@ -0,0 +1,122 @@
+from typing import Callable
+from compiler import bytecode, ir
+from compiler.int64 import divide, remainder, wrap
+from compiler.interpreter import EvaluationLimitExceeded, Value
+from compiler.ir import IRVar
+
+# The intrinsics of `compiler.intrinsics`, evaluated with the semantics
+# of the code they generate: 64-bit wrapping arithmetic and truncating
+# division. Booleans are represented as Python bools.
+intrinsic_functions: dict[str, Callable[..., Value]] = {
+  'unary_-': lambda a: wrap(-a),
+  'unary_not': lambda a: not a,
+  '+': lambda a, b: wrap(a + b),
+  '-': lambda a, b: wrap(a - b),
+  '*': lambda a, b: wrap(a * b),
+  '/': divide,
+  '%': remainder,
+  '==': lambda a, b: a == b,
+  '!=': lambda a, b: a != b,
+  '<': lambda a, b: a < b,
+  '<=': lambda a, b: a <= b,
+  '>': lambda a, b: a > b,
+  '>=': lambda a, b: a >= b,
+}
+
+default_builtins: dict[str, Callable[..., Value]] = dict(zip(bytecode.builtin_names, bytecode.default_builtins))
+
+# Operations of the prepared program
+_LOAD = 0
+_COPY = 1
+_CALL = 2
+_CALL2 = 3
+_JUMP = 4
+_COND_JUMP = 5
+
+
+def run(
+  instructions: list[ir.Instruction],
+  builtins: dict[str, Callable[..., Value]] = default_builtins,
+  max_steps: int | None = None,
+) -> dict[IRVar, Value]:
+  """Runs IR code directly, with the same results as the native code
+  generated from it. Returns the final values of the variables.
+
+  With `max_steps`, stops with `EvaluationLimitExceeded` after executing
+  that many instructions."""
+  var_indices: dict[IRVar, int] = {}
+
+  def index(var: IRVar) -> int:
+    if var not in var_indices:
+      var_indices[var] = len(var_indices)
+    return var_indices[var]
+
+  # Labels are dropped from the prepared program, so a label's
+  # position is the index of the instruction after it.
+  label_positions: dict[str, int] = {}
+  position = 0
+  for insn in instructions:
+    if isinstance(insn, ir.Label):
+      label_positions[insn.name] = position
+    else:
+      position += 1
+
+  def target(label: ir.Label) -> int:
+    if label.name not in label_positions:
+      raise Exception(f'Error: {label.location}: Unknown label: "{label.name}"')
+    return label_positions[label.name]
+
+  program: list[tuple] = []
+  for insn in instructions:
+    match insn:
+      case ir.Label():
+        pass
+      case ir.LoadIntConst():
+        program.append((_LOAD, wrap(insn.value), index(insn.dest)))
+      case ir.LoadBoolConst():
+        program.append((_LOAD, insn.value, index(insn.dest)))
+      case ir.Copy():
+        program.append((_COPY, index(insn.source), index(insn.dest)))
+      case ir.Call():
+        fun = intrinsic_functions.get(insn.fun.name) or builtins.get(insn.fun.name)
+        if fun is None:
+          raise Exception(f'Error: {insn.location}: Unknown function: "{insn.fun.name}"')
+        args = [index(arg) for arg in insn.args]
+        if len(args) == 2:
+          program.append((_CALL2, fun, args[0], args[1], index(insn.dest)))
+        else:
+          program.append((_CALL, fun, args, index(insn.dest)))
+      case ir.Jump():
+        program.append((_JUMP, target(insn.label)))
+      case ir.CondJump():
+        program.append((_COND_JUMP, index(insn.cond), target(insn.then_label), target(insn.else_label)))
+      case _:
+        raise Exception(f'Unknown instruction: {insn}')
+
+  values: list[Value] = [None] * len(var_indices)
+  end = len(program)
+  steps_left = -1 if max_steps is None else max_steps
+  pc = 0
+  while pc < end:
+    if steps_left == 0:
+      raise EvaluationLimitExceeded('Error: evaluation step limit exceeded')
+    steps_left -= 1
+    op = program[pc]
+    kind = op[0]
+    if kind == _CALL2:
+      values[op[4]] = op[1](values[op[2]], values[op[3]])
+      pc += 1
+    elif kind == _COND_JUMP:
+      pc = op[2] if values[op[1]] else op[3]
+    elif kind == _COPY:
+      values[op[2]] = values[op[1]]
+      pc += 1
+    elif kind == _LOAD:
+      values[op[2]] = op[1]
+      pc += 1
+    elif kind == _JUMP:
+      pc = op[1]
+    else:
+      values[op[3]] = op[1](*[values[arg] for arg in op[2]])
+      pc += 1
+  return {var: values[i] for var, i in var_indices.items()}
@@ -0,0 +1,102 @@
+from dataclasses import replace
+from compiler import ir
+from compiler.cfg import BasicBlock, ControlFlowGraph
+from compiler.copy_propagation import eliminate_dead_code
+
+
+def _branch_only(block: BasicBlock) -> ir.CondJump | None:
+  """The conditional jump of a block that does nothing else."""
+  jump = block.terminator
+  if isinstance(jump, ir.CondJump) and len(block.labels) == len(block.instructions) - 1:
+    return jump
+  return None
+
+
+def _final_label(label: ir.Label, graph: ControlFlowGraph) -> ir.Label:
+  """Where a jump to `label` ends up after any blocks that only jump."""
+  seen = set()
+  block = graph.target(label)
+  while block not in seen and isinstance(block.terminator, ir.Jump) and len(block.labels) == len(block.instructions) - 1:
+    seen.add(block)
+    label = block.terminator.label
+    block = graph.target(label)
+  return label
+
+
+def _simplify_condition(jump: ir.CondJump, previous: ir.Instruction | None) -> ir.CondJump:
+  """Branches on the operand of a `not` or a copy computed right
+  before the jump instead of on its result."""
+  match previous:
+    case ir.Call() if previous.dest == jump.cond and previous.fun.name == 'unary_not':
+      return ir.CondJump(jump.location, previous.args[0], jump.else_label, jump.then_label)
+    case ir.Copy() if previous.dest == jump.cond and previous.source != jump.cond:
+      return replace(jump, cond=previous.source)
+  return jump
+
+
+def _thread(block: BasicBlock, graph: ControlFlowGraph) -> bool:
+  """Rewrites the end of a block. Returns whether anything changed."""
+  terminator = block.terminator
+  body = block.instructions[:-1] if terminator is not None else block.instructions
+  last = body[-1] if body and not isinstance(body[-1], ir.Label) else None
+
+  if isinstance(terminator, ir.CondJump):
+    new_jump = _simplify_condition(terminator, last)
+    new_jump = replace(
+      new_jump,
+      then_label=_final_label(new_jump.then_label, graph),
+      else_label=_final_label(new_jump.else_label, graph),
+    )
+    block.instructions[-1] = new_jump
+    return new_jump != terminator
+  if isinstance(terminator, ir.Jump):
+    final = _final_label(terminator.label, graph)
+    if final != terminator.label:
+      block.instructions[-1] = ir.Jump(terminator.location, final)
+      return True
+
+  # A jump, or falling through, to a block that only branches on
+  # the variable this block has just set.
+  if isinstance(terminator, ir.Jump):
+    target = graph.target(terminator.label)
+  elif block.index + 1 < len(graph.blocks):
+    target = graph.blocks[block.index + 1]
+  else:
+    return False
+  branch = _branch_only(target)
+  if branch is None or target is block or last is None or not isinstance(last, (ir.LoadBoolConst, ir.Copy, ir.Call)):
+    return False
+  if last.dest != branch.cond:
+    return False
+  new_terminator: ir.Instruction
+  if isinstance(last, ir.LoadBoolConst):
+    new_terminator = ir.Jump(branch.location, branch.then_label if last.value else branch.else_label)
+  else:
+    new_terminator = _simplify_condition(branch, last)
+  block.instructions = [*body, new_terminator]
+  return True
+
+
+def _reachable_instructions(graph: ControlFlowGraph) -> list[ir.Instruction]:
+  reachable = set(graph.reverse_postorder())
+  return [insn for block in graph.blocks if block in reachable for insn in block.instructions]
+
+
+def thread_jumps(instructions: list[ir.Instruction]) -> list[ir.Instruction]:
+  """Shortens the paths through the blocks that `and`, `or` and `not`
+  compile to.
+
+  A block that sets a Bool and then goes to a block that only branches
+  on it gets the branch itself, or a jump straight to the right target
+  if the Bool is a constant. A branch on the result of `not` becomes a
+  branch on its operand with the targets swapped. Unused results and
+  blocks no longer reached are removed. Jumps to blocks that only jump
+  go straight to where those jump to."""
+  while True:
+    graph = ControlFlowGraph(instructions)
+    changed = False
+    for block in graph.blocks:
+      changed = _thread(block, graph) or changed
+    if not changed:
+      return instructions
+    instructions = eliminate_dead_code(_reachable_instructions(ControlFlowGraph(graph.instructions())))
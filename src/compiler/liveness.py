@@ -0,0 +1,61 @@
+from compiler import ir
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import IRVar
+
+
+def uses(insn: ir.Instruction) -> list[IRVar]:
+  """The variables an instruction reads."""
+  match insn:
+    case ir.Copy():
+      return [insn.source]
+    case ir.Call():
+      return insn.args
+    case ir.CondJump():
+      return [insn.cond]
+  return []
+
+
+def definition(insn: ir.Instruction) -> IRVar | None:
+  """The variable an instruction writes, if any."""
+  match insn:
+    case ir.LoadIntConst() | ir.LoadBoolConst() | ir.Copy() | ir.Call():
+      return insn.dest
+  return None
+
+
+def live_out(graph: ControlFlowGraph) -> list[set[IRVar]]:
+  """Returns the variables live at the end of each block, by block index.
+
+  A variable is live if some path from that point reads it before
+  writing it."""
+  use_sets: list[set[IRVar]] = []
+  def_sets: list[set[IRVar]] = []
+  for block in graph.blocks:
+    block_uses: set[IRVar] = set()
+    block_defs: set[IRVar] = set()
+    for insn in block.instructions:
+      block_uses.update(var for var in uses(insn) if var not in block_defs)
+      dest = definition(insn)
+      if dest is not None:
+        block_defs.add(dest)
+    use_sets.append(block_uses)
+    def_sets.append(block_defs)
+
+  live_in: list[set[IRVar]] = [set(block_uses) for block_uses in use_sets]
+  out: list[set[IRVar]] = [set() for _ in graph.blocks]
+  # Backward problem: visiting blocks in postorder, successors come first.
+  order = list(reversed(graph.reverse_postorder()))
+  reachable = set(order)
+  order += [block for block in graph.blocks if block not in reachable]
+  changed = True
+  while changed:
+    changed = False
+    for block in order:
+      block_out = out[block.index]
+      for successor in block.successors:
+        block_out |= live_in[successor.index]
+      new_in = use_sets[block.index] | (block_out - def_sets[block.index])
+      if len(new_in) != len(live_in[block.index]):
+        live_in[block.index] = new_in
+        changed = True
+  return out
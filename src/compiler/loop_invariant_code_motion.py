@@ -0,0 +1,125 @@
+from collections import Counter
+from dataclasses import replace
+from compiler import ir
+from compiler.cfg import BasicBlock, ControlFlowGraph, Loop
+from compiler.constant_propagation import int_constants
+from compiler.copy_propagation import trapping_intrinsics
+from compiler.ir import IRVar
+from compiler.ir_interpreter import intrinsic_functions
+from compiler.liveness import definition, live_out, uses
+
+
+def _live_in(block: BasicBlock, out: set[IRVar]) -> set[IRVar]:
+  live = set(out)
+  for insn in reversed(block.instructions):
+    dest = definition(insn)
+    if dest is not None:
+      live.discard(dest)
+    live.update(uses(insn))
+  return live
+
+
+def _safe_divisors(instructions: list[ir.Instruction]) -> set[IRVar]:
+  """Variables that always hold a constant other than 0 and -1, which
+  `idivq` can divide by without trapping."""
+  return {var for var, value in int_constants(instructions).items() if value not in (0, -1)}
+
+
+def _hoist(graph: ControlFlowGraph, loop: Loop, safe_divisors: set[IRVar]) -> list[ir.Instruction]:
+  """Removes the invariant instructions from the loop and returns them."""
+  out = live_out(graph)
+  header_live = _live_in(loop.header, out[loop.header.index])
+  exits = loop.exits()
+  live_at_exit = [_live_in(target, out[target.index]) for _, target in exits]
+  definitions = Counter(
+    dest for block in loop.blocks for insn in block.instructions if (dest := definition(insn)) is not None
+  )
+
+  def invariant(insn: ir.Instruction, dest: IRVar, block: BasicBlock) -> bool:
+    match insn:
+      case ir.Call():
+        if insn.fun.name not in intrinsic_functions:
+          return False
+        # Hoisting a division out of its loop would also run it when the
+        # loop runs zero times, so only divisions that can't trap are.
+        if insn.fun.name in trapping_intrinsics and insn.args[1] not in safe_divisors:
+          return False
+      case ir.LoadIntConst() | ir.LoadBoolConst() | ir.Copy():
+        pass
+      case _:
+        return False
+    if any(definitions[arg] > 0 for arg in uses(insn)):
+      return False
+    # Every read of `dest` in the loop must see this definition, and
+    # code after the loop must see it whenever it could have before.
+    if definitions[dest] != 1 or dest in header_live:
+      return False
+    return all(
+      dest not in live or graph.dominates(block, exiting)
+      for (exiting, _), live in zip(exits, live_at_exit)
+    )
+
+  hoisted: list[ir.Instruction] = []
+  changed = True
+  while changed:
+    changed = False
+    for block in graph.reverse_postorder():
+      if block not in loop.blocks:
+        continue
+      kept = []
+      for insn in block.instructions:
+        dest = definition(insn)
+        if dest is not None and invariant(insn, dest, block):
+          hoisted.append(insn)
+          definitions[dest] -= 1
+          changed = True
+        else:
+          kept.append(insn)
+      block.instructions = kept
+  return hoisted
+
+
+def _retarget(insn: ir.Instruction, labels: set[str], new_label: ir.Label) -> ir.Instruction:
+  match insn:
+    case ir.Jump() if insn.label.name in labels:
+      return replace(insn, label=new_label)
+    case ir.CondJump():
+      if insn.then_label.name in labels:
+        insn = replace(insn, then_label=new_label)
+      if insn.else_label.name in labels:
+        insn = replace(insn, else_label=new_label)
+  return insn
+
+
+def hoist_loop_invariants(instructions: list[ir.Instruction]) -> list[ir.Instruction]:
+  """Moves computations whose operands don't change in a loop into
+  a preheader, a new block that runs once before the loop."""
+  safe_divisors = _safe_divisors(instructions)
+  done: set[str] = set()
+  while True:
+    graph = ControlFlowGraph(instructions)
+    loops = [loop for loop in graph.natural_loops() if loop.header.labels[0].name not in done]
+    if not loops:
+      return instructions
+    loop = loops[0]
+    header = loop.header
+    header_labels = {label.name for label in header.labels}
+    done.update(header_labels)
+    hoisted = _hoist(graph, loop, safe_divisors)
+    if not hoisted:
+      instructions = graph.instructions()
+      continue
+
+    # The preheader goes right before the header, and the jumps into the
+    # loop from outside go to it instead.
+    preheader_label = ir.Label(header.labels[0].location, f'{header.labels[0].name}_preheader')
+    done.add(preheader_label.name)
+    for predecessor in header.predecessors:
+      if predecessor not in loop.blocks:
+        predecessor.instructions = [_retarget(insn, header_labels, preheader_label) for insn in predecessor.instructions]
+    if header.index > 0:
+      previous = graph.blocks[header.index - 1]
+      if previous in loop.blocks and previous.terminator is None:
+        previous.instructions.append(ir.Jump(header.labels[0].location, header.labels[0]))
+    header.instructions = [preheader_label, *hoisted, *header.instructions]
+    instructions = graph.instructions()
@@ -1,4 +1,5 @@
-from compiler.Token import Token
+from typing import Callable, Iterable
+from compiler.Token import Token, TokenType
 from compiler import ast, Loc
 from compiler.type import Bool, Int, Type, Unit
 
@@ -14,12 +15,20 @@ precedence_levels = [
 
 allowed_before_var = ['{', '}', ';']
 
-MAX_LEVEL = len(precedence_levels)-1
-
 right_associative_binary_operators = ['=']
 
 unary_operators = ['not', '-']
 
+# Tokens that may precede an operand within an expression
+prefix_tokens = frozenset([*unary_operators, '('])
+
+# Binary operator -> (binding power, right associative)
+binary_operators: dict[str, tuple[int, bool]] = {
+  op: (level, op in right_associative_binary_operators)
+  for level, ops in enumerate(precedence_levels)
+  for op in ops
+}
+
 def get_type(s: str, l: Loc.Loc) -> Type:
   if s == 'Bool':
     return Bool
@@ -27,43 +36,65 @@ def get_type(s: str, l: Loc.Loc) -> Type:
     return Int
   raise Exception(f'Error: {l}: Unknown type: {s}')
 
-def parse(tokens: list[Token]) -> ast.Expression:
-  # This keeps track of which token we're looking at.
-  pos = 0
-
-  def peek() -> Token:
-    if pos < len(tokens):
-      return tokens[pos]
-    return Token(
-      loc=tokens[-1].loc,
-      type="end",
-      text="<end of file>",
-      )
+def reduce(operands: list[ast.Expression], operators: list[tuple[Token, int | None]]) -> None:
+  """Applies the topmost pending operator of an expression to its operands."""
+  op, power = operators.pop()
+  right = operands.pop()
+  if power is None:
+    operands.append(ast.Unary(op.loc, op.text, right))
+  else:
+    left = operands.pop()
+    operands.append(ast.BinaryOp(op.loc, left, op.text, right))
+
+def parse(tokens: Iterable[Token]) -> ast.Expression:
+  # Tokens are read lazily through a one-token lookahead buffer:
+  # `current` is the next token to consume and `previous` the one
+  # consumed last. After the last token, `current` is a single shared
+  # end-of-file token located at the last real token.
+  stream = iter(tokens)
+  previous: Token | None = None
+  end_of_file: Token | None = None
+
+  def next_token() -> Token:
+    nonlocal end_of_file
+    token = next(stream, None)
+    if token is not None:
+      return token
+    if end_of_file is None:
+      loc = previous.loc if previous is not None else Loc.L
+      end_of_file = Token(loc=loc, type=TokenType.END, text="<end of file>")
+    return end_of_file
+
+  current = next_token()
+
+  def at_end() -> bool:
+    return current is end_of_file
 
   def check_var_allowed() -> bool:
-    if pos == 0:
+    if previous is None:
       return True
-    token = tokens[pos-1]
-    if token.text in allowed_before_var:
+    if previous.text in allowed_before_var:
       return True
     return False
 
   def check_block_syntax() -> bool:
-    token = tokens[pos-1]
-    if token.text in [';', '}']:
+    assert previous is not None
+    if previous.text in [';', '}']:
       return True
     return False
 
   def consume(expected: str | list[str] | None = None) -> Token:
-    nonlocal pos # Python's "nonlocal" lets us modify `pos`
-                  # without creating a local variable of the same name.
-    token = peek()
-    if isinstance(expected, str) and token.text != expected:
-      raise Exception(f'{token.loc}: expected "{expected}", found \"{token.text}\"')
-    if isinstance(expected, list) and token.text not in expected:
-      comma_separated = ", ".join([f'"{e}"' for e in expected])
-      raise Exception(f'{token.loc}: expected one of: {comma_separated}, found \"{token.text}\"')
-    pos += 1
+    nonlocal current, previous
+    token = current
+    if expected is not None and token.text != expected:
+      if isinstance(expected, str):
+        raise Exception(f'{token.loc}: expected "{expected}", found \"{token.text}\"')
+      if token.text not in expected:
+        comma_separated = ", ".join([f'"{e}"' for e in expected])
+        raise Exception(f'{token.loc}: expected one of: {comma_separated}, found \"{token.text}\"')
+    if token is not end_of_file:
+      previous = token
+      current = next_token()
     return token
 
   # This is the parsing function for integer literals.
@@ -71,77 +102,90 @@ def parse(tokens: list[Token]) -> ast.Expression:
   # moves past it, and returns a 'Literal' AST node
   # containing the integer from the token.
   def parse_int_literal() -> ast.Literal:
-    if peek().type != 'int_literal':
-      raise Exception(f'{peek().loc}: expected an integer literal')
+    if current.type != TokenType.INT_LITERAL:
+      raise Exception(f'{current.loc}: expected an integer literal')
     token = consume()
     return ast.Literal(token.loc, int(token.text))
 
   def parse_identifier() -> ast.Expression:
-    if peek().type != 'identifier':
-      raise Exception(f'{peek().loc}: expected an identifier')
+    if current.type != TokenType.IDENTIFIER:
+      raise Exception(f'{current.loc}: expected an identifier')
     token = consume()
     if token.text == "true":
       return ast.Literal(token.loc, True)
     if token.text == "false":
       return ast.Literal(token.loc, False)
-    if peek().text == "(":
+    if current.text == "(":
       func = parse_function(ast.Identifier(token.loc, str(token.text)))
       return func
     return ast.Identifier(token.loc, str(token.text))
 
-  def parse_expression(level: int = 0) -> ast.Expression:
-    if level >= MAX_LEVEL:
-      left = parse_factor()
-    else:
-      left = parse_expression(level+1)
-    while level <= MAX_LEVEL and peek().text in precedence_levels[level]:
-      operator_token = consume()
-      operator = operator_token.text
-
-
-      if operator in right_associative_binary_operators:
-        right = parse_expression()
-      else:
-        right = parse_expression(level+1)
+  def parse_expression() -> ast.Expression:
+    # Precedence climbing with explicit stacks instead of one recursive
+    # call per precedence level. Prefix operators and parentheses are kept
+    # on the operator stack too, so nesting them costs no Python frames.
+    # A prefix operator applies to the whole expression that follows it,
+    # up to the end of the enclosing parentheses.
+    operands: list[ast.Expression] = []
+    # Pending operators with their binding powers; prefix operators
+    # and open parentheses have no binding power.
+    operators: list[tuple[Token, int | None]] = []
+    open_parens = 0
 
-      left = ast.BinaryOp(
-        operator_token.loc,
-        left,
-        operator,
-        right
-      )
-    return left
+    while True:
+      # Operand position
+      while current.text in prefix_tokens:
+        token = consume()
+        operators.append((token, None))
+        if token.text == '(':
+          open_parens += 1
+      operand = parse_factor()
+      if not operators and current.text not in binary_operators:
+        return operand
+      operands.append(operand)
+
+      # Operator position
+      while True:
+        text = current.text
+        if text in binary_operators:
+          power, right_associative = binary_operators[text]
+          while operators:
+            top_power = operators[-1][1]
+            if top_power is None or top_power < power or (top_power == power and right_associative):
+              break
+            reduce(operands, operators)
+          operators.append((consume(), power))
+          break
+        if text == ')' and open_parens > 0:
+          while operators[-1][0].text != '(':
+            reduce(operands, operators)
+          operators.pop()
+          consume(')')
+          open_parens -= 1
+          continue
+        if open_parens > 0:
+          consume(')')
+        while operators:
+          reduce(operands, operators)
+        return operands[0]
 
   def parse_factor() -> ast.Expression:
-    if peek().text == '(':
-      return parse_parenthesized()
-    if peek().text == 'if':
-      return parse_if_statement()
-    if peek().text == 'var':
-      return parse_var()
-    if peek().text == 'while':
-      return parse_while()
-    if peek().text in unary_operators:
-      return parse_unary()
-    if peek().text == '{':
-      return parse_block()
-    if peek().type == 'int_literal':
-      return parse_int_literal()
-    if peek().type == 'identifier':
-      return parse_identifier()
-
-    raise Exception(f'{peek().loc}: expected "(", an integer literal or an identifier')
+    token = current
+    parse_construct = keyword_parsers.get(token.text) or kind_parsers.get(token.type)
+    if parse_construct is None:
+      raise Exception(f'{token.loc}: expected "(", an integer literal or an identifier')
+    return parse_construct()
 
   def parse_if_statement() -> ast.Expression:
     if_token = consume('if')
     cond = parse_expression()
     consume('then')
     then = parse_expression()
-    if peek().text == 'else':
+    if current.text == 'else':
       consume('else')
       els = parse_expression()
     else:
-      els = ast.Literal(peek().loc, None)
+      els = ast.Literal(current.loc, None)
     return ast.IfStatement(
       if_token.loc,
       cond,
@@ -149,30 +193,20 @@ def parse(tokens: list[Token]) -> ast.Expression:
       els
     )
 
-  def parse_unary() -> ast.Unary:
-    token = consume()
-    op = token.text
-    right = parse_expression()
-    return ast.Unary(
-      token.loc,
-      op,
-      right,
-    )
-
   def parse_var() -> ast.Var:
     if check_var_allowed() is False:
-      raise Exception(f'{peek().loc}: "var" is only allowed directly inside blocks {{}} and in top-level expressions')
+      raise Exception(f'{current.loc}: "var" is only allowed directly inside blocks {{}} and in top-level expressions')
     var_type = Unit
     var = consume('var')
 
     val = consume()
 
-    if peek().text == ':':
+    if current.text == ':':
       consume(':')
       t = consume()
       var_type = get_type(t.text, t.loc)
 
-    if val.type != 'identifier':
+    if val.type != TokenType.IDENTIFIER:
       raise Exception(f'{val.loc}: expected identifier, found "{val.text}"')
     consume('=')
     init = parse_expression()
@@ -188,13 +222,13 @@ def parse(tokens: list[Token]) -> ast.Expression:
     start_backet = consume('{')
     result: ast.Expression = ast.Literal(start_backet.loc, None)
 
-    while peek().text != '}':
+    while current.text != '}':
       expr = parse_expression()
-      if peek().text == ';':
+      if current.text == ';':
         statements.append(expr)
         consume(';')
         continue
-      if peek().text == '}':
+      if current.text == '}':
         result = expr
         break
       if check_block_syntax() is False:
@@ -202,7 +236,7 @@ def parse(tokens: list[Token]) -> ast.Expression:
       statements.append(expr)
 
     consume('}')
-    if peek().text == ';':
+    if current.text == ';':
       consume(';')
 
     return ast.Block(
@@ -212,30 +246,22 @@ def parse(tokens: list[Token]) -> ast.Expression:
     )
 
   def parse_function(identifier: ast.Identifier) -> ast.Expression:
-    args = []
+    args: list[ast.Expression] = []
     function_start = consume('(')
-    while True:
+    while current.text != ')' or args:
       expr = parse_expression()
       args.append(expr)
-      if peek().text == ',':
+      if current.text == ',':
         consume(',')
       else:
-        consume(')')
         break
+    consume(')')
     return ast.Function(
       loc=function_start.loc,
       name=identifier,
       args=args
     )
 
-  def parse_parenthesized() -> ast.Expression:
-    consume('(')
-    # Recursively call the top level parsing function
-    # to parse whatever is inside the parentheses.
-    expr = parse_expression()
-    consume(')')
-    return expr
-
   def parse_while() -> ast.Expression:
     start_token = consume('while')
     cond = parse_expression()
@@ -244,23 +270,34 @@ def parse(tokens: list[Token]) -> ast.Expression:
 
     return ast.While(start_token.loc, cond=cond, then=then)
 
+  # Parsing functions for the constructs that can start a factor,
+  # by the text or the kind of their first token.
+  keyword_parsers: dict[str, Callable[[], ast.Expression]] = {
+    'if': parse_if_statement,
+    'var': parse_var,
+    'while': parse_while,
+    '{': parse_block,
+  }
+  kind_parsers: dict[str, Callable[[], ast.Expression]] = {
+    TokenType.INT_LITERAL: parse_int_literal,
+    TokenType.IDENTIFIER: parse_identifier,
+  }
+
   def start_parser() -> ast.Expression:
-    if len(tokens) == 0:
+    if at_end():
       raise Exception("expected non-empty token list")
 
+    first_token = current
     expressions: list[ast.Expression] = []
-    while pos < len(tokens):
-
-      if pos < len(tokens):
-        expressions.append(parse_expression())
-        if pos < len(tokens):
-          consume(';')
-
-    first_token = tokens[0]
+    while not at_end():
+      expressions.append(parse_expression())
+      if not at_end():
+        consume(';')
 
     if len(expressions) == 1:
       return expressions[0]
-    end_token = tokens[-1]
+    assert previous is not None
+    end_token = previous
     if end_token.text == ';':
       return ast.Block(loc=first_token.loc, statements=expressions, result=ast.Literal(end_token.loc, None))
     result = expressions.pop()
@@ -0,0 +1,205 @@
+import re
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class Instruction:
+  op: str
+  operands: tuple[str, ...]
+
+  def __str__(self) -> str:
+    return f'{self.op} {", ".join(self.operands)}' if self.operands else self.op
+
+
+@dataclass(frozen=True)
+class Label:
+  name: str
+
+  def __str__(self) -> str:
+    return f'{self.name}:'
+
+
+@dataclass(frozen=True)
+class Directive:
+  text: str
+
+  def __str__(self) -> str:
+    return self.text
+
+
+@dataclass(frozen=True)
+class Comment:
+  """A comment or blank line. Rules look past these."""
+  text: str
+
+  def __str__(self) -> str:
+    return self.text
+
+
+type Line = Instruction | Label | Directive | Comment
+
+
+def parse_assembly(assembly: str) -> list[Line]:
+  lines: list[Line] = []
+  for text in assembly.split('\n'):
+    stripped = text.strip()
+    if stripped == '' or stripped.startswith('#'):
+      lines.append(Comment(text))
+    elif stripped.endswith(':'):
+      lines.append(Label(stripped[:-1]))
+    elif stripped.startswith('.'):
+      lines.append(Directive(text))
+    else:
+      op, _, rest = stripped.partition(' ')
+      # Commas inside parentheses, as in `(%rax,%rbx,8)`, don't separate operands.
+      operands = tuple(o.strip() for o in re.split(r',(?![^()]*\))', rest)) if rest.strip() else ()
+      lines.append(Instruction(op, operands))
+  return lines
+
+
+def format_assembly(lines: list[Line]) -> str:
+  return '\n'.join(str(line) for line in lines)
+
+
+# Gets as many lines as the rule's window size and returns
+# the lines to replace them with, or None if the rule doesn't apply.
+type Rewrite = Callable[[list[Line]], list[Line] | None]
+
+
+@dataclass
+class Rule:
+  name: str
+  size: int
+  rewrite: Rewrite
+
+
+all_rules: dict[str, Rule] = {}
+
+
+def _rule(name: str, size: int) -> Callable[[Rewrite], Rewrite]:
+  """Function decorator that registers that function as a rule
+  looking at `size` lines at a time."""
+  def wrapper(f: Rewrite) -> Rewrite:
+    assert name not in all_rules
+    all_rules[name] = Rule(name, size, f)
+    return f
+  return wrapper
+
+
+_negated_jumps = {
+  'je': 'jne', 'jne': 'je',
+  'jl': 'jge', 'jge': 'jl',
+  'jle': 'jg', 'jg': 'jle',
+  'jb': 'jae', 'jae': 'jb',
+  'jbe': 'ja', 'ja': 'jbe',
+}
+
+
+def _is_jump(line: Line, op: str | None = None) -> bool:
+  return isinstance(line, Instruction) and (line.op == op if op is not None else line.op in _negated_jumps)
+
+
+def _target(line: Line) -> str:
+  assert isinstance(line, Instruction)
+  return line.operands[0]
+
+
+@_rule('self-move', 1)
+def _self_move(lines: list[Line]) -> list[Line] | None:
+  match lines:
+    case [Instruction('movq', (a, b))] if a == b:
+      return []
+  return None
+
+
+@_rule('redundant-load', 2)
+def _redundant_load(lines: list[Line]) -> list[Line] | None:
+  # After `movq a, b` both hold the same value, unless b is a
+  # register used to address a.
+  match lines:
+    case [Instruction('movq', (a, b)) as first, Instruction('movq', (c, d))] \
+        if (c, d) in [(a, b), (b, a)] and b not in a:
+      return [first]
+  return None
+
+
+@_rule('jump-to-next', 2)
+def _jump_to_next(lines: list[Line]) -> list[Line] | None:
+  match lines:
+    case [jump, Label(name) as label] if (_is_jump(jump, 'jmp') or _is_jump(jump)) and _target(jump) == name:
+      return [label]
+  return None
+
+
+@_rule('jump-over-jump', 3)
+def _jump_over_jump(lines: list[Line]) -> list[Line] | None:
+  # `jne .L1; jmp .L2; .L1:` is `je .L2; .L1:`
+  match lines:
+    case [Instruction(op, (then,)), Instruction('jmp', (other,)), Label(name) as label] \
+        if op in _negated_jumps and then == name:
+      return [Instruction(_negated_jumps[op], (other,)), label]
+  return None
+
+
+@_rule('jump-to-same-target', 2)
+def _jump_to_same_target(lines: list[Line]) -> list[Line] | None:
+  match lines:
+    case [Instruction(op, (a,)), Instruction('jmp', (b,)) as jump] if op in _negated_jumps and a == b:
+      return [jump]
+  return None
+
+
+@_rule('unreachable', 2)
+def _unreachable(lines: list[Line]) -> list[Line] | None:
+  # Nothing after a jump or return runs until the next label.
+  match lines:
+    case [Instruction('jmp' | 'ret') as jump, Instruction()]:
+      return [jump]
+  return None
+
+
+def optimize(lines: list[Line], rules: list[Rule] | None = None, hits: Counter[str] | None = None) -> list[Line]:
+  """Rewrites short runs of instructions into equivalent shorter ones
+  until no rule applies. Comments between the lines a rule replaces
+  are kept, before the new lines.
+
+  `rules` defaults to all the rules defined here. If `hits` is given,
+  it counts how many times each rule was applied."""
+  rules = list(all_rules.values()) if rules is None else rules
+  max_size = max((rule.size for rule in rules), default=0)
+  result: list[Line] = []
+  # Indices in `result` of the lines that rules look at
+  significant: list[int] = []
+  pending = list(reversed(lines))
+  while pending:
+    line = pending.pop()
+    result.append(line)
+    if isinstance(line, Comment):
+      continue
+    significant.append(len(result) - 1)
+    window = [result[i] for i in significant[-max_size:]]
+    for rule in rules:
+      if rule.size > len(window):
+        continue
+      replacement = rule.rewrite(window[-rule.size:])
+      if replacement is None:
+        continue
+      if hits is not None:
+        hits[rule.name] += 1
+      # Take the matched lines off, keeping the comments between them,
+      # and look at the replacement again together with earlier lines.
+      start = significant[-rule.size]
+      comments = [line for line in result[start:] if isinstance(line, Comment)]
+      del result[start:]
+      del significant[-rule.size:]
+      result.extend(comments)
+      pending.extend(reversed(replacement))
+      break
+  return result
+
+
+def optimize_assembly(assembly: str, hits: Counter[str] | None = None) -> str:
+  """Runs all rules on assembly code."""
+  return format_assembly(optimize(parse_assembly(assembly), hits=hits))
@@ -0,0 +1,116 @@
+from bisect import bisect_right
+from dataclasses import dataclass
+from compiler import ir
+from compiler.cfg import ControlFlowGraph
+from compiler.intrinsics import all_intrinsics
+from compiler.ir import IRVar
+from compiler.liveness import definition, live_out, uses
+
+# Registers kept by the functions we call. Using one means saving it
+# in the prologue and restoring it before returning.
+callee_saved_registers = ['%rbx', '%r12', '%r13', '%r14', '%r15']
+# Registers a call may overwrite, usable by variables that aren't live
+# across a call. %rax and %rdx are left out: intrinsics use them as
+# scratch registers.
+caller_saved_registers = ['%rcx', '%rsi', '%rdi', '%r8', '%r9', '%r10', '%r11']
+
+
+@dataclass
+class Interval:
+  """The instruction positions from the first to the last one where a
+  variable is live."""
+  var: IRVar
+  start: int
+  end: int
+  crosses_call: bool = False
+
+
+def live_intervals(instructions: list[ir.Instruction]) -> list[Interval]:
+  """The live interval of every variable read or written by the
+  instructions, ordered by start position.
+
+  Positions are indices into `instructions`. A variable is live at an
+  instruction that writes or reads it, and at every instruction in
+  between on some path from a write to a read."""
+  graph = ControlFlowGraph(instructions)
+  intervals: dict[IRVar, Interval] = {}
+
+  def mark(var: IRVar, position: int) -> None:
+    interval = intervals.get(var)
+    if interval is None:
+      intervals[var] = Interval(var, position, position)
+    elif position < interval.start:
+      interval.start = position
+    elif position > interval.end:
+      interval.end = position
+
+  end = len(instructions)
+  for block, live in reversed(list(zip(graph.blocks, live_out(graph)))):
+    live = set(live)
+    position = end
+    for insn in reversed(block.instructions):
+      position -= 1
+      for var in live:
+        mark(var, position)
+      dest = definition(insn)
+      if dest is not None:
+        mark(dest, position)
+        live.discard(dest)
+      for var in uses(insn):
+        mark(var, position)
+        live.add(var)
+    end = position
+
+  # Arguments are read before the call and its result is written
+  # after, so only variables live on both sides are affected.
+  calls = [
+    position for position, insn in enumerate(instructions)
+    if isinstance(insn, ir.Call) and insn.fun.name not in all_intrinsics
+  ]
+  result = sorted(intervals.values(), key=lambda interval: interval.start)
+  for interval in result:
+    i = bisect_right(calls, interval.start)
+    interval.crosses_call = i < len(calls) and calls[i] < interval.end
+  return result
+
+
+def allocate_registers(instructions: list[ir.Instruction]) -> dict[IRVar, str]:
+  """Linear scan register allocation.
+
+  Returns the register of each variable that gets one. The others must
+  be spilled to the stack. Variables live across a call only get
+  callee-saved registers."""
+  registers: dict[IRVar, str] = {}
+  free = set(caller_saved_registers + callee_saved_registers)
+  # Intervals holding a register, by increasing end
+  active: list[Interval] = []
+
+  def allowed(interval: Interval) -> list[str]:
+    if interval.crosses_call:
+      return callee_saved_registers
+    return caller_saved_registers + callee_saved_registers
+
+  for interval in live_intervals(instructions):
+    while active and active[0].end < interval.start:
+      free.add(registers[active.pop(0).var])
+
+    candidates = allowed(interval)
+    register = next((r for r in candidates if r in free), None)
+    if register is not None:
+      free.remove(register)
+    else:
+      # Spill whichever interval that could give up a suitable register
+      # ends last, so that the register frees up as soon as possible.
+      victim = max(
+        (other for other in active if registers[other.var] in candidates),
+        key=lambda other: other.end,
+        default=None,
+      )
+      if victim is None or victim.end <= interval.end:
+        continue
+      register = registers.pop(victim.var)
+      active.remove(victim)
+    registers[interval.var] = register
+    active.append(interval)
+    active.sort(key=lambda other: other.end)
+  return registers
@@ -0,0 +1,67 @@
+from compiler import ast
+
+
+def resolve(node: ast.Expression) -> int:
+  """Assigns a slot to every variable declared in the program.
+
+  Each `var` declaration gets its own slot, also when it shadows
+  another variable, and every identifier referring to it (including
+  the one in the declaration itself) is annotated with that slot.
+  Identifiers that don't refer to a declared variable keep slot -1.
+  Since the language has no user-defined functions, one flat frame
+  indexed by slot can hold all variables of a program.
+
+  Returns the number of slots used."""
+  scopes: list[dict[str, int]] = [{}]
+  slot_count = 0
+
+  def visit(node: ast.Expression) -> None:
+    nonlocal slot_count
+    match node:
+      case ast.Literal():
+        pass
+
+      case ast.Identifier():
+        for scope in reversed(scopes):
+          if node.name in scope:
+            node.slot = scope[node.name]
+            break
+
+      case ast.BinaryOp():
+        visit(node.left)
+        visit(node.right)
+
+      case ast.IfStatement():
+        visit(node.cond)
+        visit(node.then)
+        visit(node.els)
+
+      case ast.Function():
+        for arg in node.args:
+          visit(arg)
+
+      case ast.Unary():
+        visit(node.right)
+
+      case ast.Block():
+        scopes.append({})
+        for statement in node.statements:
+          visit(statement)
+        visit(node.result)
+        scopes.pop()
+
+      case ast.Var():
+        visit(node.init)
+        node.val.slot = slot_count
+        scopes[-1][node.val.name] = slot_count
+        slot_count += 1
+
+      case ast.While():
+        visit(node.cond)
+        visit(node.then)
+
+      case _:
+        raise Exception("Unknown node type")
+
+  visit(node)
+  return slot_count
@@ -1,5 +1,5 @@
 from typing import Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from compiler.type import FunType, Int, Unit, Bool
 
 
@@ -7,6 +7,19 @@ from compiler.type import FunType, Int, Unit, Bool
 class SymTab[Given_Type]:
   locals: dict[Any, Given_Type]
   parent: 'SymTab | None'
+  # Values of resolved variables by slot, shared by a scope and its
+  # child scopes (see compiler.resolver). Root tables like TopLevel are
+  # shared by all programs, so their children get a frame of their own.
+  slots: list[Given_Type] = field(default_factory=list)
+
+  def child(self) -> 'SymTab[Given_Type]':
+    return SymTab[Given_Type]({}, self, self.slots if self.parent is not None else [])
+
+  def set_slot(self, slot: int, value: Given_Type) -> None:
+    slots = self.slots
+    if slot >= len(slots):
+      slots.extend([value] * (slot + 1 - len(slots)))
+    slots[slot] = value
 
   def require(self, op:str) -> Given_Type:
     current_tab = self
@@ -71,8 +84,8 @@ def op_unary_minus(a:int) -> int:
 def op_print(a: int | bool) -> None:
   print(a)
 
-def op_read_int(a:str) -> int:
-  return int(a)
+def op_read_int() -> int:
+  return int(input())
 
 
 TopLevel = SymTab({
@@ -1,52 +1,47 @@
 import re
 from re import Pattern
-from compiler.Loc import Loc
-from compiler.Token import Token
+from sys import intern
+from typing import Iterator
+from compiler.Loc import OffsetLoc, SourceMap
+from compiler.Token import Token, TokenType
 
 identifier_r = re.compile(r"[a-zA-Z_][a-zA-Z_0-9]*")
 int_literal_r = re.compile(r"[0-9]+")
 operator_r = re.compile(r"==|<=|>=|!=|>|<|-|\+|\*|\/|%|=")
 punctuation_r = re.compile(r"\(|\)|{|}|,|;|:")
-
-
-newline_r = re.compile(r"\n")
 comment_r = re.compile(r"\/\/.*|#.*")
 
 regexes: list[Pattern[str]] = [identifier_r, int_literal_r, operator_r, punctuation_r]
-types = ['identifier', 'int_literal', 'operator', 'punctuation']
-
-
-def find_token(source_code: str, i: int) -> tuple[str, str] | None:
-  for j, t_type in enumerate(types):
-    match = regexes[j].match(source_code, i)
-    if match:
-      return (t_type, match[0])
-  return None
-
-
-def tokenize(source_code: str) -> list:
-  line = 0
-  col = 0
-  token_list = []
-  i = 0
-  while i < len(source_code):
-    comment_match = comment_r.match(source_code, i)
-    if comment_match is not None:
-      i += len(comment_match[0])
-      continue
-    if newline_r.match(source_code, i) is not None:
-      line += 1
-      col = 0
-      i += 1
-      continue
-    token = find_token(source_code, i)
-    if token:
-      token_list.append(Token(Loc(line, col), token[0], token[1]))
-      col += len(token[1])
-      i += len(token[1])
-      continue
+types = [TokenType.IDENTIFIER, TokenType.INT_LITERAL, TokenType.OPERATOR, TokenType.PUNCTUATION]
+kinds = {t_type.value: t_type for t_type in types}
 
-    col += 1
-    i += 1
-  return token_list
+# All token classes combined into a single alternation, tried in the same
+# order as the separate regexes above. Anything else is skipped, whole runs
+# of whitespace (including newlines) at once.
+token_r = re.compile('|'.join([
+  f'(?P<comment>{comment_r.pattern})',
+  *[f'(?P<{t_type}>{regexes[j].pattern})' for j, t_type in enumerate(types)],
+  r'(?P<skip>\s+|.)',
+]))
 
+
+def tokenize(source_code: str, source_map: SourceMap | None = None) -> list:
+  return list(tokenize_iter(source_code, source_map))
+
+
+def tokenize_iter(source_code: str, source_map: SourceMap | None = None) -> Iterator[Token]:
+  """Yields the tokens of `source_code` one by one, without building a list.
+
+  Token locations are offsets into `source_map`, which should be
+  built from the same source code."""
+  if source_map is None:
+    source_map = SourceMap(source_code)
+  for match in token_r.finditer(source_code):
+    kind = match.lastgroup
+    if kind == 'skip' or kind == 'comment' or kind is None:
+      continue
+    text = match[0]
+    if kind != 'int_literal':
+      # Names and operators repeat a lot, so share one string per spelling.
+      text = intern(text)
+    yield Token(OffsetLoc(match.start(), source_map), kinds[kind], text)
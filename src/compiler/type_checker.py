@@ -4,7 +4,12 @@ from compiler.symtab import SymTab
 
 ops_req_match = ['==', '!=']
 
-def typecheck(node: ast.Expression, symtab: SymTab) -> Type:
+def typecheck(node: ast.Tree, symtab: SymTab) -> Type:
+  if isinstance(node, ast.NodeRef):
+    tree = node.build()
+    t = typecheck(tree, symtab)
+    node.arena.store_types(node.id, tree)
+    return t
 
   def get_type(node: ast.Expression, symtab: SymTab) -> Type:
     match node:
@@ -32,11 +37,16 @@ def typecheck(node: ast.Expression, symtab: SymTab) -> Type:
       case ast.Var():
         identifier = node.val.name
         t_expr = typecheck(node.init, symtab)
-        
-        symtab.locals[identifier] = t_expr
+
+        if node.val.slot >= 0:
+          symtab.set_slot(node.val.slot, t_expr)
+        else:
+          symtab.locals[identifier] = t_expr
         return Unit
 
       case ast.Identifier():
+        if node.slot >= 0:
+          return symtab.slots[node.slot]
         current_tab = symtab
         identifier = node.name
         while True:
@@ -49,7 +59,7 @@ def typecheck(node: ast.Expression, symtab: SymTab) -> Type:
             return current_tab.locals[identifier]
 
       case ast.Block():
-        block_tab = SymTab[FunType]({}, symtab)
+        block_tab = symtab.child()
         for statement in node.statements:
           typecheck(statement, block_tab)
         return typecheck(node.result, block_tab)
@@ -103,6 +113,7 @@ def typecheck(node: ast.Expression, symtab: SymTab) -> Type:
         t = typecheck(node.cond, symtab)
         if t != Bool:
           raise Exception(f'Error: {node.loc}: while-loop condition expected boolean, got {t}')
+        typecheck(node.then, symtab)
         return Unit
 
       case ast.Function():
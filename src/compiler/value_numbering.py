@@ -0,0 +1,102 @@
+from collections import Counter
+from itertools import count
+from typing import Any
+from compiler import ir
+from compiler.cfg import BasicBlock, ControlFlowGraph
+from compiler.ir import IRVar
+from compiler.ir_interpreter import intrinsic_functions
+from compiler.liveness import definition
+
+commutative_intrinsics = frozenset(['+', '*', '==', '!='])
+
+
+class _Values:
+  """Value numbers known at some point in a block."""
+
+  def __init__(self, numbers: 'count[int]') -> None:
+    self.numbers = numbers
+    # The value number of each variable
+    self.of_var: dict[IRVar, int] = {}
+    # The value number of each computation: a constant or an intrinsic
+    # applied to value numbers
+    self.of_key: dict[tuple[Any, ...], int] = {}
+    # A variable that currently holds each value number
+    self.holder: dict[int, IRVar] = {}
+
+  def inherited(self, single_definition: set[IRVar]) -> '_Values':
+    """The values still known in a block dominated by this one.
+
+    A variable with several definitions may have been redefined on the
+    way, so only variables that are assigned just once are kept."""
+    values = _Values(self.numbers)
+    values.of_var = {var: n for var, n in self.of_var.items() if var in single_definition}
+    values.of_key = dict(self.of_key)
+    values.holder = {n: var for n, var in self.holder.items() if var in single_definition}
+    return values
+
+  def number(self, var: IRVar) -> int:
+    if var not in self.of_var:
+      self.assign(var, next(self.numbers))
+    return self.of_var[var]
+
+  def number_of_key(self, key: tuple[Any, ...]) -> int:
+    if key not in self.of_key:
+      self.of_key[key] = next(self.numbers)
+    return self.of_key[key]
+
+  def assign(self, var: IRVar, n: int) -> None:
+    old = self.of_var.get(var)
+    if old is not None and self.holder.get(old) == var:
+      del self.holder[old]
+    self.of_var[var] = n
+    self.holder.setdefault(n, var)
+
+
+def number_values(instructions: list[ir.Instruction], use_dominators: bool = False) -> list[ir.Instruction]:
+  """Replaces intrinsic calls that compute a value already held by
+  some variable with a copy of that variable.
+
+  By default only the earlier instructions of the same basic block are
+  considered. With `use_dominators`, so are the blocks that dominate it.
+  Builtins like `print_int` and `read_int` always produce a new value.
+  Copy propagation and dead code elimination should run afterwards to
+  remove the copies."""
+  graph = ControlFlowGraph(instructions)
+  definitions = Counter(dest for insn in instructions if (dest := definition(insn)) is not None)
+  single_definition = {var for var, n in definitions.items() if n == 1}
+  numbers = count()
+
+  def visit(block: BasicBlock, values: _Values) -> None:
+    new_instructions: list[ir.Instruction] = []
+    for insn in block.instructions:
+      match insn:
+        case ir.LoadIntConst() | ir.LoadBoolConst():
+          values.assign(insn.dest, values.number_of_key(('const', type(insn.value), insn.value)))
+        case ir.Copy():
+          values.assign(insn.dest, values.number(insn.source))
+        case ir.Call() if insn.fun.name in intrinsic_functions:
+          args = [values.number(arg) for arg in insn.args]
+          if insn.fun.name in commutative_intrinsics:
+            args.sort()
+          n = values.number_of_key((insn.fun.name, *args))
+          holder = values.holder.get(n)
+          if holder is not None and holder != insn.dest:
+            insn = ir.Copy(insn.location, holder, insn.dest)
+          values.assign(insn.dest, n)
+        case ir.Call():
+          values.assign(insn.dest, next(numbers))
+      new_instructions.append(insn)
+    block.instructions = new_instructions
+
+  if use_dominators:
+    children = graph.dominator_tree()
+    stack = [(graph.entry, _Values(numbers))]
+    while stack:
+      block, values = stack.pop()
+      visit(block, values)
+      for child in children[block.index]:
+        stack.append((child, values.inherited(single_definition)))
+  else:
+    for block in graph.blocks:
+      visit(block, _Values(numbers))
+  return graph.instructions()
@@ -0,0 +1,520 @@
+import re
+from dataclasses import dataclass, field
+
+
+class EncodingError(Exception):
+  """Assembly code outside the subset of x86-64 that `encode` knows."""
+
+
+@dataclass(frozen=True)
+class Register:
+  number: int
+  # 8 or 64
+  bits: int
+
+
+@dataclass(frozen=True)
+class Memory:
+  """`displacement(base)`"""
+  base: int
+  displacement: int
+
+
+@dataclass(frozen=True)
+class Immediate:
+  # A number, or a symbol whose value is only known after layout
+  value: int | str
+
+
+@dataclass(frozen=True)
+class Symbol:
+  """The target of a jump or call."""
+  name: str
+
+
+type Operand = Register | Memory | Immediate | Symbol
+
+
+@dataclass(frozen=True)
+class Relocation:
+  """A 32-bit field in the code that the linker fills in with the
+  address of `symbol`, or for 'pc32', its distance from the end of
+  the field."""
+  offset: int
+  symbol: str
+  kind: str
+
+
+@dataclass
+class ObjectCode:
+  code: bytes
+  # Offsets of the labels in `code`
+  labels: dict[str, int]
+  global_symbols: set[str]
+  relocations: list[Relocation]
+
+
+_register_names = [
+  ['%rax', '%rcx', '%rdx', '%rbx', '%rsp', '%rbp', '%rsi', '%rdi', *(f'%r{i}' for i in range(8, 16))],
+  ['%al', '%cl', '%dl', '%bl', '%spl', '%bpl', '%sil', '%dil', *(f'%r{i}b' for i in range(8, 16))],
+]
+_registers = {
+  name: Register(number, bits)
+  for names, bits in zip(_register_names, [64, 8])
+  for number, name in enumerate(names)
+}
+
+_condition_codes = {
+  'o': 0x0, 'no': 0x1, 'b': 0x2, 'c': 0x2, 'nae': 0x2, 'ae': 0x3, 'nb': 0x3, 'nc': 0x3,
+  'e': 0x4, 'z': 0x4, 'ne': 0x5, 'nz': 0x5, 'be': 0x6, 'na': 0x6, 'a': 0x7, 'nbe': 0x7,
+  's': 0x8, 'ns': 0x9, 'p': 0xA, 'pe': 0xA, 'np': 0xB, 'po': 0xB,
+  'l': 0xC, 'nge': 0xC, 'ge': 0xD, 'nl': 0xD, 'le': 0xE, 'ng': 0xE, 'g': 0xF, 'nle': 0xF,
+}
+
+# Two-operand arithmetic: the opcode of `op reg, r/m`, of `op r/m, reg`,
+# and the ModRM extension of `op $imm, r/m`
+_arithmetic = {
+  'add': (0x01, 0x03, 0), 'or': (0x09, 0x0B, 1), 'and': (0x21, 0x23, 4),
+  'sub': (0x29, 0x2B, 5), 'xor': (0x31, 0x33, 6), 'cmp': (0x39, 0x3B, 7),
+}
+# One-operand instructions: opcode and ModRM extension
+_unary = {
+  'inc': (0xFF, 0), 'dec': (0xFF, 1),
+  'not': (0xF7, 2), 'neg': (0xF7, 3), 'mul': (0xF7, 4), 'div': (0xF7, 6), 'idiv': (0xF7, 7),
+}
+# ModRM extensions of the shifts
+_shifts = {'sal': 4, 'shl': 4, 'shr': 5, 'sar': 7}
+# Instructions without operands
+_fixed = {
+  'cqto': b'\x48\x99', 'cqo': b'\x48\x99', 'ret': b'\xC3', 'leave': b'\xC9',
+  'syscall': b'\x0F\x05', 'nop': b'\x90',
+}
+# Mnemonics that may take a size suffix
+_sized = {*_arithmetic, *_unary, *_shifts, 'mov', 'imul', 'lea', 'push', 'pop', 'movabs'}
+
+_symbol_pattern = r'[A-Za-z_.$][\w.$]*'
+
+
+def _fits(value: int, bits: int) -> bool:
+  return -(1 << (bits - 1)) <= value < (1 << (bits - 1))
+
+
+def _little_endian(value: int, size: int) -> bytes:
+  return value.to_bytes(size, 'little', signed=value < 0)
+
+
+def _value(text: str) -> int | str:
+  if re.fullmatch(r'-?(0x[0-9a-fA-F]+|\d+)', text):
+    return int(text, 0)
+  if re.fullmatch(_symbol_pattern, text):
+    return text
+  raise EncodingError(f'Unsupported value: {text}')
+
+
+def parse_operand(text: str) -> Operand:
+  if text in _registers:
+    return _registers[text]
+  if text.startswith('$'):
+    return Immediate(_value(text[1:]))
+  if (m := re.fullmatch(r'(-?(?:0x[0-9a-fA-F]+|\d+))?\((%\w+)\)', text)) is not None:
+    base = _registers.get(m[2])
+    if base is None or base.bits != 64:
+      raise EncodingError(f'Unsupported base register: {m[2]}')
+    return Memory(base.number, int(m[1], 0) if m[1] else 0)
+  if re.fullmatch(_symbol_pattern, text):
+    return Symbol(text)
+  raise EncodingError(f'Unsupported operand: {text}')
+
+
+def _modrm(opcode: bytes, reg: int, rm: Register | Memory, wide: bool = True, force_rex: bool = False) -> bytearray:
+  """An instruction with a ModRM byte, and a REX prefix if needed.
+
+  `reg` is the register number, or the opcode extension, that goes in
+  the ModRM reg field. `wide` sets REX.W for a 64-bit operand size."""
+  base = rm.number if isinstance(rm, Register) else rm.base
+  rex = 0x40 | (wide << 3) | ((reg >> 3) << 2) | (base >> 3)
+  code = bytearray([rex] if rex != 0x40 or force_rex else [])
+  code += opcode
+  if isinstance(rm, Register):
+    code.append(0xC0 | (reg & 7) << 3 | base & 7)
+    return code
+  # With mod 0, base 5 (%rbp, %r13) would mean no base, so it gets a zero displacement.
+  if rm.displacement == 0 and base & 7 != 5:
+    mod, displacement = 0, b''
+  elif _fits(rm.displacement, 8):
+    mod, displacement = 1, _little_endian(rm.displacement, 1)
+  elif _fits(rm.displacement, 32):
+    mod, displacement = 2, _little_endian(rm.displacement, 4)
+  else:
+    raise EncodingError(f'Displacement out of range: {rm.displacement}')
+  code.append(mod << 6 | (reg & 7) << 3 | base & 7)
+  # Base 4 (%rsp, %r12) means a SIB byte follows, here one with no index.
+  if base & 7 == 4:
+    code.append(0x24)
+  code += displacement
+  return code
+
+
+def _needs_rex(*operands: Operand) -> bool:
+  """Whether an 8-bit register is %spl, %bpl, %sil or %dil, which
+  without a REX prefix would be %ah, %ch, %dh or %bh."""
+  return any(isinstance(o, Register) and o.bits == 8 and 4 <= o.number < 8 for o in operands)
+
+
+@dataclass
+class _Code:
+  data: bytearray = field(default_factory=bytearray)
+  # Relocations with offsets in `data`
+  relocations: list[Relocation] = field(default_factory=list)
+
+  def size(self) -> int:
+    return len(self.data)
+
+  def append(self, data: bytes | bytearray) -> None:
+    self.data += data
+
+  def immediate(self, value: int | str, size: int) -> None:
+    if isinstance(value, str):
+      assert size == 4
+      self.relocations.append(Relocation(len(self.data), value, 'abs32'))
+      value = 0
+    elif not _fits(value, 8 * size):
+      raise EncodingError(f'Immediate out of range: {value}')
+    self.data += _little_endian(value, size)
+
+
+@dataclass
+class _Branch:
+  """A jump or call whose size depends on how far its target is."""
+  target: str
+  # None if there is no 8-bit displacement form, as for calls
+  short_opcode: bytes | None
+  long_opcode: bytes
+  long: bool = False
+
+  def size(self) -> int:
+    return len(self.long_opcode) + 4 if self.long or self.short_opcode is None else len(self.short_opcode) + 1
+
+
+@dataclass
+class _Assignment:
+  """`name = expression`, evaluated where it appears."""
+  name: str
+  expression: str
+
+  def size(self) -> int:
+    return 0
+
+
+type _Fragment = _Code | _Branch | _Assignment
+
+
+class _Encoder:
+  def __init__(self) -> None:
+    self.fragments: list[_Fragment] = []
+    # The index of the fragment each label is at the start of
+    self.labels: dict[str, int] = {}
+    self.global_symbols: set[str] = set()
+
+  def code(self) -> _Code:
+    """A fragment for the next instruction to append its bytes to."""
+    last = self.fragments[-1] if self.fragments else None
+    if isinstance(last, _Code):
+      return last
+    new = _Code()
+    self.fragments.append(new)
+    return new
+
+  def label(self, name: str) -> None:
+    if name in self.labels:
+      raise EncodingError(f'Label defined twice: {name}')
+    self.labels[name] = len(self.fragments)
+    self.fragments.append(_Code())
+
+  def directive(self, name: str, rest: str) -> None:
+    match name:
+      case '.global' | '.globl':
+        self.global_symbols.update(s.strip() for s in rest.split(','))
+      case '.extern' | '.type':
+        pass
+      case '.text':
+        pass
+      case '.section' if rest.split(',')[0].strip() == '.text':
+        pass
+      case '.ascii' | '.asciz':
+        strings = re.findall(r'"((?:[^"\\]|\\.)*)"', rest)
+        if not strings:
+          raise EncodingError(f'Expected a string: {rest}')
+        for s in strings:
+          self.code().append(_unescape(s) + (b'\0' if name == '.asciz' else b''))
+      case _:
+        raise EncodingError(f'Unsupported directive: {name} {rest}'.rstrip())
+
+  def instruction(self, op: str, operands: list[Operand]) -> None:
+    if op == 'jmp' or op in ('call', 'callq') or (op[0] == 'j' and op[1:] in _condition_codes):
+      match operands:
+        case [Symbol(target)]:
+          if op == 'jmp':
+            self.fragments.append(_Branch(target, b'\xEB', b'\xE9'))
+          elif op.startswith('call'):
+            self.fragments.append(_Branch(target, None, b'\xE8'))
+          else:
+            cc = _condition_codes[op[1:]]
+            self.fragments.append(_Branch(target, bytes([0x70 | cc]), bytes([0x0F, 0x80 | cc])))
+          return
+      raise EncodingError('Only direct jumps and calls are supported')
+    if op.startswith('set') and op[3:] in _condition_codes:
+      match operands:
+        case [Register(bits=8) | Memory() as rm]:
+          self.code().append(_modrm(bytes([0x0F, 0x90 | _condition_codes[op[3:]]]), 0, rm, wide=False, force_rex=_needs_rex(rm)))
+          return
+      raise EncodingError('setcc needs an 8-bit register or memory operand')
+    if op in _fixed:
+      if operands:
+        raise EncodingError(f'{op} takes no operands')
+      self.code().append(_fixed[op])
+      return
+
+    mnemonic, bits = op, None
+    if op not in _sized and op[-1] in 'bq' and op[:-1] in _sized:
+      mnemonic, bits = op[:-1], 8 if op[-1] == 'b' else 64
+    if mnemonic not in _sized:
+      raise EncodingError(f'Unsupported instruction: {op}')
+    register_bits = {o.bits for o in operands if isinstance(o, Register)}
+    if len(register_bits) > 1 or (bits is not None and register_bits and register_bits != {bits}):
+      raise EncodingError('Mismatched operand sizes')
+    bits = bits or next(iter(register_bits), None)
+    if bits is None:
+      raise EncodingError('Unknown operand size')
+    if bits == 8:
+      if mnemonic != 'mov':
+        raise EncodingError(f'8-bit operands are not supported for {op}')
+      self._move_byte(operands)
+    else:
+      self._instruction64(mnemonic, operands)
+
+  def _move_byte(self, operands: list[Operand]) -> None:
+    code = self.code()
+    match operands:
+      case [Immediate(value), Register() as r]:
+        rex = bytes([0x41]) if r.number >= 8 else bytes([0x40]) if _needs_rex(r) else b''
+        code.append(rex + bytes([0xB0 | r.number & 7]))
+        code.immediate(value, 1)
+      case [Immediate(value), Memory() as m]:
+        code.append(_modrm(b'\xC6', 0, m, wide=False))
+        code.immediate(value, 1)
+      case [Register() as r, Register() | Memory() as rm]:
+        code.append(_modrm(b'\x88', r.number, rm, wide=False, force_rex=_needs_rex(r, rm)))
+      case [Memory() as m, Register() as r]:
+        code.append(_modrm(b'\x8A', r.number, m, wide=False, force_rex=_needs_rex(r)))
+      case _:
+        raise EncodingError('Unsupported operands for movb')
+
+  def _instruction64(self, mnemonic: str, operands: list[Operand]) -> None:
+    code = self.code()
+    match mnemonic, operands:
+      case 'mov', [Immediate(int(value)), Register() as r] if not _fits(value, 32):
+        self._instruction64('movabs', operands)
+      case 'mov', [Immediate(value), Register() | Memory() as rm]:
+        code.append(_modrm(b'\xC7', 0, rm))
+        code.immediate(value, 4)
+      case 'mov', [Register() as r, Register() | Memory() as rm]:
+        code.append(_modrm(b'\x89', r.number, rm))
+      case 'mov', [Memory() as m, Register() as r]:
+        code.append(_modrm(b'\x8B', r.number, m))
+      case 'movabs', [Immediate(int(value)), Register() as r]:
+        code.append(bytes([0x48 | r.number >> 3, 0xB8 | r.number & 7]))
+        code.append(value.to_bytes(8, 'little', signed=value < 0))
+      case 'lea', [Memory() as m, Register() as r]:
+        code.append(_modrm(b'\x8D', r.number, m))
+      case _, [Immediate(value), Register() | Memory() as rm] if mnemonic in _arithmetic:
+        extension = _arithmetic[mnemonic][2]
+        if isinstance(value, int) and _fits(value, 8):
+          code.append(_modrm(b'\x83', extension, rm))
+          code.immediate(value, 1)
+        elif rm == Register(0, 64):
+          # %rax has a shorter form without ModRM
+          code.append(bytes([0x48, extension << 3 | 5]))
+          code.immediate(value, 4)
+        else:
+          code.append(_modrm(b'\x81', extension, rm))
+          code.immediate(value, 4)
+      case _, [Register() as r, Register() | Memory() as rm] if mnemonic in _arithmetic:
+        code.append(_modrm(bytes([_arithmetic[mnemonic][0]]), r.number, rm))
+      case _, [Memory() as m, Register() as r] if mnemonic in _arithmetic:
+        code.append(_modrm(bytes([_arithmetic[mnemonic][1]]), r.number, m))
+      case 'imul', [Register() | Memory() as rm]:
+        code.append(_modrm(b'\xF7', 5, rm))
+      case 'imul', [Register() | Memory() as rm, Register() as r]:
+        code.append(_modrm(b'\x0F\xAF', r.number, rm))
+      case 'imul', [Immediate(value), Register() as r]:
+        self._instruction64('imul', [Immediate(value), r, r])
+      case 'imul', [Immediate(value), Register() | Memory() as rm, Register() as r]:
+        if isinstance(value, int) and _fits(value, 8):
+          code.append(_modrm(b'\x6B', r.number, rm))
+          code.immediate(value, 1)
+        else:
+          code.append(_modrm(b'\x69', r.number, rm))
+          code.immediate(value, 4)
+      case _, [Register() | Memory() as rm] if mnemonic in _unary:
+        opcode, extension = _unary[mnemonic]
+        code.append(_modrm(bytes([opcode]), extension, rm))
+      case _, [Register() | Memory() as rm] if mnemonic in _shifts:
+        code.append(_modrm(b'\xD1', _shifts[mnemonic], rm))
+      case _, [Immediate(int(count)), Register() | Memory() as rm] if mnemonic in _shifts:
+        if count == 1:
+          code.append(_modrm(b'\xD1', _shifts[mnemonic], rm))
+        else:
+          code.append(_modrm(b'\xC1', _shifts[mnemonic], rm))
+          code.immediate(count, 1)
+      case 'push', [Register() as r]:
+        code.append(bytes([0x41, 0x50 | r.number & 7]) if r.number >= 8 else bytes([0x50 | r.number]))
+      case 'push', [Immediate(value)]:
+        if isinstance(value, int) and _fits(value, 8):
+          code.append(b'\x6A')
+          code.immediate(value, 1)
+        else:
+          code.append(b'\x68')
+          code.immediate(value, 4)
+      case 'push', [Memory() as m]:
+        # The operand size of push and pop is 64 bits without REX.W.
+        code.append(_modrm(b'\xFF', 6, m, wide=False))
+      case 'pop', [Register() as r]:
+        code.append(bytes([0x41, 0x58 | r.number & 7]) if r.number >= 8 else bytes([0x58 | r.number]))
+      case 'pop', [Memory() as m]:
+        code.append(_modrm(b'\x8F', 0, m, wide=False))
+      case _:
+        raise EncodingError(f'Unsupported operands for {mnemonic}')
+
+  def assemble(self) -> ObjectCode:
+    offsets = self._layout()
+    code = bytearray()
+    relocations: list[Relocation] = []
+    labels = {name: offsets[index] for name, index in self.labels.items()}
+    constants: dict[str, int] = {}
+    for fragment, offset in zip(self.fragments, offsets):
+      assert len(code) == offset
+      if isinstance(fragment, _Code):
+        code += fragment.data
+        relocations.extend(
+          Relocation(offset + r.offset, r.symbol, r.kind) for r in fragment.relocations
+        )
+      elif isinstance(fragment, _Assignment):
+        if fragment.name in labels or fragment.name in constants:
+          raise EncodingError(f'Symbol defined twice: {fragment.name}')
+        constants[fragment.name] = _evaluate(fragment.expression, offset, labels, constants)
+      elif fragment.short_opcode is not None and not fragment.long:
+        code += fragment.short_opcode
+        code += _little_endian(labels[fragment.target] - (offset + fragment.size()), 1)
+      else:
+        code += fragment.long_opcode
+        if fragment.target in labels:
+          code += _little_endian(labels[fragment.target] - (offset + fragment.size()), 4)
+        else:
+          relocations.append(Relocation(len(code), fragment.target, 'pc32'))
+          code += bytes(4)
+
+    # Constants are known now, so only addresses are left to the linker.
+    unresolved = []
+    for r in relocations:
+      if r.symbol in constants:
+        code[r.offset:r.offset + 4] = _little_endian(constants[r.symbol], 4)
+      else:
+        unresolved.append(r)
+    return ObjectCode(bytes(code), labels, self.global_symbols, unresolved)
+
+  def _layout(self) -> list[int]:
+    """The offset of each fragment. Jumps start out short, and those
+    whose targets turn out too far become long until all fit."""
+    for fragment in self.fragments:
+      if isinstance(fragment, _Branch) and fragment.target not in self.labels:
+        fragment.long = True
+    while True:
+      offsets = []
+      offset = 0
+      for fragment in self.fragments:
+        offsets.append(offset)
+        offset += fragment.size()
+      offsets.append(offset)
+      grew = False
+      for fragment, offset in zip(self.fragments, offsets):
+        if isinstance(fragment, _Branch) and fragment.short_opcode is not None and not fragment.long:
+          if not _fits(offsets[self.labels[fragment.target]] - (offset + fragment.size()), 8):
+            fragment.long = grew = True
+      if not grew:
+        return offsets
+
+
+def _unescape(text: str) -> bytes:
+  escapes = {'n': 10, 't': 9, 'r': 13, 'b': 8, 'f': 12, '\\': 92, '"': 34, "'": 39}
+
+  def replace(m: re.Match[str]) -> str:
+    if m[1] is not None:
+      return chr(int(m[1], 8) & 0xFF)
+    if m[2] in escapes:
+      return chr(escapes[m[2]])
+    raise EncodingError(f'Unsupported escape sequence: \\{m[2]}')
+
+  return re.sub(r'\\(?:([0-7]{1,3})|(.))', replace, text).encode('latin-1')
+
+
+def _evaluate(expression: str, position: int, labels: dict[str, int], constants: dict[str, int]) -> int:
+  """Evaluates a sum of numbers, constants and differences of labels,
+  where `.` is the label at `position`."""
+  if not re.fullmatch(r'\s*[-+]?\s*[\w.$]+(\s*[-+]\s*[\w.$]+)*\s*', expression):
+    raise EncodingError(f'Unsupported expression: {expression}')
+  total = 0
+  # Labels added minus labels subtracted. Only 0 gives a constant.
+  label_count = 0
+  for sign, term in re.findall(r'([-+]?)\s*([\w.$]+)', expression):
+    factor = -1 if sign == '-' else 1
+    if term == '.' or term in labels:
+      total += factor * (position if term == '.' else labels[term])
+      label_count += factor
+    elif term in constants:
+      total += factor * constants[term]
+    else:
+      value = _value(term)
+      if isinstance(value, str):
+        raise EncodingError(f'Undefined symbol in expression: {term}')
+      total += factor * value
+  if label_count != 0:
+    raise EncodingError(f'Not a constant: {expression}')
+  return total
+
+
+def _strip_comment(line: str) -> str:
+  m = re.match(r'(?:[^#"]|"(?:[^"\\]|\\.)*")*', line)
+  assert m is not None
+  return m[0]
+
+
+def encode(assembly: str) -> ObjectCode:
+  """Translates assembly code in AT&T syntax to machine code.
+
+  Only the instructions and directives that the compiler and the stdlib
+  use are supported, with operands that are registers, `$` immediates,
+  `displacement(%base)` memory references and labels. Jumps to labels
+  in the same code get 8-bit displacements where they fit."""
+  encoder = _Encoder()
+  for line_number, text in enumerate(assembly.split('\n'), start=1):
+    line = _strip_comment(text).strip()
+    try:
+      while (m := re.match(rf'({_symbol_pattern}):\s*', line)) is not None:
+        encoder.label(m[1])
+        line = line[m.end():]
+      if line == '':
+        continue
+      if (m := re.fullmatch(rf'({_symbol_pattern})\s*=\s*(.+)', line)) is not None:
+        encoder.fragments.append(_Assignment(m[1], m[2]))
+        continue
+      op, _, rest = line.partition(' ')
+      if op.startswith('.'):
+        encoder.directive(op, rest.strip())
+        continue
+      # Commas inside parentheses, as in `(%rax,%rbx,8)`, don't separate operands.
+      operands = [parse_operand(o.strip()) for o in re.split(r',(?![^()]*\))', rest)] if rest.strip() else []
+      encoder.instruction(op, operands)
+    except EncodingError as e:
+      raise EncodingError(f'Line {line_number}: {e}: {text.strip()}') from None
+  return encoder.assemble()
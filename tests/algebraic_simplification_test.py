@@ -0,0 +1,41 @@
+from compiler import ir
+from compiler.algebraic_simplification import simplify
+from compiler.constant_propagation import propagate_constants
+from compiler.copy_propagation import remove_copies
+from compiler.ir import IRVar
+from compiler.Loc import L
+from tests.program_generator import ProgramGenerator, compile_ir, run_ir
+
+
+def simplified_calls(source: str) -> list[str]:
+  instructions, _ = remove_copies(simplify(propagate_constants(compile_ir(source))))
+  return [str(insn.fun) for insn in instructions if isinstance(insn, ir.Call)]
+
+def test_identities() -> None:
+  for expr in ['x + 0', '0 + x', 'x - 0', 'x * 1', '1 * x', 'x / 1']:
+    assert simplified_calls(f'{{ var x = read_int(); print_int({expr}); }}') == ['read_int', 'print_int'], expr
+
+def test_zero_results() -> None:
+  for expr in ['x * 0', '0 * x', 'x - x', 'x % 1']:
+    instructions = simplify(propagate_constants(compile_ir(f'{{ var x = read_int(); print_int({expr}); }}')))
+    assert any(isinstance(insn, ir.LoadIntConst) and insn.value == 0 for insn in instructions), expr
+    assert simplified_calls(f'{{ var x = read_int(); print_int({expr}); }}') == ['read_int', 'print_int'], expr
+
+def test_negation() -> None:
+  for expr in ['x * (-1)', '(-1) * x', '0 - x']:
+    assert simplified_calls(f'{{ var x = read_int(); print_int({expr}); }}') == ['read_int', 'unary_-', 'print_int'], expr
+
+def test_comparison_with_itself() -> None:
+  x, dest = IRVar('x'), IRVar('d')
+  for op, value in [('==', True), ('<=', True), ('>=', True), ('!=', False), ('<', False), ('>', False)]:
+    assert simplify([ir.Call(L, IRVar(op), [x, x], dest)]) == [ir.LoadBoolConst(L, value, dest)]
+
+def test_division_by_minus_one_is_kept() -> None:
+  # The smallest Int divided by -1 traps.
+  assert simplified_calls('{ var x = read_int(); print_int(x / (-1)); print_int(x % (-1)); }') == \
+    ['read_int', '/', 'print_int', '%', 'print_int']
+
+def test_same_output() -> None:
+  for seed in range(300):
+    instructions = propagate_constants(compile_ir(ProgramGenerator(seed).program()))
+    assert run_ir(simplify(instructions)) == run_ir(instructions)
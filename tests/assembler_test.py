@@ -0,0 +1,78 @@
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+import pytest
+from compiler import assembler
+
+pytestmark = pytest.mark.skipif(shutil.which('as') is None, reason='needs as')
+
+
+def count_runs(monkeypatch: Any) -> list[list[str]]:
+  runs: list[list[str]] = []
+  real_run = subprocess.run
+  def run(args: list[str], **kwargs: Any) -> Any:
+    runs.append(args)
+    return real_run(args, **kwargs)
+  monkeypatch.setattr(assembler.subprocess, 'run', run)
+  return runs
+
+def test_stdlib_is_assembled_once(tmp_path: Path, monkeypatch: Any) -> None:
+  runs = count_runs(monkeypatch)
+  cache = str(tmp_path / 'cache')
+  first = assembler.stdlib_object(False, cache, str(tmp_path))
+  assert assembler.stdlib_object(False, cache, str(tmp_path)) == first
+  assert len(runs) == 1
+  without_start = assembler.stdlib_object(True, cache, str(tmp_path))
+  assert without_start != first and len(runs) == 2
+  assert sorted(os.listdir(cache)) == sorted([os.path.basename(first), os.path.basename(without_start)])
+
+def test_warm_cache(tmp_path: Path, monkeypatch: Any) -> None:
+  assembler.warm_stdlib_cache(str(tmp_path))
+  runs = count_runs(monkeypatch)
+  assembler.stdlib_object(True, str(tmp_path), str(tmp_path))
+  assembler.stdlib_object(False, str(tmp_path), str(tmp_path))
+  assert runs == []
+
+def test_concurrent_compilers(tmp_path: Path) -> None:
+  cache = str(tmp_path / 'cache')
+  with ThreadPoolExecutor(8) as pool:
+    paths = set(pool.map(lambda i: assembler.stdlib_object(False, cache, str(tmp_path)), range(16)))
+  assert len(paths) == 1
+  assert os.listdir(cache) == [os.path.basename(paths.pop())]
+
+def test_without_cache(tmp_path: Path) -> None:
+  assert assembler.stdlib_object(False, None, str(tmp_path)) == str(tmp_path / 'stdlib.o')
+  # A cache directory that can't be created is the same as none.
+  (tmp_path / 'file').write_text('')
+  assert assembler.stdlib_object(False, str(tmp_path / 'file' / 'cache'), str(tmp_path)) == str(tmp_path / 'stdlib.o')
+
+@pytest.mark.skipif(shutil.which('as') is None or shutil.which('ld') is None, reason='needs as and ld')
+def test_read_int_keeps_r12(tmp_path: Path) -> None:
+  # main keeps 42 in r12 across read_int, which must restore it.
+  assembly = """
+    .global main
+    .section .text
+main:
+    pushq %rbp
+    movq %rsp, %rbp
+    pushq %r12
+    subq $8, %rsp
+    movq $42, %r12
+    call read_int
+    movq %rax, %rdi
+    call print_int
+    movq %r12, %rdi
+    call print_int
+    addq $8, %rsp
+    popq %r12
+    popq %rbp
+    movq $0, %rax
+    ret
+"""
+  executable = str(tmp_path / 'program')
+  assembler.assemble(assembly, executable)
+  result = subprocess.run([executable], input='-17\n', capture_output=True, text=True, check=True)
+  assert result.stdout.split() == ['-17', '42']
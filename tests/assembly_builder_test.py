@@ -0,0 +1,40 @@
+from compiler import ir
+from compiler.assembly_builder import AssemblyBuilder
+from compiler.assembly_generator import generate_assembly
+from compiler.config import PipelineConfig
+from compiler.ir import IRVar
+from compiler.Loc import Loc
+
+here, there = Loc(1, 2), Loc(3, 4)
+instructions: list[ir.Instruction] = [
+  ir.LoadIntConst(here, 1, IRVar('x')),
+  ir.Call(here, IRVar('print_int'), [IRVar('x')], IRVar('y')),
+  ir.Label(there, 'done'),
+]
+
+def comments(debug_level: str) -> list[str]:
+  assembly = generate_assembly(instructions, debug_level=debug_level)
+  return [line for line in assembly.splitlines() if line.startswith('#')]
+
+def test_debug_levels() -> None:
+  assert comments('none') == []
+  assert comments('loc') == ['# (1, 2)', '# (3, 4)']
+  assert comments('ir') == [
+    '# LoadIntConst(1, x)', '# Call(print_int, [x], y)', '# Label(done)', '# Return(None)',
+  ]
+
+def test_no_blank_lines_without_comments() -> None:
+  assembly = generate_assembly(instructions)
+  assert '' not in assembly.splitlines()
+  assert assembly.endswith('ret\n')
+
+def test_unknown_debug_level() -> None:
+  try:
+    AssemblyBuilder('all')
+    assert False
+  except Exception as e:
+    assert 'debug level' in e.args[0]
+
+def test_comments_option() -> None:
+  config = PipelineConfig().with_flag('--asm-comments=ir')
+  assert config is not None and config.asm_comments == 'ir'
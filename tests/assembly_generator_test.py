@@ -0,0 +1,61 @@
+from compiler import intrinsics, ir
+from compiler.assembly_generator import generate_assembly
+from compiler.intrinsics import IntrinsicArgs
+from compiler.ir import IRVar
+from compiler.Loc import L
+
+
+def code_lines(assembly: str) -> list[str]:
+  return [line for line in assembly.splitlines() if line and not line.startswith(('#', '\n', '.'))]
+
+def call_lines(arg_count: int) -> list[str]:
+  args = [IRVar(f'a{i}') for i in range(arg_count)]
+  instructions: list[ir.Instruction] = [ir.LoadIntConst(L, i, arg) for i, arg in enumerate(args)]
+  instructions.append(ir.Call(L, IRVar('f'), args, IRVar('r')))
+  lines = code_lines(generate_assembly(instructions, allocate_registers=False))
+  return lines[lines.index(f'movq ${arg_count - 1}, {-8 * arg_count}(%rbp)') + 1:lines.index('movq $0, %rax')]
+
+def test_call_with_stack_arguments() -> None:
+  lines = call_lines(8)
+  assert lines[:2] == ['pushq -64(%rbp)', 'pushq -56(%rbp)']
+  assert lines[2:8] == [f'movq {-8 * (i + 1)}(%rbp), {r}' for i, r in enumerate(['%rdi', '%rsi', '%rdx', '%rcx', '%r8', '%r9'])]
+  assert lines[8:] == ['callq f', 'addq $16, %rsp', 'movq %rax, -72(%rbp)']
+
+def test_odd_stack_arguments_keep_alignment() -> None:
+  lines = call_lines(7)
+  assert lines[:2] == ['subq $8, %rsp', 'pushq -56(%rbp)']
+  assert lines[-2] == 'addq $16, %rsp'
+
+def emitted(name: str, arg_refs: list[str], result_register: str) -> list[str]:
+  lines: list[str] = []
+  intrinsics.all_intrinsics[name](IntrinsicArgs(arg_refs, result_register, lines.append))
+  return lines
+
+def test_result_in_argument_register() -> None:
+  assert emitted('+', ['%rsi', '%rcx'], '%rcx') == ['addq %rsi, %rcx']
+  assert emitted('-', ['%rsi', '%rcx'], '%rcx') == ['negq %rcx', 'addq %rsi, %rcx']
+  assert emitted('-', ['%rcx', '%rsi'], '%rcx') == ['subq %rsi, %rcx']
+  assert emitted('*', ['-8(%rbp)', '%rbx'], '%rbx') == ['imulq -8(%rbp), %rbx']
+
+def test_intrinsic_writes_allocated_register() -> None:
+  instructions: list[ir.Instruction] = [
+    ir.Call(L, IRVar('read_int'), [], IRVar('a')),
+    ir.Call(L, IRVar('+'), [IRVar('a'), IRVar('a')], IRVar('b')),
+    ir.Call(L, IRVar('print_int'), [IRVar('b')], IRVar('c')),
+  ]
+  lines = code_lines(generate_assembly(instructions))
+  add = next(line for line in lines if line.startswith('addq'))
+  # The sum goes to the register of `b`, from which it is passed on.
+  assert lines[lines.index(add) + 1] == f'movq {add.split()[-1]}, %rdi'
+
+def test_calls_the_operators_intrinsic() -> None:
+  for op, mnemonic in [('+', 'addq'), ('-', 'subq'), ('*', 'imulq'), ('/', 'idivq'), ('<', 'setl'), ('==', 'sete')]:
+    instructions: list[ir.Instruction] = [
+      ir.Call(L, IRVar('read_int'), [], IRVar('a')),
+      ir.Call(L, IRVar('read_int'), [], IRVar('b')),
+      ir.Call(L, IRVar(op), [IRVar('a'), IRVar('b')], IRVar('c')),
+    ]
+    lines = code_lines(generate_assembly(instructions, allocate_registers=False))
+    mnemonics = [line.split()[0] for line in lines]
+    assert mnemonic in mnemonics, op
+    assert op == '+' or 'addq' not in mnemonics, op
@@ -0,0 +1,60 @@
+from compiler.ast import Arena, BinaryOp, Block, Expression, Function, Identifier, IfStatement, Literal, Unary, Var, While
+from compiler.interpreter import interpret
+from compiler.ir_generator import generate_ir
+from compiler.Loc import L
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler import symtab
+from compiler.symtab import SymTab, TopLevel, TopType
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck
+from compiler.type import Bool, Int
+
+def test_nodes_are_slotted() -> None:
+  assert not hasattr(Literal(L, value=1), '__dict__')
+  assert not hasattr(Block(L, statements=[], result=Literal(L, value=None)), '__dict__')
+
+def test_arena_round_trip() -> None:
+  tree = Block(L, statements=[
+    Var(L, val=Identifier(L, name='x'), init=Unary(L, op='-', right=Literal(L, value=1)), type=Int),
+    While(L, cond=Literal(L, value=False), then=Function(L, name=Identifier(L, name='print_int'), args=[Identifier(L, name='x')]))],
+    result=IfStatement(L, cond=Literal(L, value=True), then=BinaryOp(L, left=Identifier(L, name='x'), op='+', right=Literal(L, value=2)), els=Literal(L, value=None)))
+  arena = Arena()
+  ref = arena.add(tree)
+  assert len(arena) == 16
+  assert ref.build() == tree
+  assert arena.build(ref.id).statements[0].type == Int # type: ignore
+
+def test_consumers_accept_arena_nodes() -> None:
+  tree = Block(L, statements=[Var(L, val=Identifier(L, name='x'), init=Literal(L, value=4))],
+    result=BinaryOp(L, left=Identifier(L, name='x'), op='<', right=Literal(L, value=5)))
+  ref = Arena().add(tree)
+  assert interpret(ref, SymTab({}, TopLevel)) is True
+  assert typecheck(ref, SymTab({}, TopType)) == Bool
+  assert ref.type == Bool
+  assert ref.build().result.type == Bool # type: ignore
+  assert generate_ir(symtab.names, ref) == generate_ir(symtab.names, ref.build())
+
+def test_arena_handles_deep_trees() -> None:
+  tree: Expression = Literal(L, value=1)
+  for _ in range(5000):
+    tree = BinaryOp(L, left=tree, op='+', right=Literal(L, value=1))
+  ref = Arena().add(tree)
+  assert len(ref.arena) == 10001
+  # Comparing the trees with == would recurse too deep, so follow the left operands.
+  node = ref.build()
+  depth = 0
+  while isinstance(node, BinaryOp):
+    assert node.right == Literal(L, value=1)
+    node, depth = node.left, depth + 1
+  assert node == Literal(L, value=1) and depth == 5000
+
+def test_arena_keeps_resolved_slots() -> None:
+  tree = parse(tokenize('{ var x = 1; { var x = 2; x }; x }'))
+  resolve(tree)
+  rebuilt = Arena().add(tree).build()
+  assert isinstance(rebuilt, Block) and isinstance(rebuilt.result, Identifier)
+  assert rebuilt.result.slot == 0
+  inner = rebuilt.statements[1]
+  assert isinstance(inner, Block) and isinstance(inner.result, Identifier)
+  assert inner.result.slot == 1
@@ -0,0 +1,96 @@
+from typing import Any
+from compiler import bytecode, interpreter, symtab
+from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler.symtab import SymTab, TopLevel, TopType
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck
+from tests.program_generator import ProgramGenerator, run_ir
+
+programs = [
+  "2 + 3 * 4 - 10 / 3 % 2",
+  "-7 / 2 + -7 % 2",
+  "1 < 2 and not (3 >= 4) or false",
+  "{ var x = false; true or { x = true; true }; x }",
+  "{ var x = true; false and { x = false; true }; x }",
+  "{ var x = 4; if x == 4 then x = 3 else x = 2; x }",
+  "{ var x = 1; { var x = 10; x = x + 1; } x }",
+  "{ var i = 0; var s = 0; while i < 100 do { s = s + i * i % 7; i = i + 1; } s }",
+  "{ var x = 1; while x < 10 do x = x + 1 }",
+  "{ var x = 1; var y = x = 5; x + y }",
+  "if 1 > 2 then 3",
+  "-3 - -2",
+]
+
+def run(source: str, builtins: list[bytecode.Builtin] = bytecode.default_builtins) -> Any:
+  return bytecode.run(bytecode.compile_program(parse(tokenize(source))), builtins)
+
+def test_same_results_as_tree_walker() -> None:
+  for source in programs:
+    expected = interpreter.interpret(parse(tokenize(source)), SymTab[Any]({}, TopLevel))
+    assert run(source) == expected, source
+
+def test_builtins() -> None:
+  output: list[str] = []
+  inputs = iter([20, 22])
+  builtins: list[bytecode.Builtin] = [
+    lambda a: output.append(f'int {a}'),
+    lambda a: output.append(f'bool {a}'),
+    lambda: next(inputs),
+  ]
+  assert run("{ print_int(read_int() + read_int()); print_bool(1 < 2); 3 }", builtins) == 3
+  assert output == ['int 42', 'bool True']
+
+def test_prints_typed_result(capsys: Any) -> None:
+  for source, expected in [("{ var x = 6; x * 7 }", "42\n"), ("1 < 2", "true\n"), ("{ var x = 1; }", "")]:
+    tree = parse(tokenize(source))
+    typecheck(tree, TopType.child())
+    bytecode.run(bytecode.compile_program(tree))
+    assert capsys.readouterr().out == expected, source
+
+def test_code_object() -> None:
+  program = bytecode.compile_program(parse(tokenize("{ var x = 1; x = x + 1; x }")))
+  assert program.code.typecode == 'q'
+  assert program.frame_size == 1
+  assert program.disassemble() == [
+    '0: CONST 0', '2: STORE 0', '4: LOAD 0', '6: CONST 0', '8: ADD', '9: STORE 0', '11: LOAD 0', '13: RETURN',
+  ]
+  assert bytecode.run(program) == 2
+  assert bytecode.run(program) == 2
+
+def test_errors() -> None:
+  for source, message in [
+    ("{ var x = 1; y }", 'Variable not found: "y"'),
+    ("{ f(1) }", 'Unknown function: "f"'),
+  ]:
+    try:
+      run(source)
+      assert False
+    except Exception as e:
+      assert message in e.args[0]
+
+def test_native_integer_semantics() -> None:
+  # As computed by the compiled programs
+  for source, expected in [
+    ("(0 - 7) % 3", -1),
+    ("7 % (0 - 3)", 1),
+    ("(0 - 7) / 2", -3),
+    ("4611686018427387905 / 1", 4611686018427387905),
+    ("9223372036854775807 + 1", -9223372036854775808),
+    ("0 - 9223372036854775807 - 2", 9223372036854775807),
+    ("3037000500 * 3037000500", -9223372036709301616),
+    ("-(0 - 9223372036854775807 - 1)", -9223372036854775808),
+  ]:
+    assert run(source) == expected, source
+
+def test_same_output_as_ir_interpreter() -> None:
+  for seed in range(100):
+    source = ProgramGenerator(seed, divisions=True).program()
+    tree = parse(tokenize(source))
+    resolve(tree)
+    typecheck(tree, TopType.child())
+    output: list[Any] = []
+    builtins: list[bytecode.Builtin] = [output.append, output.append, lambda: 0]
+    bytecode.run(bytecode.compile_program(tree), builtins)
+    assert output == run_ir(generate_ir(symtab.names, tree)), source
@@ -0,0 +1,63 @@
+from compiler import ir, symtab
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import IRVar
+from compiler.ir_generator import generate_ir
+from compiler.Loc import L
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler.symtab import TopType
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck
+
+
+def build(source: str) -> ControlFlowGraph:
+  tree = parse(tokenize(source))
+  resolve(tree)
+  typecheck(tree, TopType.child())
+  return ControlFlowGraph(generate_ir(symtab.names, tree))
+
+def test_while_loop() -> None:
+  graph = build("{ var i = 0; while i < 10 do { if i % 2 == 0 then print_int(i); i = i + 1; } }")
+  labels = [[label.name for label in block.labels] for block in graph.blocks]
+  assert labels == [[], ['L1'], ['L2'], ['L4'], ['L5'], ['L3']]
+  entry, start, body, then, after_if, end = graph.blocks
+  assert entry.successors == [start]
+  assert start.successors == [body, end]
+  assert start.predecessors == [entry, after_if]
+  assert body.successors == [then, after_if]
+  assert then.successors == [after_if]
+  assert end.successors == []
+  assert graph.instructions() == [insn for block in graph.blocks for insn in block.instructions]
+
+  assert graph.reverse_postorder() == [entry, start, body, then, after_if, end]
+  assert graph.immediate_dominators() == [entry, entry, start, body, body, start]
+  assert graph.dominates(start, after_if)
+  assert not graph.dominates(then, after_if)
+  assert graph.dominator_tree()[body.index] == [then, after_if]
+
+def test_unreachable_and_empty() -> None:
+  a, b = ir.Label(L, 'a'), ir.Label(L, 'b')
+  graph = ControlFlowGraph([ir.Jump(L, b), a, ir.LoadIntConst(L, 1, IRVar('x')), b])
+  first, dead, last = graph.blocks
+  assert first.successors == [last]
+  assert dead.predecessors == [] and dead.successors == [last]
+  assert last.predecessors == [first, dead]
+  assert graph.reverse_postorder() == [first, last]
+  assert graph.immediate_dominators() == [first, None, first]
+  assert not graph.dominates(first, dead)
+
+  empty = ControlFlowGraph([])
+  assert len(empty.blocks) == 1 and empty.reverse_postorder() == [empty.entry]
+
+def test_consecutive_labels_and_duplicate_edges() -> None:
+  a, b = ir.Label(L, 'a'), ir.Label(L, 'b')
+  graph = ControlFlowGraph([a, b, ir.CondJump(L, IRVar('c'), a, b)])
+  assert len(graph.blocks) == 1
+  block = graph.entry
+  assert block.labels == [a, b]
+  assert block.successors == [block] and block.predecessors == [block]
+  try:
+    ControlFlowGraph([ir.Jump(L, ir.Label(L, 'missing'))])
+    assert False
+  except Exception as e:
+    assert e.args[0] == 'Error: (0, 0): Unknown label: "missing"'
@@ -0,0 +1,40 @@
+from typing import Any
+from compiler import closure_interpreter, interpreter
+from compiler.ast import BinaryOp, Block, Identifier, Literal, Var
+from compiler.Loc import L
+from compiler.parser import parse
+from compiler.symtab import SymTab, TopLevel
+from compiler.tokenizer import tokenize
+
+programs = [
+  "2 + 3 * 4 - 10 / 3 % 2",
+  "1 < 2 and not (3 >= 4) or false",
+  "{ var x = false; true or { x = true; true }; x }",
+  "{ var x = 4; if x == 4 then x = 3 else x = 2; x }",
+  "{ var x = 1; { var x = 10; x = x + 1; } x }",
+  "{ var i = 0; var s = 0; while i < 100 do { s = s + i * i % 7; i = i + 1; } s }",
+  "{ var x = 1; while x < 10 do x = x + 1 }",
+  "if 1 > 2 then 3",
+  "-3 - -2",
+]
+
+def test_same_results_as_tree_walker() -> None:
+  for source in programs:
+    expected = interpreter.interpret(parse(tokenize(source)), SymTab[Any]({}, TopLevel))
+    assert closure_interpreter.interpret(parse(tokenize(source)), SymTab[Any]({}, TopLevel)) == expected, source
+
+def test_globals_and_errors() -> None:
+  ast = BinaryOp(L, left=Identifier(L, name='g'), op='=', right=BinaryOp(L, left=Identifier(L, name='g'), op='+', right=Literal(L, value=1)))
+  globals = SymTab[Any]({'g': 41}, TopLevel)
+  assert closure_interpreter.interpret(ast, globals) == 42
+  assert globals.locals['g'] == 42
+  try:
+    closure_interpreter.interpret(Block(L, statements=[Var(L, val=Identifier(L, name='x'), init=Literal(L, value=1))], result=Identifier(L, name='y')), TopLevel)
+    assert False
+  except Exception as e:
+    assert e.args[0] == 'Error: (0, 0): Variable not found: "y"'
+
+def test_compiled_program_can_be_rerun() -> None:
+  run = closure_interpreter.compile_program(parse(tokenize("{ var x = 1; x = x + 1; x }")), TopLevel)
+  assert run() == 2
+  assert run() == 2
@@ -0,0 +1,35 @@
+from typing import Any
+from compiler.config import PipelineConfig
+
+def test_defaults_skip_evaluation() -> None:
+  assert PipelineConfig().evaluate is False
+
+def test_flags() -> None:
+  config = PipelineConfig()
+  config2 = config.with_flag('--evaluate')
+  assert config2 is not None and config2.evaluate
+  config3 = config2.with_flag('--eval-max-steps=50')
+  assert config3 is not None and config3.eval_max_steps == 50
+  assert config.with_flag('--output=a.out') is None
+  config4 = config3.with_flag('--no-evaluate')
+  assert config4 is not None and not config4.evaluate
+
+def test_request_options_only_lower_limits() -> None:
+  config = PipelineConfig(eval_max_steps=100, eval_max_seconds=2.0)
+  config2 = config.with_options({'evaluate': True, 'eval_max_steps': 10**9, 'eval_max_seconds': 1}, limits_only_lowered=True)
+  assert config2 == PipelineConfig(evaluate=True, eval_max_steps=100, eval_max_seconds=1.0)
+
+def test_invalid_options() -> None:
+  invalid: list[dict[str, Any]] = [{'evaluate': 1}, {'nonsense': True}]
+  for options in invalid:
+    try:
+      PipelineConfig().with_options(options)
+      assert False
+    except Exception as e:
+      assert 'option' in e.args[0]
+
+def test_pass_options() -> None:
+  config = PipelineConfig().with_flag('--global-value-numbering')
+  assert config is not None and config.global_value_numbering and config.value_numbering
+  config = config.with_options({'value_numbering': False, 'copy_propagation': False}, limits_only_lowered=True)
+  assert not config.value_numbering and not config.copy_propagation
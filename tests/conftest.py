@@ -0,0 +1,14 @@
+from typing import Any
+import pytest
+from compiler import assembler
+
+
+@pytest.fixture(scope='session')
+def stdlib_cache_dir(tmp_path_factory: pytest.TempPathFactory) -> str:
+  return str(tmp_path_factory.mktemp('stdlib_cache'))
+
+
+# Keeps the assembled stdlib out of the user's real cache directory.
+@pytest.fixture(autouse=True)
+def isolated_stdlib_cache(stdlib_cache_dir: str, monkeypatch: Any) -> None:
+  monkeypatch.setattr(assembler, 'stdlib_cache_dir', stdlib_cache_dir)
@@ -0,0 +1,55 @@
+from compiler import ir, symtab
+from compiler.ast import BinaryOp, Literal
+from compiler.constant_propagation import propagate_constants
+from compiler.ir import Call, IRVar, LoadIntConst
+from compiler.ir_generator import generate_ir
+from compiler.Loc import L
+from compiler.type import Int
+from tests.program_generator import ProgramGenerator, compile_ir, run_ir
+
+
+def test_folds_constant_expression() -> None:
+  ast = BinaryOp(L, left=Literal(L, value=1, type=Int), op='+',
+                 right=BinaryOp(L, left=Literal(L, value=2, type=Int), op='*', right=Literal(L, value=3, type=Int)),
+                 type=Int)
+  assert propagate_constants(generate_ir(symtab.names, ast)) == [
+    LoadIntConst(L, value=1, dest=IRVar(name='x')),
+    LoadIntConst(L, value=2, dest=IRVar(name='x2')),
+    LoadIntConst(L, value=3, dest=IRVar(name='x3')),
+    LoadIntConst(L, value=6, dest=IRVar(name='x4')),
+    LoadIntConst(L, value=7, dest=IRVar(name='x5')),
+    Call(L, fun=IRVar(name='print_int'), args=[IRVar(name='x5')], dest=IRVar(name='unit'))]
+
+def test_drops_unreachable_branches() -> None:
+  instructions = propagate_constants(compile_ir("{ var x = 3; if x > 2 then print_int(1) else print_int(2); x * 2 }"))
+  assert not any(isinstance(insn, ir.CondJump) for insn in instructions)
+  calls = [insn for insn in instructions if isinstance(insn, ir.Call)]
+  assert [str(call.fun) for call in calls] == ['print_int', 'print_int']
+  assert run_ir(instructions) == [1, 6]
+
+def test_loops() -> None:
+  # `x` is constant in the loop, `i` isn't.
+  instructions = propagate_constants(compile_ir("{ var x = 1; var i = 0; while i < 10 do { x = x * 1; i = i + 1; } x + i }"))
+  calls = [str(insn.fun) for insn in instructions if isinstance(insn, ir.Call)]
+  assert calls == ['<', '+', '+', 'print_int']
+  assert run_ir(instructions) == [11]
+  # The loop never runs, so its body is dropped.
+  instructions = propagate_constants(compile_ir("{ var i = 0; while i > 0 do { print_int(i); } i }"))
+  assert [str(insn.fun) for insn in instructions if isinstance(insn, ir.Call)] == ['print_int']
+
+def test_keeps_traps() -> None:
+  instructions = propagate_constants(compile_ir("{ var x = 0; print_int(1 / x); 2 % x }"))
+  calls = [str(insn.fun) for insn in instructions if isinstance(insn, ir.Call)]
+  assert calls == ['/', 'print_int', '%', 'print_int']
+
+def test_bools_are_not_ints() -> None:
+  instructions = propagate_constants(compile_ir("{ var b = true; var x = 1; if b then x = 1 else b = false; b == true }"))
+  assert run_ir(instructions) == [True]
+
+def test_same_output_as_unoptimized() -> None:
+  for seed in range(300):
+    source = ProgramGenerator(seed).program()
+    instructions = compile_ir(source)
+    optimized = propagate_constants(instructions)
+    assert run_ir(optimized) == run_ir(instructions), source
+    assert len(optimized) <= len(instructions)
@@ -0,0 +1,78 @@
+from typing import Any
+from compiler import ir
+from compiler.copy_propagation import eliminate_dead_code, propagate_copies, remove_copies
+from compiler.ir import IRVar
+from compiler.Loc import L
+from tests.program_generator import ProgramGenerator, compile_ir, run_ir
+
+a, b, c, d = IRVar('a'), IRVar('b'), IRVar('c'), IRVar('d')
+unit = IRVar('unit')
+
+def test_propagates_copies() -> None:
+  assert propagate_copies([
+    ir.Call(L, IRVar('read_int'), [], a),
+    ir.Copy(L, a, b),
+    ir.Copy(L, b, c),
+    ir.Call(L, IRVar('print_int'), [c], unit),
+  ]) == [
+    ir.Call(L, IRVar('read_int'), [], a),
+    ir.Copy(L, a, b),
+    ir.Copy(L, a, c),
+    ir.Call(L, IRVar('print_int'), [a], unit),
+  ]
+
+def test_redefinition_ends_copy() -> None:
+  instructions: list[ir.Instruction] = [
+    ir.LoadIntConst(L, 1, a),
+    ir.Copy(L, a, b),
+    ir.LoadIntConst(L, 2, a),
+    ir.Call(L, IRVar('+'), [a, b], c),
+  ]
+  assert propagate_copies(instructions) == instructions
+
+def test_copies_merge_at_joins() -> None:
+  then, els, end = ir.Label(L, 'then'), ir.Label(L, 'else'), ir.Label(L, 'end')
+  instructions: list[ir.Instruction] = [
+    ir.Call(L, IRVar('read_int'), [], a),
+    ir.Copy(L, a, b),
+    ir.CondJump(L, d, then, els),
+    then,
+    ir.Copy(L, a, c),
+    ir.Jump(L, end),
+    els,
+    ir.Call(L, IRVar('read_int'), [], c),
+    end,
+    ir.Call(L, IRVar('+'), [b, c], d),
+  ]
+  assert propagate_copies(instructions)[-1] == ir.Call(L, IRVar('+'), [a, c], d)
+
+def test_keeps_side_effects() -> None:
+  instructions: list[ir.Instruction] = [
+    ir.LoadIntConst(L, 0, a),
+    ir.Call(L, IRVar('/'), [a, a], b),
+    ir.Call(L, IRVar('*'), [a, a], c),
+    ir.Call(L, IRVar('read_int'), [], d),
+    ir.Copy(L, d, d),
+  ]
+  assert eliminate_dead_code(instructions) == instructions[:2] + instructions[3:4]
+
+def test_removes_copies_from_generated_code() -> None:
+  instructions = compile_ir("{ var x = read_int(); var y = x; var z = y; while z > 0 do { z = z - 1; } print_int(y); }")
+  result, removed = remove_copies(instructions)
+  assert removed == len(instructions) - len(result) > 0
+  assert [str(insn.fun) for insn in result if isinstance(insn, ir.Call)] == ['read_int', '>', '-', 'print_int']
+  assert sum(isinstance(insn, ir.Copy) for insn in result) == 2
+
+def test_same_output_as_unoptimized() -> None:
+  for seed in range(300):
+    source = ProgramGenerator(seed).program()
+    instructions = compile_ir(source)
+    optimized, removed = remove_copies(instructions)
+    assert run_ir(optimized) == run_ir(instructions), source
+    assert removed >= 0
+
+def test_compile_reports_copies_removed() -> None:
+  from compiler.__main__ import compile_to_ir
+  report: dict[str, Any] = {}
+  compile_to_ir("{ var x = read_int(); var y = x; print_int(y); }", report=report)
+  assert report['copies_removed'] > 0
@@ -0,0 +1,49 @@
+import platform
+import stat
+import subprocess
+from pathlib import Path
+from typing import Any, NoReturn
+import pytest
+from compiler import assembler
+from compiler.elf_writer import link
+from compiler.x86_encoder import encode
+
+native = pytest.mark.skipif(
+  platform.system() != 'Linux' or platform.machine() != 'x86_64', reason='needs x86-64 Linux'
+)
+
+
+def run(executable: bytes, path: Path, stdin: str = '') -> subprocess.CompletedProcess[str]:
+  path.write_bytes(executable)
+  path.chmod(stat.S_IRWXU)
+  return subprocess.run([str(path)], input=stdin, capture_output=True, text=True)
+
+exit_code = '\n'.join(['.global _start', '_start:', 'call exit_code', 'movq %rax, %rdi', 'movq $60, %rax', 'syscall'])
+returns_42 = '\n'.join(['.global exit_code', 'exit_code:', 'movq $42, %rax', 'ret'])
+
+@native
+def test_links_objects(tmp_path: Path) -> None:
+  executable = link([encode(exit_code), encode(returns_42)])
+  assert executable[:4] == b'\x7fELF'
+  assert run(executable, tmp_path / 'program').returncode == 42
+
+def test_symbols_must_be_defined_once() -> None:
+  with pytest.raises(Exception, match='Undefined symbol: exit_code'):
+    link([encode(exit_code)])
+  with pytest.raises(Exception, match='multiple objects: exit_code'):
+    link([encode(exit_code), encode(returns_42), encode(returns_42)])
+  with pytest.raises(Exception, match='entry point'):
+    link([encode(returns_42)])
+  # Labels that aren't global stay in their object.
+  link([encode(exit_code), encode(returns_42), encode('exit_code: ret')])
+
+@native
+def test_call_compiler_without_subprocesses(tmp_path: Path, monkeypatch: Any) -> None:
+  from compiler.__main__ import call_compiler
+  def fail(*args: Any, **kwargs: Any) -> NoReturn:
+    raise AssertionError('ran a subprocess')
+  with monkeypatch.context() as m:
+    m.setattr(assembler.subprocess, 'run', fail)
+    executable = call_compiler('{ var x = read_int(); print_int(x / 3); print_bool(x > 2); }')
+  assert run(executable, tmp_path / 'program', '-7\n').stdout == '-2\nfalse\n'
+  assert run(executable, tmp_path / 'program').returncode == 1
@@ -1,6 +1,7 @@
-from compiler.interpreter import interpret
+from typing import Any
+from compiler.interpreter import evaluate, interpret
 from compiler.Loc import L
-from compiler.ast import BinaryOp, Literal, Identifier, IfStatement, Unary, Block, Var, While
+from compiler.ast import BinaryOp, Function, Literal, Identifier, IfStatement, Unary, Block, Var, While
 from compiler.symtab import TopLevel
 
 def test_interpret_expression() -> None:
@@ -74,3 +75,39 @@ def test_while_no_return() -> None:
       then=BinaryOp(L, left=Identifier(L, name='x'), op='=', right=BinaryOp(L, left=Identifier(L, name='x'), op='+', right=Literal(L, value=1)))
     ))
   assert interpret(ast, TopLevel) is None
+
+def test_evaluate_captures_output() -> None:
+  ast = Block(L, statements=[Function(L, name=Identifier(L, name='print_int'), args=[Literal(L, value=3)])],
+    result=Function(L, name=Identifier(L, name='print_bool'), args=[Literal(L, value=True)]))
+  result = evaluate(ast, max_steps=100, max_seconds=1.0)
+  assert result.completed
+  assert result.output == ['3', 'true']
+
+def test_evaluate_step_budget() -> None:
+  ast = While(L, cond=Literal(L, value=True), then=Literal(L, value=None))
+  result = evaluate(ast, max_steps=1000, max_seconds=10.0)
+  assert not result.completed
+
+def test_evaluate_stops_at_read_int() -> None:
+  ast = Block(L, statements=[Function(L, name=Identifier(L, name='print_int'), args=[Literal(L, value=1)])],
+    result=Function(L, name=Identifier(L, name='read_int'), args=[]))
+  result = evaluate(ast, max_steps=100, max_seconds=1.0)
+  assert not result.completed
+  assert result.output == ['1']
+  assert result.error == 'read_int is not available during compile-time evaluation'
+
+def test_evaluate_stops_at_runtime_error() -> None:
+  ast = BinaryOp(L, left=Literal(L, value=1), op='/', right=Literal(L, value=0))
+  result = evaluate(ast, max_steps=100, max_seconds=1.0)
+  assert not result.completed
+  assert result.error is not None
+
+def test_compile_reports_evaluation() -> None:
+  from compiler.__main__ import compile_to_ir
+  from compiler.config import PipelineConfig
+  report: dict[str, Any] = {}
+  compile_to_ir('{ print_bool(1 < 2); 3 }', PipelineConfig(evaluate=True), report)
+  assert report['evaluation'] == {'value': 3, 'output': ['true'], 'completed': True, 'error': None}
+  report = {}
+  compile_to_ir('{ var x = read_int(); print_int(x); }', PipelineConfig(evaluate=True), report)
+  assert not report['evaluation']['completed']
@@ -0,0 +1,65 @@
+import os
+import random
+import shutil
+import subprocess
+import tempfile
+import pytest
+from compiler.int64 import INT_MAX, INT_MIN, divide, remainder, wrap
+from compiler.intrinsics import division_magic
+
+DIVISORS = [2, 3, 5, 7, 8, 10, 641, 1 << 40, 10**18 + 9, INT_MAX, -2, -3, -7, -16, -1000, -(2**62) - 3, INT_MIN + 1]
+
+
+def magic_quotient(n: int, d: int) -> int:
+  """The result of the multiply-high sequence emitted for `n / d`."""
+  m, s = division_magic(d)
+  q = (m * n) >> 64
+  if d > 0 and m < 0:
+    q += n
+  elif d < 0 and m > 0:
+    q -= n
+  q = wrap(q) >> s
+  return q + (1 if q < 0 else 0)
+
+def test_division_magic() -> None:
+  r = random.Random(0)
+  numerators = [0, 1, -1, 7, -7, INT_MAX, INT_MIN, INT_MAX - 1, INT_MIN + 1]
+  numerators += [r.randint(INT_MIN, INT_MAX) for _ in range(500)] + [r.randint(-1000, 1000) for _ in range(500)]
+  for d in DIVISORS + [r.randint(2, INT_MAX) for _ in range(50)] + [r.randint(INT_MIN + 1, -2) for _ in range(50)]:
+    if d & (d - 1) == 0:
+      continue
+    for n in numerators:
+      assert magic_quotient(n, d) == divide(n, d), (n, d)
+
+def test_compare_and_branch() -> None:
+  from compiler.__main__ import compile_to_ir
+  from compiler.assembly_generator import generate_assembly
+  from compiler.peephole import optimize_assembly
+  source = '{ var n = read_int(); var i = 0; while i < n and not (i == 50) do i = i + 1; print_int(i); }'
+  assembly = optimize_assembly(generate_assembly(compile_to_ir(source)))
+  assert 'set' not in assembly
+  # `i < n` jumps out if false, `i == 50` if true.
+  assert len([line for line in assembly.splitlines() if line.startswith('cmpq')]) == 2
+  assert 'jge' in assembly and 'je' in assembly.split()
+
+@pytest.mark.skipif(shutil.which('as') is None or shutil.which('ld') is None, reason='needs as and ld')
+def test_constant_division_in_native_code() -> None:
+  from compiler.__main__ import call_compiler
+  numerators = [0, 1, -1, 7, -7, 9, -9, 1000, -1000, 123456789, INT_MAX, INT_MIN, INT_MIN + 1]
+  body = ''.join(
+    f'print_int(n / ({d})); print_int(n % ({d})); print_int(n * ({d})); '
+    for d in DIVISORS + [1, 4, 1 << 62]
+  )
+  source = f'{{ var i = 0; while i < {len(numerators)} do {{ var n = read_int(); {body} i = i + 1; }} }}'
+  expected = []
+  for n in numerators:
+    for d in DIVISORS + [1, 4, 1 << 62]:
+      expected += [divide(n, d), remainder(n, d), wrap(n * d)]
+  with tempfile.TemporaryDirectory() as workdir:
+    executable = os.path.join(workdir, 'program')
+    with open(executable, 'wb') as f:
+      f.write(call_compiler(source))
+    os.chmod(executable, 0o755)
+    stdin = ''.join(f'{n}\n' for n in numerators)
+    result = subprocess.run([executable], input=stdin, capture_output=True, text=True, check=True)
+    assert [int(line) for line in result.stdout.split()] == expected
@@ -2,8 +2,19 @@ from compiler import symtab
 from compiler.ast import Literal, BinaryOp
 from compiler.Loc import L
 from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler.symtab import TopType
+from compiler.tokenizer import tokenize
 from compiler.type import Int
-from compiler.ir import LoadIntConst, IRVar, Call
+from compiler.type_checker import typecheck
+from compiler.ir import Copy, Instruction, LoadIntConst, IRVar, Call
+
+def ir_of(source: str) -> list[Instruction]:
+  tree = parse(tokenize(source))
+  resolve(tree)
+  typecheck(tree, TopType.child())
+  return generate_ir(symtab.names, tree)
 
 def test_ir_binaryop() -> None:
   ast = BinaryOp(L, left=Literal(L, value=1, type=Int), op='+',
@@ -16,3 +27,62 @@ def test_ir_binaryop() -> None:
     Call(L, fun=IRVar(name='*'), args=[IRVar(name='x2'), IRVar(name='x3')], dest=IRVar(name='x4')),
     Call(L, fun=IRVar(name='+'), args=[IRVar(name='x'), IRVar(name='x4')], dest=IRVar(name='x5')),
     Call(L, fun=IRVar(name='print_int'), args=[IRVar(name='x5')], dest=IRVar(name='unit'))]
+
+def test_assignment() -> None:
+  *_, load, assign, show = ir_of('{ var x = 1; x = 2; x }')
+  assert isinstance(load, LoadIntConst) and isinstance(assign, Copy) and isinstance(show, Call)
+  assert assign.source == load.dest
+  assert show.args == [assign.dest]
+
+def test_variables_dont_alias_their_initializer() -> None:
+  assert [str(insn) for insn in ir_of('{ var x = 1; var y = x; y = 2; x }')] == [
+    'LoadIntConst(1, x)',
+    'Copy(x, x2)',
+    'Copy(x2, x3)',
+    'LoadIntConst(2, x4)',
+    'Copy(x4, x3)',
+    'Call(print_int, [x2], unit)',
+  ]
+
+def test_if_else_value() -> None:
+  assert [str(insn) for insn in ir_of('if true then 1 else 2 * 3')] == [
+    'LoadBoolConst(True, x2)',
+    'CondJump(x2, Label(L1), Label(L2))',
+    'Label(L1)',
+    'LoadIntConst(1, x3)',
+    'Copy(x3, x)',
+    'Jump(Label(L3))',
+    'Label(L2)',
+    'LoadIntConst(2, x4)',
+    'LoadIntConst(3, x5)',
+    'Call(*, [x4, x5], x6)',
+    'Copy(x6, x)',
+    'Label(L3)',
+    'Call(print_int, [x], unit)',
+  ]
+  *_, else_value, _, show = ir_of('if false then 1 else 2')
+  assert str(else_value) == 'Copy(x4, x)'
+  assert str(show) == 'Call(print_int, [x], unit)'
+
+def test_function_call() -> None:
+  assert [str(insn) for insn in ir_of('{ print_bool(read_int() > 0); }')] == [
+    'Call(read_int, [], x2)',
+    'LoadIntConst(0, x3)',
+    'Call(>, [x2, x3], x4)',
+    'Call(print_bool, [x4], x)',
+  ]
+
+def test_operands_keep_their_values() -> None:
+  assert [str(insn) for insn in ir_of('{ var a = 1; a + { a = 2; a } }')] == [
+    'LoadIntConst(1, x)',
+    'Copy(x, x2)',
+    'Copy(x2, x3)',
+    'LoadIntConst(2, x4)',
+    'Copy(x4, x2)',
+    'Call(+, [x3, x2], x5)',
+    'Call(print_int, [x5], unit)',
+  ]
+  tree = parse(tokenize('{ var a = 1; f(a, a, { a = 2; a }) }'))
+  resolve(tree)
+  *_, call = generate_ir(symtab.names | {'f'}, tree)
+  assert str(call) == 'Call(f, [x4, x5, x2], x3)'
@@ -0,0 +1,118 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from typing import Any, Callable
+import pytest
+from compiler import interpreter, ir, ir_interpreter, symtab
+from compiler.int64 import INT_MAX, INT_MIN
+from compiler.interpreter import EvaluationLimitExceeded
+from compiler.ir import IRVar
+from compiler.Loc import L
+from compiler.parser import parse
+from compiler.symtab import SymTab, TopLevel
+from compiler.tokenizer import tokenize
+from tests.program_generator import ProgramGenerator, compile_ir, run_ir
+
+
+def ir_output(source: str) -> list[Any]:
+  return run_ir(compile_ir(source))
+
+def checked(f: Callable[[int, int], int]) -> Callable[[int, int], int]:
+  def check(a: int, b: int) -> int:
+    result = f(a, b)
+    if not INT_MIN <= result <= INT_MAX:
+      raise OverflowError()
+    return result
+  return check
+
+def interpreter_output(source: str) -> list[Any]:
+  """Output of the tree walker, raising OverflowError if native results would differ."""
+  output: list[Any] = []
+  builtins = SymTab[Any]({
+    'print_int': output.append,
+    'print_bool': output.append,
+    '+': checked(symtab.op_plus),
+    '-': checked(symtab.op_minus),
+    '*': checked(symtab.op_asterisk),
+  }, TopLevel)
+  output.append(interpreter.interpret(parse(tokenize(source)), SymTab[Any]({}, builtins)))
+  return output
+
+
+def test_native_arithmetic() -> None:
+  f = ir_interpreter.intrinsic_functions
+  assert f['/'](7, 2) == 3
+  assert f['/'](-7, 2) == -3
+  assert f['%'](-7, 2) == -1
+  assert f['%'](7, -2) == 1
+  assert f['+'](2**63 - 1, 1) == -2**63
+  assert f['*'](2**62, 4) == 0
+  assert f['unary_-'](-2**63) == -2**63
+  with pytest.raises(ZeroDivisionError):
+    f['%'](1, 0)
+  with pytest.raises(OverflowError):
+    f['/'](-2**63, -1)
+
+def test_runs_ir() -> None:
+  x, y, c = IRVar('x'), IRVar('y'), IRVar('c')
+  loop, body, end = ir.Label(L, 'loop'), ir.Label(L, 'body'), ir.Label(L, 'end')
+  instructions: list[ir.Instruction] = [
+    ir.LoadIntConst(L, 5, x),
+    ir.LoadIntConst(L, 1, y),
+    loop,
+    ir.Call(L, IRVar('>'), [x, IRVar('zero')], c),
+    ir.CondJump(L, c, body, end),
+    body,
+    ir.Call(L, IRVar('*'), [y, x], y),
+    ir.Call(L, IRVar('unary_-'), [IRVar('one')], IRVar('minus_one')),
+    ir.Call(L, IRVar('+'), [x, IRVar('minus_one')], x),
+    ir.Jump(L, loop),
+    end,
+  ]
+  values = ir_interpreter.run([ir.LoadIntConst(L, 0, IRVar('zero')), ir.LoadIntConst(L, 1, IRVar('one')), *instructions])
+  assert values[y] == 120
+  assert values[x] == 0
+  with pytest.raises(EvaluationLimitExceeded):
+    ir_interpreter.run([loop, ir.Jump(L, loop)], max_steps=100)
+
+def test_generated_ir() -> None:
+  assert ir_output("{ var x = 1; { var x = 10; x = x + 1; print_int(x); } x }") == [11, 1]
+  assert ir_output("{ var x = 1; var y = x; x = 2; y }") == [1]
+  assert ir_output("{ var x = 4; var y = if x == 4 then 3 else 2; y * 10 }") == [30]
+  assert ir_output("{ var x = false; print_bool(true or { x = true; true }); x }") == [True, False]
+  assert ir_output("{ var n = 0; var i = 0; while i < 5 do { var i2 = i * 2; n = n + i2; i = i + 1; } n }") == [20]
+  assert ir_output("(-7) / 2 + (-7) % 2") == [-4]
+  # Variables read through a block or an assignment keep the value they had then.
+  assert ir_output("{ var a = 1; { a } * { a = 7; 2 } }") == [2]
+  assert ir_output("{ var a = 1; (a = 3) + { a = 7; 0 } }") == [3]
+
+def test_same_output_as_tree_walker() -> None:
+  compared = 0
+  for seed in range(300):
+    source = ProgramGenerator(seed).program()
+    try:
+      expected = interpreter_output(source)
+    except OverflowError:
+      continue
+    assert ir_output(source) == expected, source
+    compared += 1
+  assert compared > 250
+
+@pytest.mark.skipif(shutil.which('as') is None or shutil.which('ld') is None, reason='needs as and ld')
+def test_same_output_as_native_code() -> None:
+  from compiler.__main__ import call_compiler
+  with tempfile.TemporaryDirectory() as workdir:
+    executable = os.path.join(workdir, 'program')
+    for seed in range(10):
+      source = ProgramGenerator(seed).program()
+      printed: list[str] = []
+      ir_interpreter.run(compile_ir(source), {
+        'print_int': lambda a: printed.append(str(a)),
+        'print_bool': lambda a: printed.append('true' if a else 'false'),
+      })
+      with open(executable, 'wb') as f:
+        f.write(call_compiler(source))
+      os.chmod(executable, 0o755)
+      result = subprocess.run([executable], capture_output=True, text=True, check=True)
+      assert result.stdout.split() == printed, source
@@ -0,0 +1,55 @@
+from compiler import ir
+from compiler.constant_propagation import propagate_constants
+from compiler.ir import IRVar
+from compiler.jump_threading import thread_jumps
+from compiler.Loc import L
+from tests.program_generator import ProgramGenerator, compile_ir, run_ir
+
+a, b, c = IRVar('a'), IRVar('b'), IRVar('c')
+L1, L2, L3 = ir.Label(L, 'L1'), ir.Label(L, 'L2'), ir.Label(L, 'L3')
+
+
+def branches(source: str) -> list[ir.Instruction]:
+  instructions = thread_jumps(propagate_constants(compile_ir(source)))
+  return [insn for insn in instructions if isinstance(insn, (ir.Jump, ir.CondJump))]
+
+def test_not_swaps_targets() -> None:
+  assert thread_jumps([
+    ir.Call(L, IRVar('read_int'), [], a),
+    ir.Call(L, IRVar('unary_not'), [a], b),
+    ir.CondJump(L, b, L1, L2),
+    L1, ir.Call(L, IRVar('print_int'), [a], c),
+    L2,
+  ]) == [
+    ir.Call(L, IRVar('read_int'), [], a),
+    ir.CondJump(L, a, L2, L1),
+    L1, ir.Call(L, IRVar('print_int'), [a], c),
+    L2,
+  ]
+
+def test_constant_bool_jumps_to_target() -> None:
+  instructions: list[ir.Instruction] = [
+    ir.Call(L, IRVar('read_int'), [], a),
+    ir.LoadBoolConst(L, True, b),
+    L1, ir.CondJump(L, b, L2, L3),
+    L2, ir.Call(L, IRVar('print_int'), [a], c),
+    L3,
+  ]
+  assert thread_jumps(instructions) == [
+    ir.Call(L, IRVar('read_int'), [], a),
+    ir.Jump(L, L2),
+    L2, ir.Call(L, IRVar('print_int'), [a], c),
+    L3,
+  ]
+
+def test_and_or_chains() -> None:
+  source = '{ var a = read_int(); if (a > 1 and a < 5) or a == 9 then print_int(a); }'
+  # Each comparison branches straight to the next test or to the result.
+  assert [type(insn) for insn in branches(source)] == [ir.CondJump] * 3
+  source = '{ var a = read_int(); while not (a == 0) and (not (a > 100)) do a = a - 1; }'
+  assert [type(insn) for insn in branches(source)] == [ir.CondJump, ir.CondJump, ir.Jump]
+
+def test_same_output() -> None:
+  for seed in range(300):
+    instructions = propagate_constants(compile_ir(ProgramGenerator(seed).program()))
+    assert run_ir(thread_jumps(instructions)) == run_ir(instructions)
@@ -0,0 +1,32 @@
+from compiler import ir
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import IRVar
+from compiler.liveness import definition, live_out, uses
+from compiler.Loc import L
+
+
+def test_uses_and_definition() -> None:
+  a, b, c = IRVar('a'), IRVar('b'), IRVar('c')
+  call = ir.Call(L, IRVar('+'), [a, b], c)
+  assert uses(call) == [a, b] and definition(call) == c
+  assert uses(ir.CondJump(L, a, ir.Label(L, 'x'), ir.Label(L, 'y'))) == [a]
+  assert definition(ir.Label(L, 'x')) is None
+
+def test_live_out_of_loop() -> None:
+  i, n, c, s = IRVar('i'), IRVar('n'), IRVar('c'), IRVar('s')
+  start, body, end = ir.Label(L, 'start'), ir.Label(L, 'body'), ir.Label(L, 'end')
+  graph = ControlFlowGraph([
+    ir.LoadIntConst(L, 0, i),
+    ir.LoadIntConst(L, 10, n),
+    ir.LoadIntConst(L, 0, s),
+    start,
+    ir.Call(L, IRVar('<'), [i, n], c),
+    ir.CondJump(L, c, body, end),
+    body,
+    ir.Call(L, IRVar('+'), [s, i], s),
+    ir.Call(L, IRVar('+'), [i, n], i),
+    ir.Jump(L, start),
+    end,
+    ir.Call(L, IRVar('print_int'), [s], IRVar('unit')),
+  ])
+  assert live_out(graph) == [{i, n, s}, {i, n, s}, {i, n, s}, set()]
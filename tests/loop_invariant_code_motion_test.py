@@ -0,0 +1,68 @@
+from compiler import ir
+from compiler.constant_propagation import propagate_constants
+from compiler.cfg import ControlFlowGraph
+from compiler.ir import IRVar
+from compiler.loop_invariant_code_motion import hoist_loop_invariants
+from tests.program_generator import ProgramGenerator, compile_ir, run_ir
+
+
+def loop_calls(instructions: list[ir.Instruction]) -> list[str]:
+  """The calls inside the loops, innermost loop first."""
+  graph = ControlFlowGraph(instructions)
+  return [
+    str(insn.fun)
+    for loop in graph.natural_loops()
+    for block in sorted(loop.blocks, key=lambda block: block.index)
+    for insn in block.instructions
+    if isinstance(insn, ir.Call)
+  ]
+
+def test_natural_loops() -> None:
+  graph = ControlFlowGraph(compile_ir("{ var i = 0; while i < 3 do { var j = 0; while j < i do j = j + 1; i = i + 1; } }"))
+  inner, outer = graph.natural_loops()
+  assert inner.blocks < outer.blocks
+  assert len(inner.exits()) == 1 and len(outer.exits()) == 1
+  assert graph.dominates(outer.header, inner.header)
+
+def test_hoists_invariant_arithmetic() -> None:
+  source = "{ var n = read_int(); var i = 0; var s = 0; while i < 10 do { s = s + n * n; i = i + 1; } s }"
+  instructions = hoist_loop_invariants(propagate_constants(compile_ir(source)))
+  assert loop_calls(instructions) == ['<', '+', '+']
+  assert [insn.name for insn in instructions if isinstance(insn, ir.Label)] == ['L1_preheader', 'L1', 'L2', 'L3']
+
+def test_nested_loops() -> None:
+  source = """{
+    var n = read_int(); var i = 0; var s = 0;
+    while i < 10 do { var j = 0; while j < 10 do { s = s + n * 2; j = j + 1; } i = i + 1; }
+    s
+  }"""
+  instructions = hoist_loop_invariants(propagate_constants(compile_ir(source)))
+  # `n * 2` goes out of both loops.
+  assert 'L4_preheader' in [insn.name for insn in instructions if isinstance(insn, ir.Label)]
+  assert '*' not in loop_calls(instructions)
+
+def test_division() -> None:
+  source = "{ var n = read_int(); var d = read_int(); var i = 0; var s = 0; while i < 10 do { s = s + n / 4 + n % d; i = i + 1; } s }"
+  instructions = hoist_loop_invariants(propagate_constants(compile_ir(source)))
+  # Dividing by 4 can't trap, but dividing by `d` might.
+  assert sorted(loop_calls(instructions)) == ['%', '+', '+', '+', '<']
+  source = "{ var n = read_int(); var i = read_int(); while i < 0 do { n = n / 0; } n }"
+  instructions = hoist_loop_invariants(propagate_constants(compile_ir(source)))
+  assert loop_calls(instructions).count('/') == 1
+
+def test_keeps_values_live_after_loop() -> None:
+  source = "{ var n = 5; var i = read_int(); while i < 10 do { n = 7; i = i + 1; } n }"
+  instructions = hoist_loop_invariants(compile_ir(source))
+  # The constant 7 is loaded before the loop, but only copied to `n` in it.
+  graph = ControlFlowGraph(instructions)
+  [loop] = graph.natural_loops()
+  copies = [insn for block in loop.blocks for insn in block.instructions if isinstance(insn, ir.Copy)]
+  assert [(copy.source, copy.dest) for copy in copies] == [(IRVar('x7'), IRVar('x2')), (IRVar('x9'), IRVar('x4'))]
+
+def test_same_output_as_unoptimized() -> None:
+  for seed in range(300):
+    source = ProgramGenerator(seed).program()
+    instructions = compile_ir(source)
+    expected = run_ir(instructions)
+    assert run_ir(hoist_loop_invariants(instructions)) == expected, source
+    assert run_ir(hoist_loop_invariants(propagate_constants(instructions))) == expected, source
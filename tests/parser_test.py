@@ -1,5 +1,6 @@
 from compiler.parser import parse
 from compiler.Token import Token
+from compiler.tokenizer import tokenize
 from compiler.Loc import L, Loc
 from compiler.ast import BinaryOp, Literal, Identifier, IfStatement, Function, Unary, Block, Var, While
 from compiler.type import Bool
@@ -173,6 +174,14 @@ def test_function() -> None:
   ]
   assert parse(tokens) == Function(L,name=Identifier(L,name='f'), args=[Identifier(L,name='x'), BinaryOp(L,left=Identifier(L,name='y'), op='+', right=Identifier(L,name='z'))]) 
 
+def test_function_without_arguments() -> None:
+  assert parse(tokenize("read_int()")) == Function(L,name=Identifier(L,name='read_int'), args=[])
+  try:
+    parse(tokenize("f(x,)"))
+    assert False
+  except Exception as e:
+    assert 'expected' in e.args[0]
+
 
 def test_unary_operators() -> None:
   tokens = [
@@ -499,3 +508,61 @@ def test_parse_mistyped_var() -> None:
     parse(tokens)
   except Exception as e:
     assert e.args[0] == "Error: (0, 0): Unknown type: mytype"
+
+def test_parse_token_stream() -> None:
+  tokens = iter([
+    Token(loc=L, type='identifier', text='a'),
+    Token(loc=L, type='operator', text='='),
+    Token(loc=L, type='int_literal', text='1'),
+    Token(loc=L, type='punctuation', text=';'),
+  ])
+  assert parse(tokens) == BinaryOp(L, left=Identifier(L, name='a'), op='=', right=Literal(L, value=1))
+
+def test_parse_token_stream_end_of_file_loc() -> None:
+  tokens = (t for t in [
+    Token(loc=Loc(0, 0), type='punctuation', text='('),
+    Token(loc=Loc(0, 1), type='identifier', text='a'),
+  ])
+  try:
+    parse(tokens)
+    assert False
+  except Exception as e:
+    assert e.args[0] == "(0, 1): expected \")\", found \"<end of file>\""
+
+def test_long_operator_chain() -> None:
+  tokens = [Token(loc=L, type='int_literal', text='1')]
+  for _ in range(100000):
+    tokens.append(Token(loc=L, type='operator', text='+'))
+    tokens.append(Token(loc=L, type='int_literal', text='1'))
+  result = parse(tokens)
+  assert isinstance(result, BinaryOp) and result.right == Literal(L, value=1)
+
+def test_deep_nesting() -> None:
+  depth = 10000
+  tokens = [Token(loc=L, type='punctuation', text='(')] * depth
+  tokens += [Token(loc=L, type='operator', text='-')] * depth
+  tokens.append(Token(loc=L, type='identifier', text='a'))
+  tokens += [Token(loc=L, type='punctuation', text=')')] * depth
+  result = parse(tokens)
+  for _ in range(depth):
+    assert isinstance(result, Unary)
+    result = result.right
+  assert result == Identifier(L, name='a')
+
+def test_unary_operand_extends_to_closing_parenthesis() -> None:
+  tokens = [
+    Token(loc=L, type='identifier', text='a'),
+    Token(loc=L, type='operator', text='*'),
+    Token(loc=L, type='punctuation', text='('),
+    Token(loc=L, type='operator', text='-'),
+    Token(loc=L, type='identifier', text='b'),
+    Token(loc=L, type='operator', text='+'),
+    Token(loc=L, type='identifier', text='c'),
+    Token(loc=L, type='punctuation', text=')'),
+    Token(loc=L, type='operator', text='-'),
+    Token(loc=L, type='identifier', text='d'),
+  ]
+  assert parse(tokens) == BinaryOp(L,
+    left=BinaryOp(L, left=Identifier(L, name='a'), op='*', right=Unary(L, op='-', right=BinaryOp(L, left=Identifier(L, name='b'), op='+', right=Identifier(L, name='c')))),
+    op='-',
+    right=Identifier(L, name='d'))
@@ -0,0 +1,63 @@
+import os
+import shutil
+import subprocess
+import tempfile
+from collections import Counter
+import pytest
+from compiler.config import PipelineConfig
+from compiler.peephole import Comment, Instruction, Label, all_rules, format_assembly, optimize, optimize_assembly, parse_assembly
+from tests.program_generator import ProgramGenerator
+
+
+def peephole(assembly: str) -> tuple[str, Counter[str]]:
+  hits: Counter[str] = Counter()
+  return optimize_assembly(assembly, hits), hits
+
+def test_parse_assembly() -> None:
+  lines = parse_assembly('.global main\nmain:\n\n# comment\nmovq $1, -8(%rbp)\nret')
+  assert lines[1:] == [Label('main'), Comment(''), Comment('# comment'), Instruction('movq', ('$1', '-8(%rbp)')), Instruction('ret', ())]
+  assert format_assembly(lines) == '.global main\nmain:\n\n# comment\nmovq $1, -8(%rbp)\nret'
+
+def test_redundant_load() -> None:
+  assert peephole('movq %rax, -8(%rbp)\nmovq -8(%rbp), %rax') == ('movq %rax, -8(%rbp)', Counter({'redundant-load': 1}))
+  assert peephole('movq %rcx, %rsi\n# Copy\nmovq %rcx, %rsi')[0] == '# Copy\nmovq %rcx, %rsi'
+  # `(%rax)` is a different location after %rax changes.
+  assert peephole('movq (%rax), %rax\nmovq (%rax), %rax')[1] == Counter()
+
+def test_self_move() -> None:
+  assert peephole('movq %rbx, %rbx\nret') == ('ret', Counter({'self-move': 1}))
+
+def test_jumps() -> None:
+  assert peephole('jne .L1\njmp .L2\n.L1:\nret\n.L2:\nret') == \
+    ('je .L2\n.L1:\nret\n.L2:\nret', Counter({'jump-over-jump': 1}))
+  assert peephole('jmp .L1\n.L1:\nret')[0] == '.L1:\nret'
+  assert peephole('jl .L1\njmp .L1')[0] == 'jmp .L1'
+
+def test_rules_apply_to_their_results() -> None:
+  # Removing the unreachable move makes the jump go to the next label.
+  assembly, hits = peephole('jmp .L1\nmovq $1, %rax\n.L1:\nret')
+  assert assembly == '.L1:\nret'
+  assert hits == Counter({'unreachable': 1, 'jump-to-next': 1})
+
+def test_chosen_rules() -> None:
+  lines = parse_assembly('movq %rbx, %rbx\njmp .L1\n.L1:')
+  assert optimize(lines, [all_rules['jump-to-next']]) == [Instruction('movq', ('%rbx', '%rbx')), Label('.L1')]
+
+def test_peephole_option() -> None:
+  config = PipelineConfig().with_flag('--no-peephole')
+  assert config is not None and not config.peephole
+
+@pytest.mark.skipif(shutil.which('as') is None or shutil.which('ld') is None, reason='needs as and ld')
+def test_same_output_as_without_peephole() -> None:
+  from compiler.__main__ import call_compiler
+  with tempfile.TemporaryDirectory() as workdir:
+    executable = os.path.join(workdir, 'program')
+    for seed in range(5):
+      source = ProgramGenerator(seed).program()
+      outputs = []
+      for config in [PipelineConfig(), PipelineConfig(peephole=False, register_allocation=False)]:
+        with open(executable, 'wb') as f:
+          f.write(call_compiler(source, config))
+        os.chmod(executable, 0o755)
+        outputs.append(subprocess.run([executable], capture_output=True, text=True, check=True).stdout)
+      assert outputs[0] == outputs[1], source
@@ -0,0 +1,129 @@
+"""Random well-typed programs and other helpers for differential tests.
+
+Loops are bounded by counters that the loop bodies never assign,
+so every generated program terminates."""
+from random import Random
+from typing import Any
+from compiler import ir, ir_interpreter, symtab
+from compiler.ir_generator import generate_ir
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler.symtab import TopType
+from compiler.tokenizer import tokenize
+from compiler.type_checker import typecheck
+
+_names = ['a', 'b', 'c']
+
+
+class ProgramGenerator:
+  def __init__(self, seed: int, max_depth: int = 3, divisions: bool = False):
+    self.random = Random(seed)
+    self.max_depth = max_depth
+    # Also generate `/` and `%`, by nonzero constants other than -1
+    # so that they never trap.
+    self.divisions = divisions
+    self.loops = 0
+
+  def program(self) -> str:
+    scope: dict[str, str] = {}
+    statements = self.statements(scope, 0, self.random.randint(1, 6))
+    return '{ ' + statements + self.int_expr(scope, 0) + ' }'
+
+  def statements(self, scope: dict[str, str], depth: int, count: int) -> str:
+    return ''.join(self.statement(scope, depth) + '; ' for _ in range(count))
+
+  def block(self, scope: dict[str, str], depth: int, result: str | None = None) -> str:
+    inner = dict(scope)
+    statements = self.statements(inner, depth + 1, self.random.randint(0, 3))
+    if result == 'int':
+      return '{ ' + statements + self.int_expr(inner, depth + 1) + ' }'
+    if result == 'bool':
+      return '{ ' + statements + self.bool_expr(inner, depth + 1) + ' }'
+    return '{ ' + statements + '}'
+
+  def statement(self, scope: dict[str, str], depth: int) -> str:
+    r = self.random
+    choices = ['var', 'var', 'print']
+    if scope:
+      choices += ['assign', 'assign']
+    if depth < self.max_depth:
+      choices += ['if', 'while', 'block']
+    match r.choice(choices):
+      case 'var':
+        name = r.choice(_names)
+        kind = r.choice(['int', 'int', 'bool'])
+        init = self.int_expr(scope, depth) if kind == 'int' else self.bool_expr(scope, depth)
+        scope[name] = kind
+        return f'var {name} = {init}'
+      case 'assign':
+        name = r.choice(sorted(scope))
+        value = self.int_expr(scope, depth) if scope[name] == 'int' else self.bool_expr(scope, depth)
+        return f'{name} = {value}'
+      case 'print':
+        if r.random() < 0.5:
+          return f'print_int({self.int_expr(scope, depth)})'
+        return f'print_bool({self.bool_expr(scope, depth)})'
+      case 'if':
+        cond = self.bool_expr(scope, depth)
+        if r.random() < 0.3:
+          return f'if {cond} then {self.block(scope, depth)}'
+        return f'if {cond} then {self.block(scope, depth)} else {self.block(scope, depth)}'
+      case 'while':
+        self.loops += 1
+        counter = f'i{self.loops}'
+        body = self.block(scope, depth)
+        return f'{{ var {counter} = 0; while {counter} < {r.randint(0, 4)} do {{ {body}; {counter} = {counter} + 1; }} }}'
+      case _:
+        return self.block(scope, depth)
+
+  def int_expr(self, scope: dict[str, str], depth: int) -> str:
+    r = self.random
+    variables = [name for name, kind in scope.items() if kind == 'int']
+    if depth >= self.max_depth or r.random() < 0.3:
+      if variables and r.random() < 0.6:
+        return r.choice(variables)
+      return str(r.randint(0, 20))
+    ops = ['+', '-', '*', 'neg', 'if', 'block']
+    if self.divisions:
+      ops += ['/', '%']
+    match r.choice(ops):
+      case '/' | '%' as op:
+        divisor = r.choice([1, *range(2, 21), *range(-20, -1)])
+        return f'({self.int_expr(scope, depth + 1)} {op} {divisor})'
+      case 'neg':
+        return f'(-({self.int_expr(scope, depth + 1)}))'
+      case 'if':
+        return f'(if {self.bool_expr(scope, depth + 1)} then {self.int_expr(scope, depth + 1)} else {self.int_expr(scope, depth + 1)})'
+      case 'block':
+        return self.block(scope, depth, 'int')
+      case op:
+        return f'({self.int_expr(scope, depth + 1)} {op} {self.int_expr(scope, depth + 1)})'
+
+  def bool_expr(self, scope: dict[str, str], depth: int) -> str:
+    r = self.random
+    variables = [name for name, kind in scope.items() if kind == 'bool']
+    if depth >= self.max_depth or r.random() < 0.3:
+      if variables and r.random() < 0.6:
+        return r.choice(variables)
+      return r.choice(['true', 'false'])
+    match r.choice(['cmp', 'cmp', 'and', 'or', 'not']):
+      case 'cmp':
+        op = r.choice(['<', '<=', '>', '>=', '==', '!='])
+        return f'({self.int_expr(scope, depth + 1)} {op} {self.int_expr(scope, depth + 1)})'
+      case 'not':
+        return f'(not ({self.bool_expr(scope, depth + 1)}))'
+      case op:
+        return f'({self.bool_expr(scope, depth + 1)} {op} {self.bool_expr(scope, depth + 1)})'
+
+
+def compile_ir(source: str) -> list[ir.Instruction]:
+  tree = parse(tokenize(source))
+  resolve(tree)
+  typecheck(tree, TopType.child())
+  return generate_ir(symtab.names, tree)
+
+def run_ir(instructions: list[ir.Instruction]) -> list[Any]:
+  """Runs IR code and returns the values it printed."""
+  output: list[Any] = []
+  ir_interpreter.run(instructions, {'print_int': output.append, 'print_bool': output.append})
+  return output
@@ -0,0 +1,67 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import pytest
+from compiler import ir, ir_interpreter
+from compiler.register_allocator import allocate_registers, callee_saved_registers, live_intervals
+from tests.program_generator import ProgramGenerator, compile_ir
+
+
+def check_allocation(instructions: list[ir.Instruction]) -> dict[ir.IRVar, str]:
+  registers = allocate_registers(instructions)
+  intervals = [interval for interval in live_intervals(instructions) if interval.var in registers]
+  for interval in intervals:
+    if interval.crosses_call:
+      assert registers[interval.var] in callee_saved_registers, interval
+    for other in intervals:
+      if other is not interval and registers[other.var] == registers[interval.var]:
+        assert other.end < interval.start or interval.end < other.start, (interval, other)
+  return registers
+
+def test_live_intervals() -> None:
+  instructions = compile_ir('{ var a = read_int(); var b = a + 1; print_int(b); print_int(a); }')
+  intervals = [(interval.start, interval.end, interval.crosses_call) for interval in live_intervals(instructions)]
+  # `a` is copied from the result of read_int at 1 and printed last at 6.
+  assert intervals == [(0, 1, False), (1, 6, True), (2, 3, False), (3, 4, False), (4, 5, False), (5, 5, False), (6, 6, False)]
+
+def test_loop_variables_live_through_loop() -> None:
+  instructions = compile_ir('{ var i = 0; while i < 10 do i = i + 1; print_int(i); }')
+  jump = max(position for position, insn in enumerate(instructions) if isinstance(insn, ir.Jump))
+  counter = next(insn.dest for insn in instructions if isinstance(insn, ir.Copy))
+  (interval,) = [interval for interval in live_intervals(instructions) if interval.var == counter]
+  assert interval.end >= jump
+
+def test_spills_when_out_of_registers() -> None:
+  names = [f'v{n}' for n in range(20)]
+  source = '{ ' + ''.join(f'var {name} = read_int(); ' for name in names) + \
+    f'print_int({" + ".join(names)}); }}'
+  instructions = compile_ir(source)
+  registers = check_allocation(instructions)
+  # The 20 variables are live across calls, and there are 5 callee-saved registers.
+  crossing = [interval.var for interval in live_intervals(instructions) if interval.crosses_call]
+  assert len(crossing) == 19
+  assert len([var for var in crossing if var in registers]) == len(callee_saved_registers)
+
+def test_generated_programs() -> None:
+  for seed in range(100):
+    check_allocation(compile_ir(ProgramGenerator(seed).program()))
+
+@pytest.mark.skipif(shutil.which('as') is None or shutil.which('ld') is None, reason='needs as and ld')
+def test_native_code_with_spills() -> None:
+  from compiler.__main__ import call_compiler
+  names = [f'v{n}' for n in range(20)]
+  source = '{ var i = 0; ' + ''.join(f'var {name} = read_int(); ' for name in names) + \
+    'while i < 3 do { ' + ''.join(f'{name} = {name} * 3 + {other}; ' for name, other in zip(names, names[1:] + names[:1])) + \
+    'i = i + 1; } ' + ''.join(f'print_int({name}); ' for name in names) + '}'
+  inputs = list(range(len(names)))
+  expected: list[int] = []
+  ir_interpreter.run(compile_ir(source), {'print_int': expected.append, 'read_int': iter(inputs).__next__})
+  with tempfile.TemporaryDirectory() as workdir:
+    executable = os.path.join(workdir, 'program')
+    with open(executable, 'wb') as f:
+      f.write(call_compiler(source))
+    os.chmod(executable, 0o755)
+    stdin = ''.join(f'{n}\n' for n in inputs)
+    result = subprocess.run([executable], input=stdin, capture_output=True, text=True, check=True)
+  assert [int(line) for line in result.stdout.split()] == expected
@@ -0,0 +1,52 @@
+from typing import Any
+from compiler import ast
+from compiler.interpreter import interpret
+from compiler.parser import parse
+from compiler.resolver import resolve
+from compiler.symtab import SymTab, TopLevel, TopType
+from compiler.tokenizer import tokenize
+from compiler.type import Int
+from compiler.type_checker import typecheck
+
+def test_resolve_slots() -> None:
+  tree = parse(tokenize("{ var x = 1; { var x = x; x = 2; y } x }"))
+  assert resolve(tree) == 2
+  assert isinstance(tree, ast.Block)
+  outer, block = tree.statements[0], tree.statements[1]
+  assert isinstance(outer, ast.Var) and isinstance(block, ast.Block)
+  inner, assign = block.statements[0], block.statements[1]
+  assert isinstance(inner, ast.Var) and isinstance(assign, ast.BinaryOp)
+  assert outer.val.slot == 0
+  assert inner.val.slot == 1
+  assert isinstance(inner.init, ast.Identifier) and inner.init.slot == 0
+  assert isinstance(assign.left, ast.Identifier) and assign.left.slot == 1
+  assert isinstance(block.result, ast.Identifier) and block.result.slot == -1
+  assert isinstance(tree.result, ast.Identifier) and tree.result.slot == 0
+
+def test_resolved_program_runs() -> None:
+  source = """{
+    var x = 0;
+    var total = 0;
+    while x < 10 do {
+      var x2 = x * 2;
+      { var total = 100; total = total + 1; }
+      total = total + x2;
+      x = x + 1;
+    }
+    total
+  }"""
+  tree = parse(tokenize(source))
+  resolve(tree)
+  assert interpret(tree, SymTab[Any]({}, TopLevel)) == 90
+  assert typecheck(tree, SymTab[Any]({}, TopType)) == Int
+
+def test_programs_get_fresh_frames() -> None:
+  from compiler.__main__ import compile_to_ir
+  from compiler.config import PipelineConfig
+  source = '{ var x = 1; { var y = x; y } }'
+  compile_to_ir(source, PipelineConfig(evaluate=True))
+  tree = parse(tokenize(source))
+  resolve(tree)
+  interpret(tree, TopLevel)
+  typecheck(tree, TopType)
+  assert TopLevel.slots == [] and TopType.slots == []
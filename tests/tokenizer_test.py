@@ -1,6 +1,6 @@
-from compiler.tokenizer import tokenize
-from compiler.Loc import L, Loc
-from compiler.Token import Token
+from compiler.tokenizer import tokenize, tokenize_iter
+from compiler.Loc import L, Loc, SourceMap
+from compiler.Token import Token, TokenType
 
 def test_tokenizer_basics() -> None:
   assert tokenize("if 3\nwhile") == [Token(L, type="identifier", text="if"),
@@ -42,3 +42,30 @@ def test_tokenize_declared_var() -> None:
                                             Token(loc=L, type='identifier', text='Bool'),
                                             Token(loc=L, type='operator', text='='),
                                             Token(loc=L, type='identifier', text='True')]
+
+def test_tokenizer_whitespace_runs_and_junk() -> None:
+  assert tokenize("a  \t b @ 1//x\n\t  c") == [Token(Loc(0,0), type="identifier", text="a"),
+                                              Token(Loc(0,5), type="identifier", text="b"),
+                                              Token(Loc(0,9), type="int_literal", text="1"),
+                                              Token(Loc(1,3), type="identifier", text="c")]
+
+def test_tokenize_iter_is_lazy() -> None:
+  tokens = tokenize_iter("a + 1")
+  assert next(tokens) == Token(Loc(0,0), type="identifier", text="a")
+  assert list(tokens) == [Token(Loc(0,2), type="operator", text="+"),
+                          Token(Loc(0,4), type="int_literal", text="1")]
+
+def test_compact_tokens() -> None:
+  token = tokenize("foo")[0]
+  assert token.type is TokenType.IDENTIFIER
+  assert token.type == "identifier"
+  assert not hasattr(token, '__dict__') and not hasattr(token.loc, '__dict__')
+  assert Loc(3, 4) == L and L == Loc(3, 4)
+  assert Loc(3, 4) != Loc(3, 5)
+
+def test_source_map_locations() -> None:
+  source_map = SourceMap("a\n\n  bb\nc")
+  tokens = tokenize(source_map.source_code, source_map)
+  assert [t.loc.offset for t in tokens] == [0, 5, 8]
+  assert [t.loc.line_col() for t in tokens] == [(0, 0), (2, 2), (3, 0)]
+  assert str(tokens[1].loc) == "(2, 2)"
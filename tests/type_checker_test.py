@@ -1,3 +1,4 @@
+import pytest
 from compiler.type_checker import typecheck
 from compiler.ast import Literal, Var, Identifier, Block, BinaryOp, Unary, IfStatement, While, Function
 from compiler.symtab import TopType
@@ -91,6 +92,14 @@ def test_while() -> None:
   ))
   assert typecheck(ast, TopType) == Unit
 
+def test_while_body() -> None:
+  body = BinaryOp(L, left=Literal(L, value=1), op='+', right=Literal(L, value=2))
+  assert typecheck(While(L, cond=Literal(L, value=True), then=body), TopType) == Unit
+  assert body.type == Int
+  ast = While(L, cond=Literal(L, value=True), then=BinaryOp(L, left=Literal(L, value=1), op='+', right=Literal(L, value=True)))
+  with pytest.raises(Exception, match=r'Operator "\+"'):
+    typecheck(ast, TopType)
+
 def test_builtin_functions() -> None:
   ast1 = Function(L, args=[Literal(L, value=1)],  name=Identifier(L, name='print_int'))
   ast2 = Function(L, args=[Literal(L, value=True)],  name=Identifier(L, name='print_bool'))
@@ -0,0 +1,68 @@
+from compiler import ir
+from compiler.copy_propagation import remove_copies
+from compiler.ir import IRVar
+from compiler.Loc import L
+from compiler.value_numbering import number_values
+from tests.program_generator import ProgramGenerator, compile_ir, run_ir
+
+x, y, a, b, c = IRVar('x'), IRVar('y'), IRVar('a'), IRVar('b'), IRVar('c')
+times, plus = IRVar('*'), IRVar('+')
+
+def test_local_value_numbering() -> None:
+  assert number_values([
+    ir.Call(L, times, [x, y], a),
+    ir.Call(L, times, [y, x], b),
+    ir.Copy(L, x, c),
+    ir.Call(L, plus, [c, a], c),
+    ir.Call(L, plus, [b, x], a),
+  ]) == [
+    ir.Call(L, times, [x, y], a),
+    ir.Copy(L, a, b),
+    ir.Copy(L, x, c),
+    ir.Call(L, plus, [c, a], c),
+    ir.Copy(L, c, a),
+  ]
+
+def test_redefinitions_and_side_effects() -> None:
+  instructions: list[ir.Instruction] = [
+    ir.Call(L, times, [x, y], a),
+    ir.Call(L, IRVar('read_int'), [], x),
+    ir.Call(L, times, [x, y], b),
+    ir.Call(L, IRVar('read_int'), [], c),
+    ir.Call(L, IRVar('read_int'), [], c),
+  ]
+  assert number_values(instructions) == instructions
+  # The holder of a value is redefined
+  instructions = [
+    ir.Call(L, times, [x, y], a),
+    ir.LoadIntConst(L, 1, a),
+    ir.Call(L, times, [x, y], b),
+  ]
+  assert number_values(instructions) == instructions
+
+def test_global_value_numbering() -> None:
+  source = """{
+    var n = read_int(); var m = read_int(); var s = 0; var i = 0;
+    var first = n * m;
+    while i < 3 do { s = s + n * m; i = i + 1; }
+    print_int(first);
+    s
+  }"""
+  def multiplications(use_dominators: bool) -> int:
+    instructions, _ = remove_copies(number_values(compile_ir(source), use_dominators))
+    return sum(isinstance(insn, ir.Call) and insn.fun == times for insn in instructions)
+  assert multiplications(False) == 2
+  assert multiplications(True) == 1
+
+def test_not_across_redefinitions() -> None:
+  source = "{ var n = read_int(); var a = n * n; n = n + 1; var b = n * n; if a < b then print_int(b); a }"
+  instructions = number_values(compile_ir(source), use_dominators=True)
+  assert sum(isinstance(insn, ir.Call) and insn.fun == times for insn in instructions) == 2
+
+def test_same_output_as_unoptimized() -> None:
+  for seed in range(300):
+    source = ProgramGenerator(seed).program()
+    instructions = compile_ir(source)
+    expected = run_ir(instructions)
+    assert run_ir(number_values(instructions)) == expected, source
+    assert run_ir(number_values(instructions, use_dominators=True)) == expected, source
@@ -0,0 +1,96 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import pytest
+from compiler import assembler, assembly_generator, peephole
+from compiler.x86_encoder import EncodingError, Relocation, encode
+from tests.program_generator import ProgramGenerator, compile_ir
+
+needs_gas = pytest.mark.skipif(
+  shutil.which('as') is None or shutil.which('objcopy') is None, reason='needs as and objcopy'
+)
+
+
+def gas(assembly: str) -> bytes:
+  """The .text section that as makes, with relocated fields left zero."""
+  with tempfile.TemporaryDirectory() as workdir:
+    source, obj, text = (os.path.join(workdir, name) for name in ['a.s', 'a.o', 'a.bin'])
+    with open(source, 'w') as f:
+      f.write(assembly + '\n')
+    subprocess.run(['as', '-o', obj, source], check=True)
+    subprocess.run(['objcopy', '-O', 'binary', '-j', '.text', obj, text], check=True)
+    with open(text, 'rb') as f:
+      return f.read()
+
+instructions = [
+  *(f'movq {a}, {b}' for a in ['%rax', '%rsp', '%r8', '%r15'] for b in ['%rcx', '%rbp', '%r12', '%r13']),
+  *(f'movq {m}, %rdx' for m in ['(%rax)', '(%rsp)', '(%rbp)', '(%r12)', '(%r13)', '-8(%rbp)', '-200(%rbp)', '16(%rsp)', '8(%r12)']),
+  'movq %r9, -8(%rbp)', 'movq $1, %rax', 'movq $-1, -16(%rbp)', 'movq $2147483647, %rbx',
+  'movq $4294967296, %rsi', 'movabsq $-9223372036854775808, %r11', 'movabsq $5, %rax',
+  'movb $10, (%rsp)', 'movb %dl, (%rsp)', 'movb %sil, -1(%rbp)', 'movb %r8b, %al',
+  *(f'{op} {a}, {b}' for op in ['addq', 'subq', 'cmpq', 'xorq', 'andq', 'orq']
+    for a, b in [('%rax', '%rdx'), ('-24(%rbp)', '%r10'), ('%r14', '8(%rsp)'), ('$5', '%rcx'),
+                 ('$-128', '%r9'), ('$1000', '%rax'), ('$1000', '%rdi'), ('$1000', '-8(%rbp)')]),
+  'xor %rax, %rax', 'imulq %rcx', 'imulq -8(%rbp)', 'imulq %r8, %rdx', 'imulq -16(%rbp), %r13',
+  'imulq $10, %r10', 'imulq $1000, %rdx', 'imulq $3, %rax, %rcx',
+  'idivq %rcx', 'idivq -8(%rbp)', 'idivq %r11', 'cqto', 'negq %rdx', 'neg %r10', 'incq %r9', 'decq %rsp',
+  'salq $3, %rax', 'salq $1, %r12', 'sarq $63, -8(%rbp)', 'shrq $60, %rdx',
+  *(f'set{cc} %al' for cc in ['e', 'ne', 'l', 'le', 'g', 'ge']), 'setl %sil', 'sete -1(%rbp)',
+  'leaq -40(%rbp), %rsp', 'leaq 8(%r13), %rax',
+  'pushq %rbp', 'pushq %r12', 'pushq -8(%rbp)', 'pushq $0', 'pushq $300', 'popq %rbx', 'popq %r15',
+  'ret', 'syscall',
+]
+
+@needs_gas
+def test_same_as_gas() -> None:
+  expected = gas('\n'.join(instructions))
+  position = 0
+  for line in instructions:
+    code = encode(line).code
+    assert code == expected[position:position + len(code)], line
+    position += len(code)
+  assert position == len(expected)
+
+@needs_gas
+def test_stdlib_same_as_gas() -> None:
+  assert encode(assembler.stdlib_asm_code).code == gas(assembler.stdlib_asm_code)
+
+@needs_gas
+def test_generated_code_same_as_gas() -> None:
+  for seed in range(10):
+    instructions = compile_ir(ProgramGenerator(seed).program())
+    for allocate_registers in [True, False]:
+      assembly = peephole.optimize_assembly(assembly_generator.generate_assembly(instructions, allocate_registers))
+      assert encode(assembly).code == gas(assembly), seed
+
+def test_jumps_are_short_when_they_fit() -> None:
+  near = encode('.L1:\njmp .L1\nje .L1')
+  assert near.code == bytes([0xEB, 0xFE, 0x74, 0xFC])
+  # 50 pushes of 3 bytes are too far for an 8-bit displacement.
+  far = encode('\n'.join(['jne .L2', *['pushq -8(%rbp)'] * 50, '.L2:', 'jmp .L2']))
+  assert far.code[:6] == bytes([0x0F, 0x85, 150, 0, 0, 0])
+  assert far.code[-2:] == bytes([0xEB, 0xFE])
+
+def test_symbols() -> None:
+  obj = encode('\n'.join([
+    '.global f',
+    'f: callq g',
+    'movq $s, %rsi',
+    'movq $s_len, %rdx',
+    'ret',
+    's:',
+    '    .ascii "hi\\n"   # with a newline',
+    's_len = . - s',
+  ]))
+  assert obj.labels == {'f': 0, 's': 20}
+  assert obj.global_symbols == {'f'}
+  assert obj.relocations == [Relocation(1, 'g', 'pc32'), Relocation(8, 's', 'abs32')]
+  assert obj.code[15:23] == bytes([3, 0, 0, 0, 0xC3]) + b'hi\n'
+
+def test_unsupported_code() -> None:
+  for line in ['movq (%rax,%rbx,8), %rcx', 'jmp *%rax', 'addb $1, %al', 'movq -8(%rbp), 8(%rsp)', '.section .data', 'addl $1, %eax']:
+    with pytest.raises(EncodingError):
+      encode(line)
+  with pytest.raises(EncodingError, match='Line 2'):
+    encode('ret\nfoo %rax')